@@ -0,0 +1,144 @@
+import argparse
+import glob
+import os
+import sys
+from detection import render_videos, print_statistics
+from sticker_registry import sticker_registry, DEFAULT_PACKS_DIRECTORY
+from detection_cache import DetectionCache, DEFAULT_DIRECTORY
+from video_writers import BACKENDS, WRITER_PRESETS, DEFAULT_PRESET
+from landmarks import LANDMARK_MODELS
+from detectors import create_detector, DEFAULT_DETECTOR
+from cross_check import CV_SAMPLE_INTERVAL
+import models
+
+
+def expand_inputs(patterns):
+    """Expands input files and glob patterns to list of files.
+
+    :param patterns: list of file paths or glob patterns
+    :returns: sorted list of files without duplicates
+    """
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        if len(matches) == 0:
+            print("No files match " + pattern + "!")
+        files.extend(match for match in matches if match not in files)
+    return sorted(files)
+
+
+def parse_arguments(argv):
+    """Parses command line arguments of batch processor.
+
+    :param argv: list of command line arguments
+    :returns: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Attaches stickers to faces in videos without any window.")
+    parser.add_argument("inputs", nargs="+", help="input video files or glob patterns")
+    parser.add_argument("--sticker", nargs="+", default=[""],
+                        help="names of stickers attached to faces, each sticker is saved to its own result video "
+                        "while faces are detected only once, built-in stickers are "
+                        + ", ".join(sticker_registry.names()))
+    parser.add_argument("--sticker-pack", action="append", default=[],
+                        help="directory of sticker pack with stickers.json, can be repeated (packs from "
+                        + DEFAULT_PACKS_DIRECTORY + " are always loaded)")
+    parser.add_argument("--faces", type=int, default=-1, help="expected number of faces in each frame")
+    parser.add_argument("--draw-rectangles", action="store_true",
+                        help="draw rectangles around faces and 68 face points")
+    parser.add_argument("--output-dir", default=None, help="directory of result videos, input directory if omitted")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--keyframe-interval", type=int, default=1,
+                        help="number of frames between two full detections, faces are tracked in between")
+    parser.add_argument("--min-face-size", type=int, default=None,
+                        help="width of smallest expected face, enables detection on lower resolution")
+    parser.add_argument("--roi-search", action="store_true",
+                        help="search only regions around faces from previous frame")
+    parser.add_argument("--queue-depth", type=int, default=8, help="depth of decoding and encoding queues")
+    parser.add_argument("--detector", default=DEFAULT_DETECTOR,
+                        help="detector backend that finds faces for landmarks: hog, haar, lbp, or first pass and "
+                        "verifier joined by +, e.g. lbp+hog (see calibrate.py)")
+    parser.add_argument("--evaluate-cv", action="store_true",
+                        help="compare detector with opencv Haar cascade on sampled frames, off the render path")
+    parser.add_argument("--cv-sample-interval", type=int, default=CV_SAMPLE_INTERVAL,
+                        help="every n-th frame is compared with opencv when --evaluate-cv is used")
+    parser.add_argument("--landmark-model", choices=[name for name, _, _ in LANDMARK_MODELS], default=None,
+                        help="landmark model, cheapest available model that chosen stickers need if omitted")
+    parser.add_argument("--writer-preset", choices=sorted(WRITER_PRESETS), default=DEFAULT_PRESET,
+                        help="quality/speed preset of result video writer")
+    parser.add_argument("--writer-backend", choices=BACKENDS, default=None,
+                        help="video writer backend, backend of preset if omitted")
+    parser.add_argument("--writer-quality", type=int, default=None,
+                        help="JPEG quality (0-100) of MJPG backends, quality of preset if omitted")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory of detection cache, e.g. " + DEFAULT_DIRECTORY + ", detections are not "
+                        "cached if omitted")
+    parser.add_argument("--cache-size", type=int, default=1024, help="maximal size of detection cache in MB")
+    parser.add_argument("--metrics-file", default=None,
+                        help="file to which runtime metrics are periodically written, JSON if it ends with .json")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="number of seconds between two writes of metrics file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Processes all input videos and prints throughput for each of them.
+
+    :param argv: list of command line arguments, sys.argv is used if None
+    :returns: exit code, 0 if all videos are processed
+    """
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    faces_number = arguments.faces if arguments.faces > 0 else -1
+    sticker_registry.load_packs()
+    for pack in arguments.sticker_pack:
+        sticker_registry.load_pack(pack)
+    for sticker in arguments.sticker:
+        if sticker != "" and sticker_registry.get(sticker) is None:
+            print("Unknown sticker " + sticker + "! Available stickers: " + ", ".join(sticker_registry.names()))
+            return 2
+    try:
+        create_detector(arguments.detector)
+    except ValueError as e:
+        print(str(e))
+        return 2
+    if arguments.landmark_model is not None and not models.is_available(arguments.landmark_model):
+        print("Landmark model " + arguments.landmark_model + " is not installed!")
+        return 2
+    if arguments.output_dir is not None and not os.path.isdir(arguments.output_dir):
+        os.makedirs(arguments.output_dir)
+
+    detection_cache = DetectionCache(arguments.cache_dir, arguments.cache_size << 20) \
+        if arguments.cache_dir is not None else None
+    failed = 0
+    for path in expand_inputs(arguments.inputs):
+        try:
+            statistics = render_videos(path, faces_number, arguments.draw_rectangles, arguments.sticker,
+                                       output_dir=arguments.output_dir,
+                                       keyframe_interval=arguments.keyframe_interval,
+                                       min_face_size=arguments.min_face_size, roi_search=arguments.roi_search,
+                                       workers=arguments.workers, queue_depth=arguments.queue_depth,
+                                       metrics_path=arguments.metrics_file,
+                                       metrics_interval=arguments.metrics_interval,
+                                       detection_cache=detection_cache, writer_preset=arguments.writer_preset,
+                                       writer_backend=arguments.writer_backend,
+                                       writer_quality=arguments.writer_quality,
+                                       landmark_model=arguments.landmark_model, detector=arguments.detector,
+                                       evaluate_cv=arguments.evaluate_cv,
+                                       cv_sample_interval=arguments.cv_sample_interval)
+        except Exception as e:
+            print(path + ": error processing video! " + str(e))    # partial result videos are removed
+            failed += 1
+            continue
+        if statistics is None:
+            print(path + ": error opening video!")
+            failed += 1
+            continue
+        output_paths = ", ".join(output["output_path"] for output in statistics["outputs"])
+        print(path + " -> " + output_paths + ": " + str(statistics["frames"]) + " frames in "
+              + str(round(statistics["elapsed"], 2)) + " s (" + str(round(statistics["fps"], 2)) + " fps"
+              + (", cached detections)" if statistics["cached_detections"] else ")"))
+        print_statistics(statistics, faces_number)
+    return 1 if failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Micro-benchmark of per-face sticker compositing.
+
+Compares float compositing that add_sticker used before (three channels, alpha
+recomputed twice per channel) with integer, premultiplied compositing from
+compositing.py. Run from repository root: python benchmarks/bench_composite.py
+"""
+import os
+import sys
+import timeit
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compositing import prepare_sticker, composite  # noqa: E402
+
+
+def legacy_composite(image, sticker, cor_x, cor_y):
+    """Float compositing as it was done in add_sticker.
+
+    :param image: frame
+    :param sticker: sticker image with alpha channel
+    :param cor_x: x coordinate of upper left corner of sticker
+    :param cor_y: y coordinate of upper left corner of sticker
+    """
+    s_height, s_width = sticker.shape[0], sticker.shape[1]
+    for chanel in range(3):
+        image[cor_y:cor_y + s_height, cor_x:cor_x + s_width, chanel] = \
+            sticker[:, :, chanel] * (sticker[:, :, 3] / 255.0) + \
+            image[cor_y:cor_y + s_height, cor_x:cor_x + s_width, chanel] \
+            * (1.0 - sticker[:, :, 3] / 255.0)
+
+
+def main(sticker_name="glasses", face_width=300, repeat=200):
+    """Measures time per face for both compositing implementations.
+
+    :param sticker_name: name of sticker from stickers directory
+    :param face_width: width of sticker in pixels
+    :param repeat: number of measured compositings
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sticker = cv2.imread(os.path.join(root, "stickers", sticker_name + ".png"), -1)
+    scale = face_width / float(sticker.shape[1])
+    sticker = cv2.resize(sticker, (0, 0), fx=scale, fy=scale)
+    frame = np.random.RandomState(0).randint(0, 256, (1080, 1920, 3)).astype(np.uint8)
+
+    legacy_frame = frame.copy()
+    legacy_time = timeit.timeit(lambda: legacy_composite(legacy_frame, sticker, 800, 400), number=repeat) / repeat
+
+    prepared = prepare_sticker(sticker)     # done once per sticker variant by sticker cache
+    new_frame = frame.copy()
+    new_time = timeit.timeit(lambda: composite(new_frame, prepared, 800, 400), number=repeat) / repeat
+
+    check_legacy, check_new = frame.copy(), frame.copy()
+    legacy_composite(check_legacy, sticker, 800, 400)
+    composite(check_new, prepared, 800, 400)
+    difference = np.abs(check_legacy.astype(np.int16) - check_new.astype(np.int16)).max()
+
+    print("Sticker " + sticker_name + " " + str(sticker.shape[1]) + "x" + str(sticker.shape[0]) + ":")
+    print("  float compositing:   " + str(round(legacy_time * 1000, 3)) + " ms per face")
+    print("  integer compositing: " + str(round(new_time * 1000, 3)) + " ms per face")
+    print("  speedup: " + str(round(legacy_time / new_time, 2)) + "x, max pixel difference: " + str(difference))
+
+
+if __name__ == "__main__":
+    for name in ("glasses", "mask", "flowers"):
+        main(name)
@@ -0,0 +1,137 @@
+"""Comparison of landmark models for each sticker.
+
+Stickers that need only eyes or rectangle around face are placed with points of
+5 point model (other points are estimated from mean face shape), which is much
+faster than 68 point model. For each sticker this measures landmark prediction time of
+both models on the same detected faces, and IoU of sticker placed with each of
+them against face parts from 68 point model, so loss of accuracy is visible.
+Needs shape_predictor_5_face_landmarks.dat in face_recognition_models/models.
+Run from repository root: python benchmarks/bench_landmarks.py [clips...]
+"""
+import glob
+import os
+import sys
+import time
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import detection  # noqa: E402
+import models  # noqa: E402
+from compositing import clip_placement  # noqa: E402
+from filters import put_filters_on, check_intersections  # noqa: E402
+from landmarks import FaceLandmarks, LANDMARK_MODELS  # noqa: E402
+from sticker_registry import sticker_registry, FACE_REGIONS  # noqa: E402
+
+MODELS = [name for name, _, _ in LANDMARK_MODELS]
+
+
+def sticker_ious(frame, faces, points, reference_points, sticker):
+    """Places sticker with one set of landmarks and calculates its IoU against face parts from another.
+
+    :param frame: frame, it is not changed
+    :param faces: list of face bounds (top, right, bottom, left)
+    :param points: (faces, 68, 2) array of landmark points that sticker is placed with
+    :param reference_points: (faces, 68, 2) array of landmark points of face parts that sticker should cover
+    :param sticker: name of sticker
+    :returns: list of IoU of each face that sticker is attached to
+    """
+    spec = sticker_registry.get(sticker)
+    ious = []
+    for idx, face in enumerate(faces):
+        placements = []
+        put_filters_on(frame, [face], FaceLandmarks(points[idx:idx + 1]), sticker, [], placements=placements)
+        if len(placements) == 0:
+            continue    # trigger condition is not met
+        prepared, x, y = placements[0]
+        visible = clip_placement(frame.shape, prepared.shape, x, y)
+        if visible is None:
+            ious.append(0.0)
+            continue
+        x, y, w, h = visible[0]
+        reference = FaceLandmarks(reference_points[idx:idx + 1])
+        region_boxes = dict((region, reference.bounding_boxes(region)[0].tolist())
+                            for region in spec.iou_regions if region not in FACE_REGIONS)
+        face_box = (face[3], face[0], face[1] - face[3], face[2] - face[0])
+        inter = check_intersections(spec.iou_regions, h, w, y, x, region_boxes, face_box)
+        if inter is not None:
+            ious.append(inter)
+    return ious
+
+
+def compare(clips, stickers, max_frames=100):
+    """Measures landmark prediction time of each model and IoU of each sticker placed with each model.
+
+    :param clips: paths of input clips
+    :param stickers: names of stickers
+    :param max_frames: maximal number of frames per clip
+    :returns: dict with milliseconds per frame for each model, and for each sticker chosen model and average
+              IoU and number of attached stickers for each model
+    """
+    models.prewarm(["face_detector"] + MODELS)  # model loading is not measured
+    times = dict((model, 0.0) for model in MODELS)
+    ious = dict((sticker, dict((model, []) for model in MODELS)) for sticker in stickers)
+    frames = 0
+    for clip in clips:
+        cap = cv2.VideoCapture(clip)
+        clip_frames = 0
+        while clip_frames < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            clip_frames += 1
+            faces = detection.face_locations(frame, number_of_times=1)
+            points = {}
+            for model in MODELS:
+                start = time.perf_counter()
+                points[model] = detection.face_landmark_points(frame, faces, model)
+                times[model] += time.perf_counter() - start
+            for sticker in stickers:
+                for model in MODELS:
+                    ious[sticker][model].extend(sticker_ious(frame, faces, points[model],
+                                                             points["predictor_68_point"], sticker))
+        cap.release()
+        frames += clip_frames
+    report = {"frames": frames, "ms_per_frame": dict((model, times[model] * 1000 / max(frames, 1))
+                                                     for model in MODELS), "stickers": {}}
+    for sticker in stickers:
+        report["stickers"][sticker] = {
+            "model": detection.landmark_model_for([sticker]),
+            "iou": dict((model, sum(values) / len(values) if len(values) > 0 else None)
+                        for model, values in ious[sticker].items()),
+            "attached": dict((model, len(values)) for model, values in ious[sticker].items())
+        }
+    return report
+
+
+def main(argv=None):
+    """Prints comparison of landmark models for every built-in sticker.
+
+    :param argv: list of input clips, bundled result_videos clips if empty
+    :returns: exit code
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not models.is_available("predictor_5_point"):
+        print("5 point model is not installed! Download shape_predictor_5_face_landmarks.dat to "
+              + os.path.dirname(models.face_recognition_models.pose_predictor_five_point_model_location()))
+        return 1
+    clips = argv if len(argv) > 0 else sorted(glob.glob(os.path.join(ROOT, "result_videos", "*.avi")))
+    report = compare(clips, sticker_registry.names())
+    fast, full = report["ms_per_frame"]["predictor_5_point"], report["ms_per_frame"]["predictor_68_point"]
+    print("Landmarks on " + str(report["frames"]) + " frames: 5 point " + str(round(fast, 2)) + " ms, 68 point "
+          + str(round(full, 2)) + " ms per frame")
+    for sticker, result in report["stickers"].items():
+        iou_fast, iou_full = result["iou"]["predictor_5_point"], result["iou"]["predictor_68_point"]
+        line = sticker + " (" + result["model"] + "): landmarks " + \
+            str(round(report["ms_per_frame"][result["model"]], 2)) + " ms per frame"
+        if iou_fast is not None and iou_full is not None:
+            line += ", IoU 68 point " + str(round(iou_full * 100, 2)) + " %, 5 point " + \
+                str(round(iou_fast * 100, 2)) + " % (" + str(round((iou_fast - iou_full) * 100, 2)) + ")"
+        line += ", attached " + str(result["attached"]["predictor_68_point"]) + " / " + \
+            str(result["attached"]["predictor_5_point"]) + " times"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Startup time measurement.
+
+Measures, in fresh interpreter for every sample, how long importing modules
+takes and how long loading of all models takes afterwards. Before models were
+loaded lazily, importing detection cost import time plus model loading time.
+Run from repository root: python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+print(imported - start)
+import models
+models.prewarm()
+print(time.perf_counter() - imported)
+"""
+
+
+def measure(module, samples=5):
+    """Measures import time of module and loading time of models.
+
+    :param module: name of imported module
+    :param samples: number of fresh interpreters that are measured
+    :returns: lowest import time and lowest model loading time (None if models can not be loaded)
+              in seconds, or None if module can not be imported
+    """
+    import_times, load_times = [], []
+    for _ in range(samples):
+        result = subprocess.run([sys.executable, "-c", SNIPPET.format(module=module)], cwd=ROOT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        lines = result.stdout.split()
+        if len(lines) == 0:
+            print(module + ": " + result.stderr.strip().splitlines()[-1])
+            return None
+        import_times.append(float(lines[0]))
+        if len(lines) > 1:
+            load_times.append(float(lines[1]))
+        else:
+            print(module + " models: " + result.stderr.strip().splitlines()[-1])
+    return min(import_times), min(load_times) if len(load_times) > 0 else None
+
+
+if __name__ == "__main__":
+    for name in ("filters", "detection", "main_window"):
+        times = measure(name)
+        if times is None:
+            continue
+        print(name + ": import " + str(round(times[0] * 1000, 1)) + " ms")
+        if times[1] is not None:
+            print(name + ": loading models on first use " + str(round(times[1] * 1000, 1))
+                  + " ms (eager loading cost " + str(round((times[0] + times[1]) * 1000, 1)) + " ms at import)")
@@ -0,0 +1,309 @@
+"""Reproducible per-stage benchmark of FaceSnap pipeline.
+
+Runs pipeline stages (decode, face_locations, face_landmarks, put_filter_on,
+detect_cv, encode) one after another on fixed inputs: clips from result_videos
+and generated synthetic clips with known face positions. Each case runs in
+fresh process so that peak RSS and sticker cache state do not leak between
+cases. Results are saved as JSON and compared with stored baseline.
+
+Run from repository root:
+    python benchmarks/run_benchmarks.py --output benchmark.json --baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ["decode", "face_locations", "face_landmarks", "put_filter_on", "detect_cv", "encode"]
+STICKERS = ["", "mask", "cat", "ears", "flowers", "mustache", "glasses", "mouse", "pirate", "rainbow"]
+SYNTHETIC_SOURCE = os.path.join(ROOT, "result_videos", "result_video_mustache.avi")
+SYNTHETIC_FACE = (104, 575, 229, 450)   # face bounds on first frame of source clip (top, right, bottom, left)
+SYNTHETIC_SIZE = (1280, 720)
+SYNTHETIC_FRAMES = 100
+
+
+def generate_synthetic_clip(path, faces_number, frames=SYNTHETIC_FRAMES, size=SYNTHETIC_SIZE, fps=25.0):
+    """Generates clip with faces moving along known trajectories on plain background.
+
+    Face is cut from first frame of bundled clip and pasted faces_number times, each copy moves
+    along its own deterministic path.
+
+    :param path: path of generated clip
+    :param faces_number: number of faces in each frame
+    :param frames: number of frames
+    :param size: width and height of frames
+    :param fps: frames per second
+    :returns: list of face bounds (top, right, bottom, left) for each frame
+    """
+    import cv2
+    import numpy as np
+
+    cap = cv2.VideoCapture(SYNTHETIC_SOURCE)
+    ret, source = cap.read()
+    cap.release()
+    if not ret:
+        raise IOError("Source of synthetic clip could not be read!")
+    top, right, bottom, left = SYNTHETIC_FACE
+    margin_x, margin_y = (right - left) // 3, (bottom - top) // 3  # keep some head around face
+    patch = source[max(top - margin_y, 0):bottom + margin_y, max(left - margin_x, 0):right + margin_x]
+    patch = cv2.resize(patch, (0, 0), fx=1.5, fy=1.5)
+    face_offset = (int(margin_y * 1.5), int(margin_x * 1.5))
+    face_size = (int((bottom - top) * 1.5), int((right - left) * 1.5))
+
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), fps, (width, height))
+    ground_truth = []
+    slot = width // faces_number
+    for index in range(frames):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        frame_faces = []
+        for face_index in range(faces_number):
+            phase = 2 * np.pi * (index / float(frames) + face_index / float(faces_number))
+            x = int(slot * face_index + (slot - patch.shape[1]) / 2 + 0.2 * slot * np.sin(phase))
+            y = int((height - patch.shape[0]) / 2 + 0.2 * height * np.cos(phase))
+            x = min(max(x, 0), width - patch.shape[1])
+            y = min(max(y, 0), height - patch.shape[0])
+            frame[y:y + patch.shape[0], x:x + patch.shape[1]] = patch
+            face_top, face_left = y + face_offset[0], x + face_offset[1]
+            frame_faces.append((face_top, face_left + face_size[1], face_top + face_size[0], face_left))
+        writer.write(frame)
+        ground_truth.append(frame_faces)
+    writer.release()
+    return ground_truth
+
+
+def run_case(clip, sticker, faces_number, max_frames, ground_truth, trace_allocations, writer_preset="balanced"):
+    """Runs all pipeline stages on clip and measures them. Called in fresh process.
+
+    :param clip: path of input clip
+    :param sticker: name of sticker
+    :param faces_number: expected number of faces, -1 if unknown
+    :param max_frames: maximal number of processed frames
+    :param ground_truth: list of known face bounds for each frame, None if unknown
+    :param trace_allocations: indicator whether memory allocations are traced (slows down stages)
+    :param writer_preset: quality/speed preset of video writer used in encode stage
+    :returns: dict with measurements
+    """
+    import resource
+    import cv2
+    import detection
+    import filters
+    import models
+    from tracking import box_iou
+    from sticker_cache import sticker_cache
+    from video_writers import create_video_writer, writer_extension
+
+    if trace_allocations:
+        import tracemalloc
+        tracemalloc.start()
+    models.prewarm()    # model loading is not part of any stage
+    stage_times = dict((stage, 0.0) for stage in STAGES)
+    stage_peaks = dict((stage, 0) for stage in STAGES)
+    output_dir = tempfile.mkdtemp()
+    cap = cv2.VideoCapture(clip)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    size = (int(cap.get(3)), int(cap.get(4)))
+    writer = create_video_writer(os.path.join(output_dir, "result" + writer_extension(writer_preset)), fps, size,
+                                 writer_preset)
+    frames = 0
+    dlib_true = 0
+    matched_faces = 0
+    known_faces = 0
+    intersections = []
+    blocks_start = sys.getallocatedblocks()
+    start = time.perf_counter()
+
+    def measure(stage, function, *args):
+        if trace_allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        stage_start = time.perf_counter()
+        result = function(*args)
+        stage_times[stage] += time.perf_counter() - stage_start
+        if trace_allocations:
+            stage_peaks[stage] = max(stage_peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+        return result
+
+    while frames < max_frames:
+        ret, frame = measure("decode", cap.read)
+        if not ret:
+            break
+        faces = measure("face_locations", detection.face_locations, frame, 1)
+        landmarks = measure("face_landmarks", detection.face_landmarks, frame, faces)
+        frame_intersections = []
+        if sticker != "":
+            measure("put_filter_on", filters.put_filters_on, frame, faces, landmarks, sticker, frame_intersections)
+        measure("detect_cv", detection.detect_cv, frame, faces_number, False)
+        measure("encode", writer.write, frame)
+
+        if len(frame_intersections) > 0:
+            intersections.append(sum(frame_intersections) / len(frame_intersections))
+        if faces_number == -1 or len(faces) == faces_number:
+            dlib_true += 1
+        if ground_truth is not None and frames < len(ground_truth):
+            for known in ground_truth[frames]:
+                known_faces += 1
+                if max([box_iou(known, face) for face in faces] + [0.0]) >= 0.5:
+                    matched_faces += 1
+        frames += 1
+
+    measure("encode", writer.release)   # threaded writers finish encoding on release
+    elapsed = time.perf_counter() - start
+    cap.release()
+    shutil.rmtree(output_dir, ignore_errors=True)
+    result = {
+        "clip": os.path.basename(clip),
+        "sticker": sticker,
+        "faces_number": faces_number,
+        "frames": frames,
+        "elapsed_s": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "stages_ms_per_frame": dict((stage, stage_times[stage] * 1000 / max(frames, 1)) for stage in STAGES),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "python_blocks_per_frame": (sys.getallocatedblocks() - blocks_start) / float(max(frames, 1)),
+        "dlib_success": dlib_true / float(max(frames, 1)),
+        "iou": sum(intersections) / len(intersections) if len(intersections) > 0 else None,
+        "ground_truth_recall": matched_faces / float(known_faces) if known_faces > 0 else None,
+        "sticker_cache": sticker_cache.stats()
+    }
+    if trace_allocations:
+        result["stages_alloc_peak_kb"] = dict((stage, stage_peaks[stage] / 1024.0) for stage in STAGES)
+        tracemalloc.stop()
+    return result
+
+
+def case_key(case):
+    """Creates key that identifies benchmark case.
+
+    :param case: dict with measurements
+    :returns: key string
+    """
+    return case["clip"] + "|" + (case["sticker"] or "none") + "|" + str(case["faces_number"])
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Compares results with baseline and lists regressions.
+
+    :param results: benchmark results
+    :param baseline: baseline results
+    :param tolerance: allowed relative slowdown, e.g. 0.1 for 10 %
+    :returns: list of regression descriptions
+    """
+    baseline_cases = dict((case_key(case), case) for case in baseline["cases"])
+    regressions = []
+    for case in results["cases"]:
+        old = baseline_cases.get(case_key(case))
+        if old is None:
+            continue
+        if case["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(case_key(case) + ": fps " + str(round(old["fps"], 2)) + " -> "
+                               + str(round(case["fps"], 2)))
+        for stage in STAGES:
+            old_time = old["stages_ms_per_frame"].get(stage, 0.0)
+            new_time = case["stages_ms_per_frame"][stage]
+            if old_time > 0.05 and new_time > old_time * (1 + tolerance):   # ignore stages that cost nothing
+                regressions.append(case_key(case) + ": " + stage + " " + str(round(old_time, 3)) + " -> "
+                                   + str(round(new_time, 3)) + " ms per frame")
+        if case["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(case_key(case) + ": peak RSS " + str(round(old["peak_rss_mb"], 1)) + " -> "
+                               + str(round(case["peak_rss_mb"], 1)) + " MB")
+    return regressions
+
+
+def parse_arguments(argv):
+    """Parses command line arguments.
+
+    :param argv: list of command line arguments
+    :returns: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Measures FaceSnap pipeline stages on fixed inputs.")
+    parser.add_argument("--clips", nargs="*", default=None,
+                        help="input clips, bundled result_videos clips if omitted")
+    parser.add_argument("--stickers", nargs="*", default=STICKERS, help="stickers, empty string for none")
+    parser.add_argument("--face-counts", nargs="*", type=int, default=[1, 2, 4],
+                        help="numbers of faces in synthetic clips, none to skip synthetic clips")
+    parser.add_argument("--max-frames", type=int, default=60, help="maximal number of frames per case")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="trace allocation peaks per stage with tracemalloc (slows stages down)")
+    parser.add_argument("--writer-preset", default="balanced",
+                        help="quality/speed preset of video writer in encode stage, e.g. compatible for "
+                        "cv2.VideoWriter or benchmark for no encoding")
+    parser.add_argument("--output", default=None, help="JSON file with results")
+    parser.add_argument("--baseline", default=None, help="JSON file with baseline results")
+    parser.add_argument("--save-baseline", default=None, help="save results as new baseline to this file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs all benchmark cases.
+
+    :param argv: list of command line arguments, sys.argv is used if None
+    :returns: exit code, 1 if regression against baseline is found
+    """
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    clips = arguments.clips
+    if clips is None:
+        clips = sorted(glob.glob(os.path.join(ROOT, "result_videos", "*.avi")))
+    inputs = [(clip, -1, None) for clip in clips]
+
+    synthetic_dir = tempfile.mkdtemp()
+    for faces_number in arguments.face_counts:
+        path = os.path.join(synthetic_dir, "synthetic_" + str(faces_number) + "_faces.avi")
+        inputs.append((path, faces_number, generate_synthetic_clip(path, faces_number)))
+
+    context = multiprocessing.get_context("spawn")
+    results = {
+        "environment": {"python": platform.python_version(), "machine": platform.machine(),
+                        "processor": platform.processor(), "cpu_count": multiprocessing.cpu_count(),
+                        "max_frames": arguments.max_frames, "writer_preset": arguments.writer_preset},
+        "cases": []
+    }
+    try:
+        for clip, faces_number, ground_truth in inputs:
+            for sticker in arguments.stickers:
+                pool = context.Pool(1)  # fresh process for each case
+                try:
+                    case = pool.apply(run_case, (clip, sticker, faces_number, arguments.max_frames, ground_truth,
+                                                 arguments.trace_allocations, arguments.writer_preset))
+                finally:
+                    pool.close()
+                    pool.join()
+                results["cases"].append(case)
+                print(case_key(case) + ": " + str(round(case["fps"], 2)) + " fps, "
+                      + ", ".join(stage + " " + str(round(case["stages_ms_per_frame"][stage], 2)) + " ms"
+                                  for stage in STAGES)
+                      + ", peak RSS " + str(round(case["peak_rss_mb"], 1)) + " MB")
+    finally:
+        shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if arguments.save_baseline is not None:
+        with open(arguments.save_baseline, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), arguments.tolerance)
+        if len(regressions) > 0:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import cv2
+from detectors import create_detector, DEFAULT_DETECTOR
+from tracking import box_iou
+
+DEFAULT_CANDIDATES = ["hog", "haar", "lbp", "lbp+hog", "haar+hog"]
+DEFAULT_CLIPS = os.path.join("result_videos", "*.avi")
+
+
+def read_frames(path, max_frames):
+    """Reads first frames of clip.
+
+    :param path: path of clip
+    :param max_frames: maximal number of frames
+    :returns: generator of frames
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        frames = 0
+        while frames < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def match_faces(faces, reference):
+    """Counts faces that match reference faces, i.e. overlap them with IoU of at least 0.5.
+
+    :param faces: list of face bounds
+    :param reference: list of reference face bounds
+    :returns: number of matched reference faces
+    """
+    return sum(1 for known in reference if max([box_iou(known, face) for face in faces] + [0.0]) >= 0.5)
+
+
+def calibrate_detector(name, clips, faces_number=-1, max_frames=100, min_face_size=None, reference=None):
+    """Measures speed and detection success of detector backend on clips. Only detection is timed.
+
+    :param name: name of detector backend
+    :param clips: paths of clips
+    :param faces_number: number of faces in each frame, -1 if unknown
+    :param max_frames: maximal number of frames per clip
+    :param min_face_size: width (in pixels) of smallest expected face, None for default of backend
+    :param reference: dict with list of face bounds of each frame by clip, from reference backend, None if
+           not available
+    :returns: dict with measurements and detected faces of each frame by clip, None if backend is not available
+    """
+    detector = create_detector(name, min_face_size)
+    elapsed = 0.0
+    frames = 0
+    successful = 0
+    detected = 0
+    matched = 0
+    known = 0
+    faces_by_clip = {}
+    for clip in clips:
+        faces_by_clip[clip] = []
+        for idx, frame in enumerate(read_frames(clip, max_frames)):
+            start = time.perf_counter()
+            try:
+                faces = detector.detect(frame)
+            except (ImportError, RuntimeError, cv2.error) as e:
+                print("Detector " + name + " is not available: " + str(e) + "!")
+                return None
+            elapsed += time.perf_counter() - start
+            faces_by_clip[clip].append(faces)
+            frames += 1
+            detected += len(faces)
+            if faces_number != -1 and len(faces) == faces_number:
+                successful += 1
+            if reference is not None and idx < len(reference[clip]):
+                known += len(reference[clip][idx])
+                matched += match_faces(faces, reference[clip][idx])
+    result = {
+        "detector": name,
+        "frames": frames,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "ms_per_frame": elapsed * 1000 / max(frames, 1),
+        "faces_per_frame": detected / float(max(frames, 1)),
+        "success": successful / float(frames) if faces_number != -1 and frames > 0 else None,
+        "recall": matched / float(known) if known > 0 else None,
+        "precision": matched / float(detected) if reference is not None and detected > 0 else None,
+        "faces": faces_by_clip
+    }
+    if hasattr(detector, "confirmed"):
+        result["confirmed"] = detector.confirmed / float(max(detector.candidates, 1))
+    return result
+
+
+def f1_score(recall, precision):
+    """Calculates harmonic mean of recall and precision.
+
+    :param recall: recall, None if unknown
+    :param precision: precision, None if unknown
+    :returns: F1 score, None if recall or precision is unknown
+    """
+    if recall is None or precision is None:
+        return None
+    return 2 * recall * precision / (recall + precision) if recall + precision > 0 else 0.0
+
+
+def rank(results):
+    """Orders results from best to worst: by detection success (or F1 score against reference when number of
+    faces is unknown), then by fps.
+
+    :param results: list of calibration results
+    :returns: sorted list of results
+    """
+    def score(result):
+        accuracy = result["success"] if result["success"] is not None else \
+            f1_score(result["recall"], result["precision"])
+        return accuracy if accuracy is not None else 0.0, result["fps"]
+    return sorted(results, key=score, reverse=True)
+
+
+def recommend(ranked, min_fps):
+    """Chooses most successful backend that is fast enough.
+
+    :param ranked: results ordered by rank
+    :param min_fps: minimal required fps
+    :returns: result of chosen backend, None if no backend is fast enough
+    """
+    for result in ranked:
+        if result["fps"] >= min_fps:
+            return result
+    return None
+
+
+def percent(value):
+    return "-" if value is None else str(round(value * 100, 1)) + " %"
+
+
+def parse_arguments(argv):
+    """Parses command line arguments of calibration.
+
+    :param argv: list of command line arguments
+    :returns: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Ranks face detector backends by fps and detection success "
+                                                 "on clips, so backend can be chosen for each deployment.")
+    parser.add_argument("clips", nargs="*", default=None,
+                        help="clips or glob patterns, " + DEFAULT_CLIPS + " if omitted")
+    parser.add_argument("--detectors", nargs="+", default=DEFAULT_CANDIDATES,
+                        help="detector backends, first pass and verifier joined by +")
+    parser.add_argument("--faces", type=int, default=-1, help="number of faces in each frame of clips")
+    parser.add_argument("--reference", default=DEFAULT_DETECTOR,
+                        help="backend whose detections are taken as correct for recall and precision")
+    parser.add_argument("--max-frames", type=int, default=100, help="maximal number of frames per clip")
+    parser.add_argument("--min-face-size", type=int, default=None, help="width of smallest expected face")
+    parser.add_argument("--min-fps", type=float, default=0.0, help="minimal fps of recommended backend")
+    parser.add_argument("--output", default=None, help="JSON file with results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Calibrates detector backends and prints them ordered by rank.
+
+    :param argv: list of command line arguments, sys.argv is used if None
+    :returns: exit code
+    """
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    clips = []
+    for pattern in arguments.clips or [DEFAULT_CLIPS]:
+        clips.extend(sorted(glob.glob(pattern)) or [pattern])
+    faces_number = arguments.faces if arguments.faces > 0 else -1
+    try:
+        for name in set(arguments.detectors + [arguments.reference]):
+            create_detector(name)
+    except ValueError as e:
+        print(str(e))
+        return 2
+
+    results = []
+    reference = calibrate_detector(arguments.reference, clips, faces_number, arguments.max_frames,
+                                   arguments.min_face_size)
+    reference_faces = reference["faces"] if reference is not None else None
+    for name in arguments.detectors:
+        if name == arguments.reference:
+            result = reference  # its detections are correct by definition
+            if result is not None and result["faces_per_frame"] > 0:
+                result["recall"], result["precision"] = 1.0, 1.0
+        else:
+            result = calibrate_detector(name, clips, faces_number, arguments.max_frames, arguments.min_face_size,
+                                        reference_faces)
+        if result is not None:
+            results.append(result)
+    if len(results) == 0:
+        print("No detector backend is available!")
+        return 1
+    if faces_number == -1 and reference is None:
+        print("Number of faces and reference detections are unknown, backends are ranked only by fps!")
+
+    ranked = rank(results)
+    print("Detector backends on " + str(ranked[0]["frames"]) + " frames of " + str(len(clips)) + " clips:")
+    for position, result in enumerate(ranked):
+        line = str(position + 1) + ". " + result["detector"] + ": " + str(round(result["fps"], 2)) + " fps, " \
+            + "success " + percent(result["success"]) + ", recall " + percent(result["recall"]) \
+            + ", precision " + percent(result["precision"]) + ", " \
+            + str(round(result["faces_per_frame"], 2)) + " faces per frame"
+        if "confirmed" in result:
+            line += ", verifier confirmed " + percent(result["confirmed"]) + " of candidates"
+        print(line)
+    chosen = recommend(ranked, arguments.min_fps)
+    if chosen is None:
+        print("No backend reaches " + str(arguments.min_fps) + " fps!")
+    else:
+        print("Recommended: --detector " + chosen["detector"])
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output:
+            json.dump({"clips": clips, "faces_number": faces_number, "reference": arguments.reference,
+                       "results": [dict((key, value) for key, value in result.items() if key != "faces")
+                                   for result in ranked],
+                       "recommended": chosen["detector"] if chosen is not None else None},
+                      output, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,9 @@
+import math
+import os
 import cv2
 from pathlib import Path
+from video_io import TimestampedGrabber, FrameWriter
+from video_writers import create_video_writer, DEFAULT_FPS
 
 
 def generate_path(path):
@@ -26,51 +30,93 @@ def generate_path(path):
     return result_path
 
 
-def record_from_camera(path, window):
+def record_from_camera(path, window, countdown=5.0, duration=5.0, camera_index=0, show=True, cap=None):
     """ Method used for recording video from camera.
         Recorded video is being saved in .avi format
-        on the system.
+        on the system. Frames are grabbed on dedicated
+        thread with their timestamps and encoded on
+        another thread, so showing frames does not slow
+        down capture, and recorded video has frame rate
+        and resolution measured on camera.
 
     :param path: path to the file
     :param window: main window instance
-    :return: path to recorded video
+    :param countdown: number of seconds before recording starts
+    :param duration: number of seconds of recording
+    :param camera_index: index of camera device
+    :param show: indicator whether camera feed is shown
+    :param cap: opened video capture that is used instead of camera, e.g. for testing
+    :return: path to recorded video, None if nothing is recorded
     """
-    window.hide()
     output_path = generate_path(path)  # generate output video path
+    cam = cap if cap is not None else cv2.VideoCapture(camera_index)
+    grabber = TimestampedGrabber(cam, transform=lambda frame: cv2.flip(frame, 1))  # flipped frames
+    video_writer = None
+    window.hide()
     try:
-        cam = cv2.VideoCapture(0)
-        video_writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc('M','J','P','G'), 10, (640, 480))
-
-        frame_counter = 0
-        while cam.isOpened():
-            ret, frame = cam.read()
-            if ret:
-                frame = cv2.flip(frame, 1)
-                # write the flipped frame
+        start = None
+        recording_start = None
+        last_announced = None
+        recorded = 0
+        gaps = 0    # intervals between recorded frames much longer than expected, i.e. frames lost by camera
+        last_timestamp = None
 
-                if (160 - frame_counter) % 32 == 0 and frame_counter <= 160:
-                    if frame_counter == 160:
-                        print("Recording started!")
-                    else:
-                        print("Recording starting in " + str(int((160 - frame_counter) / 32)) + " seconds!")
-
-                if frame_counter >= 160:
-                    video_writer.write(frame)
+        for frame, timestamp in grabber:
+            if start is None:
+                start = timestamp
+            if timestamp - start < countdown:
+                remaining = int(math.ceil(countdown - (timestamp - start)))
+                if remaining != last_announced:
+                    print("Recording starting in " + str(remaining) + " seconds!")
+                    last_announced = remaining
+            else:
+                if video_writer is None:
+                    fps = grabber.measured_fps() or cam.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS  # measured in countdown
+                    video_writer = FrameWriter(create_video_writer(output_path, fps, grabber.resolution), 64)
+                    recording_start = timestamp
+                    print("Recording started!")
+                if timestamp - recording_start >= duration:
+                    break
+                if last_timestamp is not None and timestamp - last_timestamp > 2.0 / fps:
+                    gaps += 1
+                video_writer.write(frame)
+                recorded += 1
+                last_timestamp = timestamp
 
+            if show and grabber.pending() <= 1:     # feed is shown only when capture is not falling behind
                 cv2.imshow('frame', frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
-                if frame_counter >= 320:
-                    break
-                frame_counter += 1
-            else:
-                break
-
-        cam.release()
-        video_writer.release()
-        cv2.destroyAllWindows()
-    except:
-        pass
-    window.show()
-    return output_path
\ No newline at end of file
+        if video_writer is None:
+            print("No video is recorded, camera is not available!")
+            output_path = None
+        else:
+            if recorded > 1 and last_timestamp > recording_start:
+                recorded_fps = (recorded - 1) / (last_timestamp - recording_start)
+                video_writer.writer.set_fps(recorded_fps)   # real rate of recorded frames
+                print("Recorded " + str(recorded) + " frames at " + str(round(recorded_fps, 2)) + " fps ("
+                      + str(grabber.resolution[0]) + "x" + str(grabber.resolution[1]) + "), "
+                      + str(grabber.dropped) + " dropped, " + str(gaps) + " gaps!")
+            writer, video_writer = video_writer, None
+            writer.close()
+            print(writer.stats.report())
+        print(grabber.stats.report())
+    except (cv2.error, IOError, ValueError) as e:
+        print("Error recording video: " + str(e) + "!")
+        if video_writer is not None:
+            try:
+                video_writer.close()
+            except (cv2.error, IOError):
+                pass    # the same error is already reported
+        if os.path.isfile(output_path):
+            os.remove(output_path)  # incomplete recording
+        output_path = None
+    finally:
+        grabber.stop()
+        if cap is None:
+            cam.release()
+        if show:
+            cv2.destroyAllWindows()
+        window.show()
+    return output_path
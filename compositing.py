@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+
+class PreparedSticker(object):
+    """
+    Represents sticker prepared for compositing: color channels premultiplied by alpha and inverse alpha
+    (repeated for each color channel), both kept as uint8 so that compositing needs only integer arithmetic.
+    """
+    __slots__ = ("color", "inverse_alpha")
+
+    def __init__(self, color, inverse_alpha):
+        """Initializes prepared sticker.
+
+        :param self: self
+        :param color: premultiplied color channels (height x width x 3)
+        :param inverse_alpha: 255 - alpha (height x width x 3)
+        """
+        self.color = color
+        self.inverse_alpha = inverse_alpha
+
+    @property
+    def shape(self):
+        """Returns height and width of sticker.
+
+        :param self: self
+        :return: tuple (height, width)
+        """
+        return self.color.shape[0], self.color.shape[1]
+
+
+def prepare_sticker(sticker):
+    """ Premultiplies sticker colors with alpha channel. This is done once
+        per sticker variant instead of once per channel for every frame.
+
+    :param sticker: sticker image with 3 (opaque) or 4 channels
+    :return: prepared sticker
+    """
+    if sticker.shape[2] < 4:
+        color = np.ascontiguousarray(sticker[:, :, :3])
+        inverse_alpha = np.zeros(sticker.shape[:2] + (3,), dtype=np.uint8)
+    else:
+        alpha = sticker[:, :, 3:4].astype(np.uint16)
+        color = ((sticker[:, :, :3] * alpha + 127) // 255).astype(np.uint8)
+        inverse_alpha = np.repeat((255 - alpha).astype(np.uint8), 3, axis=2)
+    color.flags.writeable = False
+    inverse_alpha.flags.writeable = False
+    return PreparedSticker(color, inverse_alpha)
+
+
+def clip_placement(image_shape, sticker_shape, cor_x, cor_y):
+    """ Clips sticker placement to the frame.
+
+    :param image_shape: shape of the frame
+    :param sticker_shape: height and width of the sticker
+    :param cor_x: x coordinate of the upper left corner of the sticker, can be outside the frame
+    :param cor_y: y coordinate of the upper left corner of the sticker, can be outside the frame
+    :return: (x, y, width, height) of visible part of the sticker in the frame and (x, y) offset of that part
+             inside the sticker, or None if sticker is not visible at all
+    """
+    x0, y0 = max(cor_x, 0), max(cor_y, 0)
+    x1 = min(cor_x + sticker_shape[1], image_shape[1])
+    y1 = min(cor_y + sticker_shape[0], image_shape[0])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0), (x0 - cor_x, y0 - cor_y)
+
+
+def composite(image, sticker, cor_x, cor_y):
+    """ Blends prepared sticker into the frame in place:
+        frame = color + frame * (255 - alpha) / 255, rounded and
+        saturated by opencv, so only uint8 temporary of the size
+        of visible part of the sticker is created.
+
+    :param image: frame (uint8, 3 channels) that is modified
+    :param sticker: prepared sticker
+    :param cor_x: x coordinate of the upper left corner of the sticker, can be outside the frame
+    :param cor_y: y coordinate of the upper left corner of the sticker, can be outside the frame
+    :return: (x, y, width, height) of visible part of the sticker, or None if it is not visible
+    """
+    placement = clip_placement(image.shape, sticker.shape, cor_x, cor_y)
+    if placement is None:
+        return None
+    (x, y, w, h), (sx, sy) = placement
+    roi = image[y:y + h, x:x + w]
+    background = cv2.multiply(roi, sticker.inverse_alpha[sy:sy + h, sx:sx + w], scale=1 / 255.0)
+    cv2.add(background, sticker.color[sy:sy + h, sx:sx + w], dst=roi)
+    return x, y, w, h
+
+
+def composite_all(image, placements):
+    """ Blends stickers of all faces in the frame in one pass.
+
+    :param image: frame that is modified
+    :param placements: list of (prepared sticker, x, y)
+    :return: list of visible sticker rectangles (or None) in same order as placements
+    """
+    return [composite(image, sticker, cor_x, cor_y) for sticker, cor_x, cor_y in placements]
@@ -0,0 +1,177 @@
+import math
+import queue
+import threading
+import time
+import cv2
+from detectors import cascade_face_locations
+from tracking import box_iou
+
+EVALUATION_DEPTH = 8    # maximal number of sampled frames waiting for opencv detection
+CV_SAMPLE_INTERVAL = 10     # every n-th frame is compared with opencv, Haar cascade on every frame is too slow
+CLOSE_TIMEOUT = 1.0     # maximal number of seconds that render waits for opencv after last frame
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Calculates Wilson score interval of success rate, it stays inside [0, 1] even for small samples.
+
+    :param successes: number of successful trials
+    :param trials: number of trials
+    :param z: quantile of normal distribution, 1.96 for 95 % confidence
+    :returns: lower and upper bound of success rate, (0, 1) if there are no trials
+    """
+    if trials <= 0:
+        return 0.0, 1.0
+    rate = successes / float(trials)
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def rate_with_interval(successes, trials):
+    """Creates success rate with its 95 % confidence interval.
+
+    :param successes: number of successful trials
+    :param trials: number of trials
+    :returns: dict with rate, lower and upper bound and number of trials, None if there are no trials
+    """
+    if trials <= 0:
+        return None
+    low, high = wilson_interval(successes, trials)
+    return {"rate": successes / float(trials), "low": low, "high": high, "trials": trials}
+
+
+class CrossCheck(object):
+    """
+    Represents evaluation pass that compares faces found by render detector with faces found by opencv Haar
+    cascade. Grayscale copies of sampled frames (which cascade needs anyway) are taken before anything is drawn
+    on them, and opencv detects faces on its own thread, so render never waits for it. Only counters are kept,
+    they are updated as soon as opencv evaluates a frame. Sampled frames that arrive while evaluation is
+    behind are dropped and counted instead.
+    """
+    def __init__(self, faces_number=-1, sample_interval=CV_SAMPLE_INTERVAL, depth=EVALUATION_DEPTH, locator=None,
+                 close_timeout=CLOSE_TIMEOUT):
+        """Initializes cross-check and starts its thread.
+
+        :param self: self
+        :param faces_number: number of expected faces in frame, -1 if unknown (only agreement is evaluated)
+        :param sample_interval: every sample_interval-th frame is evaluated, 1 for every frame
+        :param depth: maximal number of sampled frames waiting for render detector and for opencv detection
+        :param locator: function that detects positions of faces on grayscale frame, Haar cascade on whole frame
+               if None
+        :param close_timeout: maximal number of seconds that close waits for queued frames, the rest is dropped
+        """
+        self.faces_number = faces_number
+        self.sample_interval = max(int(sample_interval), 1)
+        self.depth = depth
+        self.locator = locator if locator is not None else cascade_face_locations
+        self.close_timeout = close_timeout
+        self.pending = {}   # grayscale sampled frames waiting for render detections, at most depth of them
+        self.frames = queue.Queue(depth)
+        self.deadline = None    # time after which queued frames are dropped, set by close
+        self.dropped = 0        # sampled frames dropped on render thread
+        self.expired = 0        # queued frames dropped on evaluation thread after deadline
+        self.evaluated = 0
+        self.cv_successful = 0
+        self.detected_successful = 0
+        self.detected = 0
+        self.matched = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.detect_loop, daemon=True)
+        self.thread.start()
+
+    def is_sampled(self, idx):
+        """Tells if frame is evaluated.
+
+        :param self: self
+        :param idx: index of frame
+        :returns: indicator whether frame is sampled
+        """
+        return idx % self.sample_interval == 0
+
+    def observe(self, frames):
+        """Passes frames through and keeps grayscale copy of each sampled one until render detections of it
+        are added. Nothing is converted if evaluation is behind.
+
+        :param self: self
+        :param frames: iterable of frames
+        :returns: generator of the same frames
+        """
+        for idx, frame in enumerate(frames):
+            if self.is_sampled(idx):
+                if self.frames.full() or len(self.pending) >= self.depth:
+                    self.dropped += 1
+                else:
+                    self.pending[idx] = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # frame is drawn on afterwards
+            yield frame
+
+    def add_detections(self, idx, faces):
+        """Queues sampled frame together with faces that render detector found on it for opencv detection.
+
+        :param self: self
+        :param idx: index of frame
+        :param faces: list of face bounds (top, right, bottom, left)
+        """
+        gray = self.pending.pop(idx, None)
+        if gray is None:
+            return  # frame is not sampled or it is dropped
+        try:
+            self.frames.put_nowait((gray, faces))
+        except queue.Full:
+            self.dropped += 1
+
+    def detect_loop(self):
+        """Detects faces on queued frames and updates counters until None is received.
+
+        :param self: self
+        """
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            if self.error is not None or (self.deadline is not None and time.monotonic() > self.deadline):
+                self.expired += 1
+                continue
+            gray, faces = item
+            try:
+                self.count(faces, self.locator(gray))
+            except Exception as e:
+                self.error = e
+
+    def count(self, faces, cv_faces):
+        """Adds comparison of detections of one frame to counters.
+
+        :param self: self
+        :param faces: list of face bounds found by render detector
+        :param cv_faces: list of face bounds found by opencv
+        """
+        self.evaluated += 1
+        self.cv_successful += int(len(cv_faces) == self.faces_number)
+        self.detected_successful += int(len(faces) == self.faces_number)
+        self.detected += len(faces)
+        self.matched += sum(1 for face in faces if max([box_iou(face, other) for other in cv_faces] + [0.0]) >= 0.5)
+
+    def close(self):
+        """Waits at most close_timeout seconds (and for frame that is being evaluated) for queued frames, drops
+        the rest and compares detections of evaluated frames.
+
+        :param self: self
+        :returns: dict with number of evaluated and dropped frames, detection success of opencv and render
+                  detector (only if number of faces is known) and agreement of opencv with render detector,
+                  each of them with 95 % confidence interval
+        """
+        self.deadline = time.monotonic() + self.close_timeout
+        self.pending.clear()
+        self.frames.put(None)   # waits only until evaluation thread takes next frame
+        self.thread.join()
+        if self.error is not None:
+            print("Error in opencv cross-check: " + str(self.error) + "!")
+        known = self.faces_number != -1
+        return {
+            "frames": self.evaluated,
+            "dropped": self.dropped + self.expired,
+            "sample_interval": self.sample_interval,
+            "cv_success": rate_with_interval(self.cv_successful, self.evaluated) if known else None,
+            "detector_success": rate_with_interval(self.detected_successful, self.evaluated) if known else None,
+            "agreement": rate_with_interval(self.matched, self.detected)  # share of faces that opencv found as well
+        }
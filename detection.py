@@ -1,27 +1,49 @@
-import PIL.Image
-import dlib
 import numpy as np
-import face_recognition_models
 import cv2
+import math
+import os
 import time
+from collections import deque
 from pathlib import Path
 from filters import *
-
-
-face_detector = dlib.get_frontal_face_detector()
-model_68_points = face_recognition_models.pose_predictor_model_location()
-predictor_68_point = dlib.shape_predictor(model_68_points)
-face_cascade = cv2.CascadeClassifier(face_recognition_models.haar_cascade_frontal_face_model_location())
-eye_cascade = cv2.CascadeClassifier(face_recognition_models.haar_cascade_eye_model_location())
-
-
-def rect_to_bounds(rect):
-    """Extracts bounds of rectangle.
-
-    :param rect: rectangular shape
-    :returns: bounds of rect
+from tracking import FaceTracker, box_iou
+from roi import RoiDetector
+from detectors import rect_to_bounds, detect_rect_bounds, detect_face_location, detection_scale, \
+    hog_face_locations, cascade_face_locations, create_detector, DEFAULT_DETECTOR, HOG_WINDOW_SIZE
+from parallel import ParallelFramePipeline
+from video_io import FrameReader, FrameWriter
+from video_writers import create_video_writer, writer_extension, DEFAULT_PRESET
+from instrumentation import metrics, timed, RunningStats, MetricsDumper
+from sticker_registry import sticker_registry
+from landmarks import FaceLandmarks, POINTS_NUMBER, LANDMARK_MODEL_POINTS, DEFAULT_LANDMARK_MODEL, \
+    cheapest_landmark_model, estimate_points
+from iou import IouTable
+from detection_cache import DetectionRecorder
+from cross_check import CrossCheck, CV_SAMPLE_INTERVAL
+import models
+
+
+MODEL_ATTRIBUTES = {    # models that used to be loaded at import, now loaded on first access
+    "face_detector": models.get_face_detector,
+    "predictor_68_point": models.get_predictor_68_point,
+    "predictor_5_point": models.get_predictor_5_point,
+    "face_cascade": models.get_face_cascade,
+    "lbp_cascade": models.get_lbp_cascade,
+    "eye_cascade": models.get_eye_cascade
+}
+
+
+def __getattr__(name):
+    """Loads model on first access to its module attribute, e.g. detection.face_detector.
+
+    :param name: name of attribute
+    :returns: model
     """
-    return rect.top(), rect.right(), rect.bottom(), rect.left()
+    if name in MODEL_ATTRIBUTES:
+        return MODEL_ATTRIBUTES[name]()
+    if name == "model_68_points":
+        return models.face_recognition_models.pose_predictor_model_location()
+    raise AttributeError("module " + __name__ + " has no attribute " + name)
 
 
 def bounds_to_rect(bounds):
@@ -30,56 +52,88 @@ def bounds_to_rect(bounds):
     :param bounds: bounds of rectangular shape
     :returns: rectangle
     """
+    import dlib
     return dlib.rectangle(bounds[3], bounds[0], bounds[1], bounds[2])
 
 
-def detect_rect_bounds(bounds, image_shape):
-    """Detects bounds of rectangle.
-
-    :param bounds: bounds of rectangular shape
-    :param image_shape: shape of image
-    :returns: bounds of rectangle
-    """
-    return max(bounds[0], 0), min(bounds[1], image_shape[1]), min(bounds[2], image_shape[0]), max(bounds[3], 0)
-
-
 def load_image_file(file):
     """Loads image from file.
 
     :param file: image file
     :returns: image as numpy array
     """
+    import PIL.Image
     im = PIL.Image.open(file)
     im = im.convert('RGB')
     return np.array(im)
 
 
-def detect_face_location(image, number_of_times=1):
-    """Detects faces on image.
-
-    :param image: image with potential faces
-    :param number_of_times: number of times to try detecting faces
-    :returns: detected faces
-    """
-    return face_detector(image, number_of_times)
-
-
-def face_locations(image, number_of_times=1):
+def face_locations(image, number_of_times=1, min_face_size=None):
     """Detects positions of faces on image.
 
     :param image: image with potential faces
     :param number_of_times: number of times to try detecting faces
+    :param min_face_size: width (in pixels) of smallest expected face, if provided faces are detected
+           on downscaled copy of image and number_of_times is chosen according to it
     :returns: list of detected faces
     """
-    return [detect_rect_bounds(rect_to_bounds(face), image.shape)
-            for face in detect_face_location(image, number_of_times)]
+    return hog_face_locations(image, number_of_times, min_face_size)
 
 
-def predict_face_landmarks(face_image, location_of_faces=None,):
+class AdaptiveFaceLocator(object):
+    """
+    Represents face locator that detects faces on working resolution adapted to the smallest face seen recently.
+    """
+    def __init__(self, min_face_size=80, history=30, refresh_interval=30, size_margin=0.75):
+        """Initializes face locator.
+
+        :param self: self
+        :param min_face_size: width (in pixels) of smallest expected face
+        :param history: number of recent frames whose faces are considered
+        :param refresh_interval: number of frames after which detection with min_face_size is done,
+               so faces smaller than recently seen ones are found
+        :param size_margin: share of smallest recent face width that is still detected
+        """
+        self.min_face_size = min_face_size
+        self.refresh_interval = refresh_interval
+        self.size_margin = size_margin
+        self.recent_sizes = deque(maxlen=history)   # smallest face width for each recent frame with faces
+        self.frame_counter = 0
+
+    def current_face_size(self):
+        """Calculates width of smallest face that is detected on next frame.
+
+        :param self: self
+        :returns: face width in pixels
+        """
+        if len(self.recent_sizes) == 0:
+            return self.min_face_size
+        adapted = min(self.recent_sizes) * self.size_margin
+        if self.frame_counter % self.refresh_interval == 0:
+            return min(adapted, self.min_face_size)
+        return adapted
+
+    def __call__(self, image):
+        """Detects positions of faces on image.
+
+        :param self: self
+        :param image: image with potential faces
+        :returns: list of detected faces
+        """
+        faces = face_locations(image, min_face_size=self.current_face_size())
+        self.frame_counter += 1
+        if len(faces) > 0:
+            self.recent_sizes.append(min(face[1] - face[3] for face in faces))
+        return faces
+
+
+@timed("predict_face_landmarks")
+def predict_face_landmarks(face_image, location_of_faces=None, model=DEFAULT_LANDMARK_MODEL):
     """Predicts landmarks on faces.
 
     :param face_image: image with faces
     :param location_of_faces: locations of detected faces
+    :param model: name of landmark model, "predictor_68_point" or "predictor_5_point"
     :returns: list of landmarks' locations
     """
     if location_of_faces is None:
@@ -87,66 +141,130 @@ def predict_face_landmarks(face_image, location_of_faces=None,):
     else:
         location_of_faces = [bounds_to_rect(face_location) for face_location in location_of_faces]
 
-    return [predictor_68_point(face_image, face_location) for face_location in location_of_faces]
+    predictor = models.registry.get(model)
+    return [predictor(face_image, face_location) for face_location in location_of_faces]
 
 
-def face_landmarks(face_image, location_of_faces=None):
+def face_landmark_points(face_image, location_of_faces=None, model=DEFAULT_LANDMARK_MODEL):
     """Predicts landmarks on faces.
 
     :param face_image: image with faces
     :param location_of_faces: locations of detected faces
+    :param model: name of landmark model, points that 5 point model does not predict are estimated
+    :returns: (faces, 68, 2) int32 array of landmarks' points (x, y) for each face
+    """
+    landmarks = predict_face_landmarks(face_image, location_of_faces, model)
+    points = np.array([[(p.x, p.y) for p in landmark.parts()] for landmark in landmarks],
+                      dtype=np.int32).reshape(-1, LANDMARK_MODEL_POINTS[model], 2)
+    if points.shape[1] != POINTS_NUMBER:
+        points = estimate_points(points)
+    return points
+
+
+def face_landmarks(face_image, location_of_faces=None, model=DEFAULT_LANDMARK_MODEL):
+    """Predicts landmarks on faces.
+
+    :param face_image: image with faces
+    :param location_of_faces: locations of detected faces
+    :param model: name of landmark model
+    :returns: face landmarks, indexing them gives dict of each face's landmarks' locations
+    """
+    return FaceLandmarks(face_landmark_points(face_image, location_of_faces, model))
+
+
+def landmark_model_for(chosen_filters):
+    """Chooses cheapest available landmark model that provides landmarks all chosen filters need.
+
+    :param chosen_filters: list of chosen filters, "" for frames without sticker
+    :returns: name of landmark model
+    """
+    regions = set()
+    for chosen_filter in chosen_filters:
+        spec = sticker_registry.get(chosen_filter) if chosen_filter != "" else None
+        if spec is not None:
+            regions.update(spec.required_landmarks)
+        elif chosen_filter != "":
+            return DEFAULT_LANDMARK_MODEL   # unknown sticker, e.g. from pack that is not loaded
+    return cheapest_landmark_model(regions, models.is_available)
+
+
+def landmark_points_to_dicts(landmarks_as_tuples):
+    """Groups landmarks' points by face parts.
+
+    :param landmarks_as_tuples: landmarks' points (x, y) for each face
     :returns: list of dicts from each face's landmarks' locations
     """
-    landmarks = predict_face_landmarks(face_image, location_of_faces)
-    landmarks_as_tuples = [[(p.x, p.y) for p in landmark.parts()] for landmark in landmarks]
-    return [{
-        "chin": points[0:17],
-        "left_eyebrow": points[17:22],
-        "right_eyebrow": points[22:27],
-        "nose_bridge": points[27:31],
-        "nose_tip": points[31:36],
-        "left_eye": points[36:42],
-        "right_eye": points[42:48],
-        "top_lip": points[48:55] + [points[64]] + [points[63]] + [points[62]] + [points[61]] + [points[60]],
-        "bottom_lip": points[54:60] + [points[48]] + [points[60]] +
-                      [points[67]] + [points[66]] + [points[65]] + [points[64]]
-    } for points in landmarks_as_tuples]
-
-
-def detect_dlib(img, faces_number, draw_rectangles, chosen_filter, intersections):
+    return FaceLandmarks(landmarks_as_tuples).as_dicts()
+
+
+def create_face_tracker(keyframe_interval, min_confidence=0.7, locator=None, landmark_model=DEFAULT_LANDMARK_MODEL):
+    """Creates tracker that detects faces with dlib only on keyframes.
+
+    :param keyframe_interval: number of frames between two full detections
+    :param min_confidence: minimal share of reliably tracked landmarks before full detection is forced
+    :param locator: function that detects positions of faces on keyframes, full resolution detection if None
+    :param landmark_model: name of landmark model
+    :returns: face tracker
+    """
+    if locator is None:
+        locator = lambda image: face_locations(image, number_of_times=1)
+    return FaceTracker(locator, lambda image, faces: face_landmark_points(image, faces, landmark_model),
+                       keyframe_interval, min_confidence)
+
+
+def draw_face_rectangles(img, faces, color):
+    """Draws rectangles that bound faces.
+
+    :param img: frame
+    :param faces: list of face bounds (top, right, bottom, left)
+    :param color: color of rectangles
+    """
+    for (top, right, bottom, left) in faces:
+        cv2.rectangle(img, (left, top), (right, bottom), color, 2)
+
+
+def detect_dlib(img, faces_number, draw_rectangles, chosen_filter, intersections, tracker=None, locator=None,
+                iou_table=None, known_detections=None, detected=None, landmark_model=DEFAULT_LANDMARK_MODEL):
     """Detects faces using dlib library.
 
     :param img: frame
     :param faces_number: number of expected faces in frame
     :param draw_rectangles: indicator whether rectangles that bound detected faces and 68 points should be drawn
     :param chosen_filter: chosen filter that is attached to detected faces
-    :param intersections: list of intersections for frames
+    :param intersections: list or streaming aggregate to which average intersection of frame is appended
+    :param tracker: face tracker used between keyframes, if None faces are detected on every frame
+    :param locator: function that detects positions of faces, full resolution detection if None
+    :param iou_table: iou table to which rectangles of attached stickers are added, evaluated later in batch
+           instead of appending average intersection to intersections, None if not needed
+    :param known_detections: face bounds and landmark points that were already detected on this frame (e.g.
+           loaded from detection cache), None for detecting them
+    :param detected: list to which face bounds and landmark points of frame are appended, None if not needed
+    :param landmark_model: name of landmark model used when tracker is not used
     :returns: result image and indicator that tells if correct number of faces is detected
     """
-    faces = face_locations(img, number_of_times=1)
-    face_landmarks_list = face_landmarks(img, faces)
+    if known_detections is not None:
+        faces, points = known_detections
+        face_landmarks_list = FaceLandmarks(points)
+    elif tracker is None:
+        faces = locator(img) if locator is not None else face_locations(img, number_of_times=1)
+        face_landmarks_list = face_landmarks(img, faces, landmark_model)
+    else:
+        faces, points = tracker.update(img)
+        face_landmarks_list = FaceLandmarks(points)
+    if detected is not None:
+        detected.append((faces, face_landmarks_list.points))
 
     if draw_rectangles:
-        for idx, located_face in enumerate(faces):
-            face = bounds_to_rect(located_face)
-            x = face.left()
-            y = face.top()
-            w = face.right() - x
-            h = face.bottom() - y
-            cv2.rectangle(img, (x, y), (x + w, y + h), (255, 0, 0), 2)
-
-            f = face_landmarks_list[idx]  # landmarks that belong to face
-            for key, value in f.items():
-                for i in value:
-                    try:
-                        img[i[1]][i[0]] = (0, 0, 255)
-                    except:
-                        pass
+        draw_face_rectangles(img, faces, (255, 0, 0))
+        points = face_landmarks_list.points.reshape(-1, 2)  # landmarks of all faces
+        inside = (points[:, 0] >= 0) & (points[:, 0] < img.shape[1]) & (points[:, 1] >= 0) & \
+                 (points[:, 1] < img.shape[0])
+        img[points[inside, 1], points[inside, 0]] = (0, 0, 255)
 
     if chosen_filter != "":
         frame_intersections = []
-        for idx, face in enumerate(faces):      # attach filter to each face
-            put_filter_on(img, face, face_landmarks_list[idx], chosen_filter, frame_intersections)
+        put_filters_on(img, faces, face_landmarks_list, chosen_filter, frame_intersections,
+                       iou_table=iou_table)    # attach to each face
         if len(frame_intersections) > 0:
             inters = sum(frame_intersections) / len(frame_intersections)    # average intersection for frame
             intersections.append(inters)
@@ -157,28 +275,75 @@ def detect_dlib(img, faces_number, draw_rectangles, chosen_filter, intersections
         return img, len(faces) == faces_number
 
 
-def detect_cv(f, faces_number, draw_rectangles):
+def dlib_region_locations(image, size_range=None):
+    """Detects positions of faces on image region using dlib library.
+
+    :param image: image region with potential faces
+    :param size_range: range (min, max) of face widths that are searched, if None faces are detected
+           on full resolution
+    :returns: list of detected faces
+    """
+    if size_range is None:
+        return face_locations(image, number_of_times=1)
+    return face_locations(image, min_face_size=size_range[0])
+
+
+def create_roi_locator(backend, full_locator=None, full_scan_interval=30):
+    """Creates face locator that searches regions around previously detected faces.
+
+    :param backend: "dlib", "opencv" or name of detector backend
+    :param full_locator: function that detects faces on whole frame, default detection of backend if None
+    :param full_scan_interval: number of frames after which whole frame is searched
+    :returns: region of interest detector
+    """
+    if backend == "dlib":
+        detect_region = dlib_region_locations
+    elif backend == "opencv":
+        detect_region = cascade_face_locations
+    else:
+        detector = create_detector(backend)
+        detect_region = detector.detect_region
+        full_locator = full_locator if full_locator is not None else detector
+    if full_locator is None:
+        full_locator = detect_region
+    return RoiDetector(detect_region, full_locator, full_scan_interval=full_scan_interval)
+
+
+def create_locator(detector=DEFAULT_DETECTOR, min_face_size=None):
+    """Creates function that detects positions of faces on whole frame with chosen detector backend.
+
+    :param detector: name of detector backend, e.g. "hog", "lbp" or "lbp+hog" (LBP candidates verified by HOG)
+    :param min_face_size: width (in pixels) of smallest expected face, None for default of backend
+    :returns: face locator, None for full resolution HOG detection
+    """
+    if detector == DEFAULT_DETECTOR:
+        return AdaptiveFaceLocator(min_face_size) if min_face_size is not None else None
+    return create_detector(detector, min_face_size)
+
+
+@timed("detect_cv")
+def detect_cv(f, faces_number, draw_rectangles, locator=None, known_faces=None, detected=None):
     """Detects faces using opencv library.
 
     :param f: frame
     :param faces_number: number of expected faces in frame
     :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param locator: function that detects positions of faces, Haar cascade on whole frame if None
+    :param known_faces: face bounds that were already detected on this frame, None for detecting them
+    :param detected: list to which face bounds of frame are appended, None if not needed
     :returns: result image and indicator that tells if correct number of faces is detected
     """
-    gray = cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30),
-        flags=cv2.CASCADE_SCALE_IMAGE
-    )
+    if known_faces is not None:
+        faces = known_faces
+    else:
+        faces = locator(f) if locator is not None else cascade_face_locations(f)
+    if detected is not None:
+        detected.append(faces)
     # eyes = eye_cascade.detectMultiScale(f)
     if draw_rectangles:
-        for (x, y, w, h) in faces:
-            cv2.rectangle(f, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            # for (ex, ey, ew, eh) in eyes:
-            #     cv2.rectangle(f, (ex, ey), (ex + ew, ey + eh), (0, 255, 0), 2)
+        draw_face_rectangles(f, faces, (0, 255, 0))
+        # for (ex, ey, ew, eh) in eyes:
+        #     cv2.rectangle(f, (ex, ey), (ex + ew, ey + eh), (0, 255, 0), 2)
 
     if faces_number == -1:
         return f, True
@@ -186,117 +351,636 @@ def detect_cv(f, faces_number, draw_rectangles):
         return f, len(faces) == faces_number
 
 
-def generate_output_path(path, chosen_filter):
+def generate_output_path(path, chosen_filter, output_dir=None, extension=".avi"):
     """Generates file path for output result video.
 
     :param path: input path
     :param chosen_filter: chosen filter that is attached to detected faces
+    :param output_dir: directory of output file, directory of input file if None, if provided name
+           of input file is added to the name of output file so results of different inputs do not mix
+    :param extension: extension of output file, it depends on video writer backend
     :returns: path of output file
     """
     tokens = path.split("/")
     output_path = ""
-    for i in range(0, len(tokens) - 1):
-        output_path += tokens[i] + "/"
+    name = "result_video"
+    if output_dir is not None:
+        output_path = output_dir.rstrip("/") + "/"
+        name = tokens[-1].rsplit(".", 1)[0] + "_" + name
+    else:
+        for i in range(0, len(tokens) - 1):
+            output_path += tokens[i] + "/"
 
     line = "_"
     if chosen_filter == "":
         line = ""   # no filter chosen
-    result_path = output_path + "result_video" + line + chosen_filter + ".avi"
+    result_path = output_path + name + line + chosen_filter + extension
     my_file = Path(result_path)
     counter = 1
     while my_file.is_file():    # if file exists generate new path
-        result_path = output_path + "result_video_" + chosen_filter + "(" + str(counter) + ").avi"
+        result_path = output_path + name + "_" + chosen_filter + "(" + str(counter) + ")" + extension
         my_file = Path(result_path)
         counter += 1
     return result_path
 
 
-def process_video(path, faces_number, draw_rectangles, chosen_filter, window):
+def measure_tracking_drift(path, keyframe_intervals=(2, 5, 10, 20), max_frames=None):
+    """Measures how far tracked faces drift from faces detected on every frame.
+
+    For each frame faces are detected with dlib and each detected face is matched
+    with tracked face that overlaps it the most. Unmatched faces count as zero IoU.
+
+    :param path: path of input file
+    :param keyframe_intervals: keyframe intervals that are compared
+    :param max_frames: maximal number of frames that are compared, None for whole video
+    :returns: dict that for each keyframe interval contains mean, minimal and 5th percentile IoU
+              and share of frames on which full detection was done
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print("Error opening video!")
+        return None
+    trackers = {interval: create_face_tracker(interval) for interval in keyframe_intervals}
+    ious = {interval: [] for interval in keyframe_intervals}
+    frame_counter = 0
+    while cap.isOpened() and (max_frames is None or frame_counter < max_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_counter += 1
+        reference = face_locations(frame, number_of_times=1)
+        for interval, tracker in trackers.items():
+            tracked, _ = tracker.update(frame)
+            for face in reference:
+                ious[interval].append(max([box_iou(face, other) for other in tracked] + [0.0]))
+    cap.release()
+
+    report = {}
+    for interval in keyframe_intervals:
+        values = np.array(ious[interval]) if len(ious[interval]) > 0 else np.zeros(1)
+        report[interval] = {
+            "mean_iou": float(values.mean()),
+            "min_iou": float(values.min()),
+            "p5_iou": float(np.percentile(values, 5)),
+            "keyframe_ratio": trackers[interval].keyframes / max(frame_counter, 1)
+        }
+        print("Keyframe interval " + str(interval) + ": mean IoU " + str(round(report[interval]["mean_iou"], 3))
+              + ", 5th percentile IoU " + str(round(report[interval]["p5_iou"], 3))
+              + ", keyframes " + str(round(report[interval]["keyframe_ratio"] * 100, 2)) + " %!")
+    return report
+
+
+def attach_stickers(image, chosen_filters, faces, points):
+    """Attaches each chosen filter to its own copy of frame on which faces are already detected.
+
+    :param image: frame with drawn dlib detections
+    :param chosen_filters: list of chosen filters, "" for frame without sticker
+    :param faces: list of dlib face bounds (top, right, bottom, left)
+    :param points: (faces, 68, 2) array of landmark points
+    :returns: list of result images and list of iou tables, in order of chosen filters
+    """
+    face_landmarks_list = FaceLandmarks(points)
+    images = []
+    iou_tables = []
+    for idx, chosen_filter in enumerate(chosen_filters):
+        sticker_image = image if idx == len(chosen_filters) - 1 else image.copy()  # last filter gets frame itself
+        iou_table = IouTable()
+        if chosen_filter != "":
+            put_filters_on(sticker_image, faces, face_landmarks_list, chosen_filter, [], iou_table=iou_table)
+        images.append(sticker_image)
+        iou_tables.append(iou_table)
+    return images, iou_tables
+
+
+def process_frames(frames, faces_number, draw_rectangles, chosen_filters, keyframe_interval=1,
+                   min_face_size=None, roi_search=False, cached=None, known_detections=None,
+                   landmark_model=DEFAULT_LANDMARK_MODEL, detector=DEFAULT_DETECTOR):
+    """Detects faces once and attaches every chosen sticker to them frame by frame.
+
+    :param frames: iterable of frames
+    :param faces_number: number of expected faces in frame
+    :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param chosen_filters: list of chosen filters, each of them is attached to its own copy of frame
+    :param keyframe_interval: number of frames between two full dlib detections
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param roi_search: indicator whether only regions around faces from previous frame are searched
+    :param cached: detections of all frames loaded from detection cache, faces are not detected if provided
+    :param known_detections: dict of detections (dlib faces and landmark points) of some frames by frame index,
+           e.g. from preview, faces are not detected again on those frames, None if not needed
+    :param landmark_model: name of landmark model
+    :param detector: name of detector backend that finds faces for landmark model
+    :returns: generator of result images and iou tables (one for each chosen filter), detection indicator
+              and detections (dlib faces and landmark points) for each frame
+    """
+    locator = create_locator(detector, min_face_size)
+    if roi_search:
+        locator = create_roi_locator("dlib" if detector == DEFAULT_DETECTOR else detector, locator)
+    tracker = create_face_tracker(keyframe_interval, locator=locator, landmark_model=landmark_model) \
+        if keyframe_interval > 1 else None
+    for idx, frame in enumerate(frames):
+        dlib_detected = []
+        known = cached.frame(idx) if cached is not None else \
+            known_detections.get(idx) if known_detections is not None else None
+        if known is not None:
+            if tracker is not None:
+                tracker.seed(frame, known[0], known[1])     # next frames are tracked from reused detections
+            if isinstance(locator, RoiDetector):
+                locator.seed(known[0])
+            image, dlib_res = detect_dlib(frame, faces_number, draw_rectangles, "", [],
+                                          known_detections=known, detected=dlib_detected)
+        else:
+            image, dlib_res = detect_dlib(frame, faces_number, draw_rectangles, "", [], tracker, locator,
+                                          detected=dlib_detected, landmark_model=landmark_model)
+        detections = dlib_detected[0]
+        images, iou_tables = attach_stickers(image, chosen_filters, *detections)
+        yield images, dlib_res, iou_tables, detections
+
+
+worker_settings = {}    # settings of frame processing in worker process
+
+
+def init_frame_worker(faces_number, draw_rectangles, chosen_filters, min_face_size, sticker_specs=(),
+                      landmark_model=DEFAULT_LANDMARK_MODEL, detector=DEFAULT_DETECTOR):
+    """Initializes worker process of parallel frame pipeline and loads
+    its own models.
+
+    :param faces_number: number of expected faces in frame
+    :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param chosen_filters: list of chosen filters that are attached to detected faces
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param sticker_specs: specs of chosen filters, needed when they come from sticker packs loaded in parent
+           process
+    :param landmark_model: name of landmark model
+    :param detector: name of detector backend
+    """
+    for sticker_spec in sticker_specs:
+        if sticker_spec is not None:
+            sticker_registry.add(sticker_spec)
+    worker_settings["faces_number"] = faces_number
+    worker_settings["draw_rectangles"] = draw_rectangles
+    worker_settings["chosen_filters"] = chosen_filters
+    worker_settings["locator"] = create_locator(detector, min_face_size)
+    worker_settings["landmark_model"] = landmark_model
+    models.prewarm(["face_detector", landmark_model])
+
+
+def process_frame_in_worker(item):
+    """Detects faces and attaches stickers to them in worker process.
+
+    :param item: frame and its detections that are already known (dlib faces and landmark points), None for
+           detecting them
+    :returns: result images, detection indicator, iou tables and detections for frame
+    """
+    frame, known = item
+    dlib_detected = []
+    if known is not None:
+        image, dlib_res = detect_dlib(frame, worker_settings["faces_number"], worker_settings["draw_rectangles"],
+                                      "", [], known_detections=known, detected=dlib_detected)
+    else:
+        image, dlib_res = detect_dlib(frame, worker_settings["faces_number"], worker_settings["draw_rectangles"],
+                                      "", [], locator=worker_settings["locator"], detected=dlib_detected,
+                                      landmark_model=worker_settings["landmark_model"])
+    detections = dlib_detected[0]
+    images, iou_tables = attach_stickers(image, worker_settings["chosen_filters"], *detections)
+    return images, dlib_res, iou_tables, detections
+
+
+def process_video(path, faces_number, draw_rectangles, chosen_filter, window, keyframe_interval=1,
+                  min_face_size=None, roi_search=False, workers=1, queue_depth=8, metrics_path=None,
+                  detection_cache=None, writer_preset=DEFAULT_PRESET):
     """Processes input video frame by frame and shows result video.
 
+    Frames are streamed from decoder through detection and sticker attaching
+    straight to the result video writer, so memory usage does not depend on
+    video length. Result video is shown afterwards from written output file.
+
     :param path: path of input file
     :param faces_number: number of expected faces in frame
     :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
     :param chosen_filter: chosen filter that is attached to detected faces
     :param window: main window that is used for interaction with user
+    :param keyframe_interval: number of frames between two full dlib detections, faces are tracked
+           between keyframes (1 means detection on every frame)
+    :param min_face_size: width (in pixels) of smallest expected face, if provided faces are detected on
+           working resolution adapted to it, otherwise on full resolution
+    :param roi_search: indicator whether only regions around faces from previous frame are searched, with
+           whole frame searched periodically and when face is lost
+    :param workers: number of worker processes, frames are processed in parallel if it is bigger than 1
+           (faces are then detected on every frame, without tracking and region search)
+    :param queue_depth: maximal number of frames waiting for processing after decoding and for encoding
+           after processing, decoding and encoding are done on background threads
+    :param metrics_path: path of file to which runtime metrics are periodically written, None if not needed
+    :param detection_cache: cache of detections, video that is already in it is not detected again,
+           None if detections are not cached
+    :param writer_preset: name of quality/speed preset of result video writer
     :returns: indicator for detection success
     """
+    statistics = render_video(path, faces_number, draw_rectangles, chosen_filter, keyframe_interval=keyframe_interval,
+                              min_face_size=min_face_size, roi_search=roi_search, workers=workers,
+                              queue_depth=queue_depth, metrics_path=metrics_path,
+                              detection_cache=detection_cache, writer_preset=writer_preset,
+                              evaluate_cv=faces_number != -1)
+    if statistics is None:
+        return False
+    print_statistics(statistics, faces_number)
+    return show_result_video(statistics["output_path"], window)
+
+
+def detection_settings(keyframe_interval, min_face_size, roi_search, workers,
+                       landmark_model=DEFAULT_LANDMARK_MODEL, detector=DEFAULT_DETECTOR):
+    """Creates settings that detections depend on, used as part of detection cache key.
+
+    :param keyframe_interval: number of frames between two full dlib detections
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param roi_search: indicator whether only regions around faces from previous frame are searched
+    :param workers: number of worker processes, tracking and region search are not used with more than one
+    :param landmark_model: name of landmark model
+    :param detector: name of detector backend
+    :returns: dict of settings
+    """
+    parallel = workers > 1
+    return {
+        "detector": "dlib_hog" if detector == DEFAULT_DETECTOR else detector,
+        "landmarks": landmark_model,
+        "keyframe_interval": 1 if parallel else keyframe_interval,
+        "min_face_size": min_face_size,
+        "roi_search": False if parallel else bool(roi_search)
+    }
+
+
+IOU_BATCH_SIZE = 1024    # number of attached stickers evaluated together
+
+
+def add_iou_batch(iou_table, intersections):
+    """Evaluates iou table and adds average intersection of each frame to streaming aggregate.
+
+    :param iou_table: iou table, it is cleared afterwards
+    :param intersections: streaming aggregate of intersections for each frame
+    """
+    if len(iou_table) == 0:
+        return
+    for inter in iou_table.evaluate()["frame_iou"].tolist():
+        intersections.add(inter)
+        metrics.record("frame_iou", inter)
+    iou_table.clear()
+
+
+def render_video(path, faces_number, draw_rectangles, chosen_filter, output_path=None, keyframe_interval=1,
+                 min_face_size=None, roi_search=False, workers=1, queue_depth=8, metrics_path=None,
+                 metrics_interval=10.0, detection_cache=None, writer_preset=DEFAULT_PRESET, writer_backend=None,
+                 writer_quality=None, progress_callback=None, progress_interval=0.2, cancel_event=None,
+                 known_detections=None, landmark_model=None, detector=DEFAULT_DETECTOR, evaluate_cv=False,
+                 cv_sample_interval=CV_SAMPLE_INTERVAL):
+    """Processes input video frame by frame and saves result video, without any window.
+
+    :param path: path of input file
+    :param faces_number: number of expected faces in frame
+    :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param chosen_filter: chosen filter that is attached to detected faces
+    :param output_path: path of result video, generated next to input file (with extension of writer backend)
+           if None
+    :param keyframe_interval: number of frames between two full dlib detections
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param roi_search: indicator whether only regions around faces from previous frame are searched
+    :param workers: number of worker processes
+    :param queue_depth: maximal number of frames waiting for processing and for encoding
+    :param metrics_path: path of file to which runtime metrics are periodically written, JSON if it ends
+           with .json, otherwise text, metrics are not written if None
+    :param metrics_interval: number of seconds between two writes of metrics
+    :param detection_cache: cache of detections, if video with same detection settings is in it, only stickers
+           are attached and faces are not detected, otherwise detections are stored in it
+    :param writer_preset: name of quality/speed preset of result video writer
+    :param writer_backend: name of video writer backend, backend of preset if None
+    :param writer_quality: JPEG quality (0-100) of MJPG backends, quality of preset if None
+    :param progress_callback: function called with number of processed frames, total number of frames (0 if
+           unknown), current fps, estimated remaining seconds (None if unknown) and list of result images of last
+           frame, at most once per progress_interval and after last frame, None if not needed
+    :param progress_interval: minimal number of seconds between two calls of progress_callback
+    :param cancel_event: threading.Event, processing stops and result videos are removed when it is set
+    :param known_detections: dict of detections (dlib faces and landmark points) of some frames by frame index,
+           e.g. from preview, faces are not detected again on those frames, None if not needed
+    :param landmark_model: name of landmark model, cheapest available model that chosen filter needs if None
+    :param detector: name of detector backend that finds faces for landmark model, e.g. "hog", "haar", "lbp" or
+           "lbp+hog" for LBP candidates verified by HOG
+    :param evaluate_cv: indicator whether faces on sampled frames are detected by opencv as well and compared
+           with detector backend, off the render path, faces are detected only by detector backend otherwise
+    :param cv_sample_interval: every cv_sample_interval-th frame is compared with opencv, 1 for every frame
+    :returns: dict with statistics of processing or None if video could not be opened
+    """
+    statistics = render_videos(path, faces_number, draw_rectangles, [chosen_filter],
+                               [output_path] if output_path is not None else None,
+                               keyframe_interval=keyframe_interval, min_face_size=min_face_size,
+                               roi_search=roi_search, workers=workers, queue_depth=queue_depth,
+                               metrics_path=metrics_path, metrics_interval=metrics_interval,
+                               detection_cache=detection_cache, writer_preset=writer_preset,
+                               writer_backend=writer_backend, writer_quality=writer_quality,
+                               progress_callback=progress_callback, progress_interval=progress_interval,
+                               cancel_event=cancel_event, known_detections=known_detections,
+                               landmark_model=landmark_model, detector=detector, evaluate_cv=evaluate_cv,
+                               cv_sample_interval=cv_sample_interval)
+    if statistics is not None:
+        statistics.update(statistics["outputs"][0])     # statistics of the only result video
+    return statistics
+
+
+def render_videos(path, faces_number, draw_rectangles, chosen_filters, output_paths=None, output_dir=None,
+                  keyframe_interval=1, min_face_size=None, roi_search=False, workers=1, queue_depth=8,
+                  metrics_path=None, metrics_interval=10.0, detection_cache=None, writer_preset=DEFAULT_PRESET,
+                  writer_backend=None, writer_quality=None, progress_callback=None, progress_interval=0.2,
+                  cancel_event=None, known_detections=None, landmark_model=None, detector=DEFAULT_DETECTOR,
+                  evaluate_cv=False, cv_sample_interval=CV_SAMPLE_INTERVAL):
+    """Processes input video once and saves one result video for each chosen filter, without any window.
+
+    Each frame is decoded and faces are detected only once, then every chosen filter is attached to its own
+    copy of frame that is streamed to its own result video.
+
+    :param path: path of input file
+    :param faces_number: number of expected faces in frame
+    :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param chosen_filters: list of chosen filters, duplicates are rendered once
+    :param output_paths: list of paths of result videos in order of chosen filters, generated if None
+    :param output_dir: directory of generated result videos, directory of input file if None
+    :param keyframe_interval: number of frames between two full dlib detections
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param roi_search: indicator whether only regions around faces from previous frame are searched
+    :param workers: number of worker processes
+    :param queue_depth: maximal number of frames waiting for processing and for encoding
+    :param metrics_path: path of file to which runtime metrics are periodically written, JSON if it ends
+           with .json, otherwise text, metrics are not written if None
+    :param metrics_interval: number of seconds between two writes of metrics
+    :param detection_cache: cache of detections, if video with same detection settings is in it, only stickers
+           are attached and faces are not detected, otherwise detections are stored in it
+    :param writer_preset: name of quality/speed preset of result video writer
+    :param writer_backend: name of video writer backend, backend of preset if None
+    :param writer_quality: JPEG quality (0-100) of MJPG backends, quality of preset if None
+    :param progress_callback: function called with number of processed frames, total number of frames (0 if
+           unknown), current fps, estimated remaining seconds (None if unknown) and list of result images of last
+           frame, at most once per progress_interval and after last frame, None if not needed
+    :param progress_interval: minimal number of seconds between two calls of progress_callback
+    :param cancel_event: threading.Event, processing stops and result videos are removed when it is set
+    :param known_detections: dict of detections (dlib faces and landmark points) of some frames by frame index,
+           e.g. from preview, faces are not detected again on those frames, None if not needed
+    :param landmark_model: name of landmark model, cheapest available model that all chosen filters need if None
+    :param detector: name of detector backend that finds faces for landmark model, e.g. "hog", "haar", "lbp" or
+           "lbp+hog" for LBP candidates verified by HOG
+    :param evaluate_cv: indicator whether faces on sampled frames are detected by opencv as well and compared
+           with detector backend, off the render path, faces are detected only by detector backend otherwise
+    :param cv_sample_interval: every cv_sample_interval-th frame is compared with opencv, 1 for every frame
+    :returns: dict with statistics of processing, with "outputs" that for each chosen filter contains its
+              sticker, output path and iou, "cross_check" with opencv evaluation (None if it is not requested)
+              and "cancelled" that tells if processing was cancelled, or None if video could not be opened
+    """
+    if output_paths is None:
+        chosen_filters = list(dict.fromkeys(chosen_filters))    # without duplicates, in order
+    elif len(output_paths) != len(chosen_filters):
+        raise ValueError("Number of output paths does not match number of chosen filters!")
+    if landmark_model is None:
+        landmark_model = landmark_model_for(chosen_filters)
     start = time.time()
     cap = cv2.VideoCapture(path)
     if not cap.isOpened():
         print("Error opening video!")
-        return False
-    result = []         # list of result frames
-    intersections = []  # list of intersections for each frame
+        return None
+    metrics.reset()     # timing report and latency histogram describe only this render
+    cache_key = None
+    cached = None
+    recorder = None
+    if detection_cache is not None:
+        cache_key = detection_cache.key(path, detection_settings(keyframe_interval, min_face_size, roi_search,
+                                                                 workers, landmark_model, detector))
+        cached = detection_cache.load(cache_key)
+        recorder = DetectionRecorder() if cached is None else None
+    # streaming aggregates of intersections for each frame and iou tables evaluated in batches, per filter
+    intersections = [RunningStats() for _ in chosen_filters]
+    iou_tables = [IouTable() for _ in chosen_filters]
     frame_counter = 0   # coutner of frames
     dlib_true_counter = 0   # counter for frames with valid number of detected faces by dlib
-    cv_true_counter = 0     # counter for frames with valid number of detected faces by opencv
-    output_path = generate_output_path(path, chosen_filter)     # generate result video path
+    if output_paths is None:
+        extension = writer_extension(writer_preset, writer_backend)
+        output_paths = [generate_output_path(path, chosen_filter, output_dir, extension)
+                        for chosen_filter in chosen_filters]
     fps = cap.get(cv2.CAP_PROP_FPS)     # video fps
     width = int(cap.get(3))             # video width
     height = int(cap.get(4))            # video height
-    result_video_writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), fps, (width, height))
+    total_frames = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)  # estimate, 0 if unknown
+    result_video_writers = [FrameWriter(create_video_writer(output_path, fps, (width, height), writer_preset,
+                                                            writer_backend, writer_quality), queue_depth)
+                            for output_path in output_paths]
+    reader = FrameReader(cap, queue_depth)
+    cross_check = CrossCheck(faces_number, cv_sample_interval) if evaluate_cv else None
+    frames = cross_check.observe(reader) if cross_check is not None else reader
+    if workers > 1 and cached is None:
+        pipeline = ParallelFramePipeline(process_frame_in_worker, workers, initializer=init_frame_worker,
+                                         initargs=(faces_number, draw_rectangles, chosen_filters, min_face_size,
+                                                   [sticker_registry.get(name) for name in chosen_filters],
+                                                   landmark_model, detector))
+        known = known_detections if known_detections is not None else {}
+        results = pipeline.imap((frame, known.get(idx)) for idx, frame in enumerate(frames))
+    else:
+        results = process_frames(frames, faces_number, draw_rectangles, chosen_filters,
+                                 keyframe_interval, min_face_size, roi_search, cached, known_detections,
+                                 landmark_model, detector)
+    dumper = MetricsDumper(metrics_path, metrics_interval) if metrics_path is not None else None
+    frame_start = time.perf_counter()
+    last_progress = frame_start
+    completed = False
+    cancelled = False
     try:
-        while cap.isOpened():
-            # Capture frame-by-frame
-            ret, frame = cap.read()
-            if ret:
-                frame_counter += 1
-
-                image, res = detect_dlib(frame, faces_number, draw_rectangles, chosen_filter, intersections)
-                if res:
-                    dlib_true_counter += 1
-
-                print("Processed frame " + str(frame_counter) + " with dlib!")
-                image, res = detect_cv(image, faces_number, draw_rectangles)
-                if res:
-                    cv_true_counter += 1
-                print("Processed frame " + str(frame_counter) + " with opencv!")
-
-                result.append(image)
-                result_video_writer.write(image)    # write result video
-                if cv2.waitKey(25) & 0xFF == ord('q'):
-                    break
-            else:
+        for images, dlib_res, frame_tables, detections in results:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
                 break
-    except:
-        pass
+            frame_counter += 1
+            if recorder is not None:
+                recorder.add(*detections)
+            if cross_check is not None:
+                cross_check.add_detections(frame_counter - 1, detections[0])
+            if dlib_res:
+                dlib_true_counter += 1
+            for iou_table, frame_table, frame_intersections in zip(iou_tables, frame_tables, intersections):
+                iou_table.extend(frame_table, frame_counter)
+                if len(iou_table) >= IOU_BATCH_SIZE:
+                    add_iou_batch(iou_table, frame_intersections)
+            metrics.increment("frames")
+            metrics.increment("dlib_success_frames", int(dlib_res))
+            frame_end = time.perf_counter()
+            metrics.observe("frame_latency_ms", (frame_end - frame_start) * 1000)   # time between result frames
+            frame_start = frame_end
+
+            for result_video_writer, image in zip(result_video_writers, images):
+                result_video_writer.write(image)    # write result videos, frames are not kept in memory
+            if progress_callback is not None and frame_end - last_progress >= progress_interval:
+                last_progress = frame_end
+                report_progress(progress_callback, frame_counter, total_frames, time.time() - start, images)
+        completed = not cancelled
+        if progress_callback is not None and completed and frame_counter > 0:
+            report_progress(progress_callback, frame_counter, frame_counter, time.time() - start, images)
+    finally:    # errors are not handled here, only resources are released and incomplete results removed
+        results.close()
+        reader.stop()
+        cap.release()
+        cross_check_report = cross_check.close() if cross_check is not None else None
+        if dumper is not None:
+            dumper.stop()
+        writer_error = None
+        for result_video_writer in result_video_writers:
+            try:
+                result_video_writer.close()
+            except Exception as e:
+                writer_error = writer_error if writer_error is not None else e
+        if not completed or writer_error is not None:
+            for output_path in output_paths:
+                if os.path.isfile(output_path):
+                    os.remove(output_path)  # incomplete result video
+    if writer_error is not None:
+        raise writer_error
+    if recorder is not None and completed:
+        detection_cache.store(cache_key, recorder)  # only detections of whole video are stored
+    for iou_table, frame_intersections in zip(iou_tables, intersections):
+        add_iou_batch(iou_table, frame_intersections)
+    elapsed = time.time() - start
+    outputs = [{
+        "sticker": chosen_filter,
+        "output_path": output_path,
+        "iou": frame_intersections.mean,
+        "iou_std": math.sqrt(frame_intersections.variance()),
+        "writer_queue": result_video_writer.stats.as_dict()
+    } for chosen_filter, output_path, frame_intersections, result_video_writer
+        in zip(chosen_filters, output_paths, intersections, result_video_writers)]
+    return {
+        "input_path": path,
+        "outputs": outputs,
+        "frames": frame_counter,
+        "elapsed": elapsed,
+        "fps": frame_counter / elapsed if elapsed > 0 else 0.0,
+        "dlib_success": dlib_true_counter / frame_counter if frame_counter > 0 else 0.0,
+        "cv_success": cross_check_report["cv_success"]["rate"]
+        if cross_check_report is not None and cross_check_report["cv_success"] is not None else None,
+        "cross_check": cross_check_report,
+        "cached_detections": cached is not None,
+        "landmark_model": landmark_model,
+        "detector": detector,
+        "cancelled": cancelled,
+        "reader_queue": reader.stats.as_dict(),
+        "queue_report": [reader.stats.report()] + [writer.stats.report() for writer in result_video_writers],
+        "latency_ms": metrics.histogram("frame_latency_ms").as_dict(),
+        "timing_report": metrics.report()
+    }
+
+
+def report_progress(progress_callback, frames, total_frames, elapsed, images):
+    """Calculates fps and estimated remaining time and reports them with progress_callback.
+
+    :param progress_callback: function called with frames, total_frames, fps, eta and images
+    :param frames: number of processed frames
+    :param total_frames: total number of frames, 0 if unknown
+    :param elapsed: number of seconds since processing started
+    :param images: list of result images of last frame
+    """
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    eta = (total_frames - frames) / fps if total_frames > 0 and fps > 0 else None
+    progress_callback(frames, total_frames, fps, max(eta, 0.0) if eta is not None else None, images)
 
-    cap.release()
-    result_video_writer.release()
-    cv2.destroyAllWindows()
-    print("Processing phase is done! Time elapsed: " + str(time.time() - start) + "!")
-    if faces_number != -1:
-        print("Detection success with dlib: " + str(round(dlib_true_counter / frame_counter * 100, 2)) + " %!")
-        print("Detection success with opencv: " + str(round(cv_true_counter / frame_counter * 100, 2)) + " %!")
-        if len(intersections) != 0:
-            print("Detection success (Intersection over Union - IoU): "
-                  + str(round(sum(intersections) / len(intersections) * 100, 2)) + " %!")
-        else:
-            print("Detection success (Intersection over Union - IoU): 0%!")
 
-    # showing result
-    result_cap = cv2.VideoCapture(path)
+def print_statistics(statistics, faces_number):
+    """Prints statistics of processing and detection success.
+
+    :param statistics: dict with statistics returned by render_video or render_videos
+    :param faces_number: number of expected faces in frame
+    """
+    print("Processing phase is done! Time elapsed: " + str(statistics["elapsed"]) + "!")
+    print("Faces detected with " + statistics["detector"] + ", landmarks predicted with "
+          + statistics["landmark_model"] + "!")
+    for line in statistics["queue_report"]:
+        print(line)
+    for line in statistics["timing_report"]:
+        print(line)
+    if faces_number != -1 and statistics["frames"] > 0:
+        print("Detection success with " + statistics["detector"] + ": "
+              + str(round(statistics["dlib_success"] * 100, 2)) + " %!")
+        for output in statistics["outputs"]:
+            sticker = " with " + output["sticker"] if len(statistics["outputs"]) > 1 else ""
+            print("Detection success (Intersection over Union - IoU)" + sticker + ": "
+                  + str(round(output["iou"] * 100, 2)) + " %!")
+    if statistics.get("cross_check") is not None:
+        print_cross_check(statistics["cross_check"], statistics["detector"])
+
+
+def format_rate(rate):
+    """Formats success rate with its confidence interval.
+
+    :param rate: dict with rate, lower and upper bound and number of trials, None if unknown
+    :returns: readable rate
+    """
+    if rate is None:
+        return "unknown"
+    return str(round(rate["rate"] * 100, 2)) + " % (95 % CI " + str(round(rate["low"] * 100, 2)) + " - " \
+        + str(round(rate["high"] * 100, 2)) + " %, n = " + str(rate["trials"]) + ")"
+
+
+def print_cross_check(report, detector=DEFAULT_DETECTOR):
+    """Prints comparison of detector backend with opencv on sampled frames.
+
+    :param report: dict returned by CrossCheck.close
+    :param detector: name of detector backend
+    """
+    print("OpenCV cross-check on " + str(report["frames"]) + " frames (every " + str(report["sample_interval"])
+          + ". frame, " + str(report["dropped"]) + " dropped)!")
+    if report["cv_success"] is not None:
+        print("Detection success with " + detector + ": " + format_rate(report["detector_success"]) + "!")
+        print("Detection success with opencv: " + format_rate(report["cv_success"]) + "!")
+    print("Faces of " + detector + " found by opencv as well: " + format_rate(report["agreement"]) + "!")
+
+
+def show_result_video(output_path, window, seek_step=50):
+    """Shows result video by reading it back from written output file.
+
+    Keys: 'q' stops playback, space pauses, 'a' and 'd' seek backward and
+    forward by seek_step frames.
+
+    :param output_path: path of result video
+    :param window: main window that is used for interaction with user
+    :param seek_step: number of frames skipped when seeking
+    :returns: indicator whether result video could be opened and shown
+    """
+    result_cap = cv2.VideoCapture(output_path)
     if not result_cap.isOpened():
         print("Error opening video!")
         return False
+    fps = result_cap.get(cv2.CAP_PROP_FPS)
+    delay = int(1000 / fps) if fps > 0 else 25     # play result with its own fps
+    frames_count = int(result_cap.get(cv2.CAP_PROP_FRAME_COUNT))
     window.hide()
-    frame_counter = 0
+    paused = False
+    frame = None
+    shown = True
     try:
         while result_cap.isOpened():
-            # Capture frame-by-frame
-            ret, frame = result_cap.read()
-            if ret:
-                # Display the resulting frame
-                cv2.imshow('Frame', (result[frame_counter]))
-                frame_counter += 1
-                if cv2.waitKey(25) & 0xFF == ord('q'):
+            if not paused or frame is None:
+                # Capture frame-by-frame
+                ret, frame = result_cap.read()
+                if not ret:
                     break
-            else:
+                # Display the resulting frame
+                cv2.imshow('Frame', frame)
+            key = cv2.waitKey(delay) & 0xFF
+            if key == ord('q'):
                 break
-    except:
-        pass
-    result_cap.release()
-    cv2.destroyAllWindows()
-    window.show()
-    return True
\ No newline at end of file
+            elif key == ord(' '):
+                paused = not paused
+            elif key == ord('a') or key == ord('d'):
+                position = int(result_cap.get(cv2.CAP_PROP_POS_FRAMES))
+                if key == ord('a'):
+                    position = max(position - seek_step - 1, 0)
+                else:
+                    position = min(position + seek_step - 1, max(frames_count - 1, 0))
+                result_cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+                frame = None    # show frame at new position even if paused
+    except cv2.error as e:
+        print("Error showing result video: " + str(e) + "!")
+        shown = False
+    finally:
+        result_cap.release()
+        cv2.destroyAllWindows()
+        window.show()
+    return shown
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "facesnap", "detections")
+CACHE_VERSION = 2   # changed when format of cached files changes
+ARRAY_FILES = ["dlib_faces", "landmarks", "dlib_index"]
+
+
+def file_content_hash(path, chunk_size=1 << 20):
+    """Calculates SHA-256 hash of file content.
+
+    :param path: path of file
+    :param chunk_size: number of bytes read at once
+    :returns: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        chunk = input_file.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = input_file.read(chunk_size)
+    return digest.hexdigest()
+
+
+def load_array(path):
+    """Loads array memory-mapped, empty arrays are loaded normally because they cannot be mapped.
+
+    :param path: path of .npy file
+    :returns: array
+    """
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+
+class CachedDetections(object):
+    """
+    Represents detections of all frames of one video loaded from cache: dlib face bounds and 68 landmarks of
+    each face. Arrays are memory-mapped, frame index tells where faces of each frame start.
+    """
+    def __init__(self, directory):
+        """Loads cached detections.
+
+        :param self: self
+        :param directory: directory of cache entry
+        """
+        arrays = dict((name, load_array(os.path.join(directory, name + ".npy"))) for name in ARRAY_FILES)
+        self.dlib_faces = arrays["dlib_faces"]
+        self.landmarks = arrays["landmarks"]
+        self.dlib_index = arrays["dlib_index"]
+        self.frames = len(self.dlib_index) - 1
+
+    def frame(self, idx):
+        """Returns detections of frame.
+
+        :param self: self
+        :param idx: index of frame
+        :returns: list of dlib face bounds (top, right, bottom, left) and (faces, 68, 2) array of landmarks, no
+                  faces if frame is not cached
+        """
+        if idx >= self.frames:
+            return [], np.zeros((0, 68, 2), dtype=np.int32)
+        start, end = self.dlib_index[idx], self.dlib_index[idx + 1]
+        return [tuple(face) for face in self.dlib_faces[start:end].tolist()], np.array(self.landmarks[start:end])
+
+
+class DetectionRecorder(object):
+    """
+    Represents detections of video collected frame by frame while video is processed, so that they can be
+    stored in cache.
+    """
+    def __init__(self):
+        """Initializes empty recorder.
+
+        :param self: self
+        """
+        self.dlib_faces = []
+        self.landmarks = []
+        self.dlib_index = [0]
+
+    def add(self, dlib_faces, landmarks):
+        """Adds detections of next frame.
+
+        :param self: self
+        :param dlib_faces: list of dlib face bounds (top, right, bottom, left)
+        :param landmarks: array-like of 68 landmark points for each face
+        """
+        self.dlib_faces.extend(tuple(int(v) for v in face) for face in dlib_faces)
+        self.landmarks.append(np.asarray(landmarks, dtype=np.int32).reshape(-1, 68, 2))
+        self.dlib_index.append(len(self.dlib_faces))
+
+    @property
+    def frames(self):
+        return len(self.dlib_index) - 1
+
+    def arrays(self):
+        """Returns collected detections as arrays.
+
+        :param self: self
+        :returns: dict of arrays by file name
+        """
+        return {
+            "dlib_faces": np.array(self.dlib_faces, dtype=np.int32).reshape(-1, 4),
+            "landmarks": np.concatenate(self.landmarks) if len(self.landmarks) > 0 else
+            np.zeros((0, 68, 2), dtype=np.int32),
+            "dlib_index": np.array(self.dlib_index, dtype=np.int64)
+        }
+
+
+class DetectionCache(object):
+    """
+    Represents persistent cache of face detections and landmarks of videos, keyed by content of video and
+    by detection settings, so that rendering the same video with another sticker skips detection. Each entry is
+    directory of .npy files, least recently used entries are removed when cache gets bigger than its limit.
+    """
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=1 << 30):
+        """Initializes cache.
+
+        :param self: self
+        :param directory: directory of cache, created when first entry is stored
+        :param max_bytes: maximal size of all entries in bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hashes = {}    # content hashes by (path, size, modification time), so file is hashed once
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path, settings):
+        """Creates cache key from video content and detection settings.
+
+        :param self: self
+        :param path: path of video
+        :param settings: dict of detection settings that change detections
+        :returns: cache key
+        """
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self.hashes.get(file_id)
+        if content_hash is None:
+            content_hash = self.hashes[file_id] = file_content_hash(path)
+        settings_text = json.dumps(dict(settings, cache_version=CACHE_VERSION), sort_keys=True)
+        return hashlib.sha256((content_hash + settings_text).encode("utf-8")).hexdigest()
+
+    def entry_directory(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Loads cached detections and marks entry as recently used.
+
+        :param self: self
+        :param key: cache key
+        :returns: cached detections, None if video is not cached
+        """
+        directory = self.entry_directory(key)
+        if not os.path.isdir(directory):
+            self.misses += 1
+            return None
+        try:
+            detections = CachedDetections(directory)
+        except (IOError, ValueError):   # incomplete or damaged entry
+            self.misses += 1
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        os.utime(directory)     # modification time of entry is its last use
+        self.hits += 1
+        return detections
+
+    def store(self, key, recorder):
+        """Stores detections and removes least recently used entries if cache is too big.
+
+        :param self: self
+        :param key: cache key
+        :param recorder: detection recorder with detections of all frames
+        """
+        directory = self.entry_directory(key)
+        temp_directory = directory + ".tmp" + str(os.getpid())
+        os.makedirs(temp_directory, exist_ok=True)
+        for name, array in recorder.arrays().items():
+            np.save(os.path.join(temp_directory, name + ".npy"), array)
+        with self.lock:
+            if os.path.isdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+            os.replace(temp_directory, directory)   # entry appears complete or not at all
+            self.evict()
+
+    def entries(self):
+        """Lists cache entries.
+
+        :param self: self
+        :returns: list of (last use, size in bytes, directory) from least to most recently used
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            directory = os.path.join(self.directory, name)
+            if not os.path.isdir(directory) or ".tmp" in name:
+                continue
+            size = sum(os.path.getsize(os.path.join(directory, file_name)) for file_name in os.listdir(directory))
+            entries.append((os.path.getmtime(directory), size, directory))
+        return sorted(entries)
+
+    def size(self):
+        """Calculates size of all entries.
+
+        :param self: self
+        :returns: size in bytes
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Removes least recently used entries until cache is not bigger than its limit.
+
+        :param self: self
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, directory in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Removes all entries.
+
+        :param self: self
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,273 @@
+import math
+import cv2
+import models
+from instrumentation import timed
+from roi import expand_bounds
+from tracking import box_iou
+
+HOG_WINDOW_SIZE = 80    # width (in pixels) of smallest face that dlib HOG detector finds without upsampling
+CASCADE_MIN_SIZE = 30   # width (in pixels) of smallest face that opencv cascades search
+DEFAULT_DETECTOR = "hog"
+VERIFIER_SEPARATOR = "+"    # e.g. "lbp+hog" is LBP cascade first pass verified by HOG detector
+
+detector_factories = {}  # functions that create detector backends, by name
+
+
+def rect_to_bounds(rect):
+    """Extracts bounds of rectangle.
+
+    :param rect: rectangular shape
+    :returns: bounds of rect
+    """
+    return rect.top(), rect.right(), rect.bottom(), rect.left()
+
+
+def detect_rect_bounds(bounds, image_shape):
+    """Detects bounds of rectangle.
+
+    :param bounds: bounds of rectangular shape
+    :param image_shape: shape of image
+    :returns: bounds of rectangle
+    """
+    return max(bounds[0], 0), min(bounds[1], image_shape[1]), min(bounds[2], image_shape[0]), max(bounds[3], 0)
+
+
+@timed("detect_face_location")
+def detect_face_location(image, number_of_times=1):
+    """Detects faces on image.
+
+    :param image: image with potential faces
+    :param number_of_times: number of times to try detecting faces
+    :returns: detected faces
+    """
+    return models.get_face_detector()(image, number_of_times)
+
+
+def detection_scale(min_face_size):
+    """Calculates working resolution and number of upsamplings for HOG detector.
+
+    HOG detector finds faces that are at least HOG_WINDOW_SIZE pixels wide, each
+    upsampling halves that size. Frame is downscaled as much as possible while
+    faces of min_face_size pixels are still found.
+
+    :param min_face_size: width (in pixels) of smallest face that should be detected
+    :returns: scale factor for frame (at most 1) and number of upsamplings
+    """
+    target = max(min_face_size, 1) * 0.9   # margin for faces slightly smaller than expected
+    number_of_times = max(int(math.ceil(math.log(HOG_WINDOW_SIZE / target, 2))), 0)
+    scale = min(HOG_WINDOW_SIZE / (target * 2 ** number_of_times), 1.0)
+    return scale, number_of_times
+
+
+def hog_face_locations(image, number_of_times=1, min_face_size=None):
+    """Detects positions of faces on image with dlib HOG detector.
+
+    :param image: image with potential faces
+    :param number_of_times: number of times to try detecting faces
+    :param min_face_size: width (in pixels) of smallest expected face, if provided faces are detected
+           on downscaled copy of image and number_of_times is chosen according to it
+    :returns: list of detected faces
+    """
+    if min_face_size is None:
+        return [detect_rect_bounds(rect_to_bounds(face), image.shape)
+                for face in detect_face_location(image, number_of_times)]
+
+    scale, number_of_times = detection_scale(min_face_size)
+    if scale >= 1.0:
+        small_image = image
+    else:
+        small_image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    faces = []
+    for face in detect_face_location(small_image, number_of_times):
+        bounds = rect_to_bounds(face)   # map bounds back to full resolution
+        faces.append(detect_rect_bounds([int(round(bound / scale)) for bound in bounds], image.shape))
+    return faces
+
+
+def cascade_face_locations(image, size_range=None, model="face_cascade", min_neighbors=5):
+    """Detects positions of faces on image using opencv cascade.
+
+    :param image: BGR or grayscale image with potential faces
+    :param size_range: range (min, max) of face widths that are searched, if None all faces that are
+           at least 30 pixels wide are searched
+    :param model: name of cascade model, "face_cascade" (Haar) or "lbp_cascade" (LBP)
+    :param min_neighbors: number of overlapping detections needed for face
+    :returns: list of detected faces
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    size_limits = {"minSize": (CASCADE_MIN_SIZE, CASCADE_MIN_SIZE)}
+    if size_range is not None:
+        min_width = max(int(size_range[0]), CASCADE_MIN_SIZE)
+        max_width = max(int(size_range[1]), min_width)
+        size_limits = {"minSize": (min_width, min_width), "maxSize": (max_width, max_width)}
+    faces = models.registry.get(model).detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=min_neighbors,
+        flags=cv2.CASCADE_SCALE_IMAGE,
+        **size_limits
+    )
+    return [(y, x + w, y + h, x) for (x, y, w, h) in faces]
+
+
+class FaceDetector(object):
+    """
+    Represents face detector backend. Every backend returns list of face bounds (top, right, bottom, left)
+    limited to frame, so any of them can feed landmark predictor, tracker or region of interest search.
+    """
+    name = None
+
+    def detect(self, image):
+        """Detects positions of faces on image.
+
+        :param self: self
+        :param image: image with potential faces
+        :returns: list of face bounds
+        """
+        raise NotImplementedError()
+
+    def detect_region(self, image, size_range):
+        """Detects positions of faces of expected size on image region.
+
+        :param self: self
+        :param image: image region with potential faces
+        :param size_range: range (min, max) of face widths that are searched
+        :returns: list of face bounds in region coordinates
+        """
+        return self.detect(image)
+
+    def __call__(self, image):
+        return self.detect(image)
+
+
+class HogDetector(FaceDetector):
+    """
+    Represents dlib HOG detector, accurate but slow on full resolution frames.
+    """
+    name = "hog"
+
+    def __init__(self, number_of_times=1, min_face_size=None):
+        """Initializes HOG detector.
+
+        :param self: self
+        :param number_of_times: number of upsamplings when min_face_size is not provided
+        :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+        """
+        self.number_of_times = number_of_times
+        self.min_face_size = min_face_size
+
+    def detect(self, image):
+        return hog_face_locations(image, self.number_of_times, self.min_face_size)
+
+    def detect_region(self, image, size_range):
+        return hog_face_locations(image, min_face_size=size_range[0])
+
+
+class CascadeDetector(FaceDetector):
+    """
+    Represents opencv cascade detector, Haar or LBP. LBP cascade is the fastest backend, but it finds only
+    frontal faces and has more false detections.
+    """
+    def __init__(self, name, model, min_face_size=None, min_neighbors=5):
+        """Initializes cascade detector.
+
+        :param self: self
+        :param name: name of backend
+        :param model: name of cascade model
+        :param min_face_size: width (in pixels) of smallest expected face, None for CASCADE_MIN_SIZE
+        :param min_neighbors: number of overlapping detections needed for face
+        """
+        self.name = name
+        self.model = model
+        self.min_face_size = min_face_size
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image):
+        size_range = None
+        if self.min_face_size is not None:
+            size_range = (self.min_face_size, max(image.shape[0], image.shape[1]))
+        return cascade_face_locations(image, size_range, self.model, self.min_neighbors)
+
+    def detect_region(self, image, size_range):
+        return cascade_face_locations(image, size_range, self.model, self.min_neighbors)
+
+
+class VerifiedDetector(FaceDetector):
+    """
+    Represents cheap first pass detector whose candidates are verified by more accurate detector. Verifier
+    searches only region around each candidate for faces of candidate size, so it costs a fraction of full
+    frame detection, and its bounds are returned. Candidates that verifier does not confirm are dropped.
+    """
+    def __init__(self, first_pass, verifier, expand=0.25, size_margin=(0.6, 1.6)):
+        """Initializes verified detector.
+
+        :param self: self
+        :param first_pass: detector that finds candidates on whole frame
+        :param verifier: detector that confirms candidates
+        :param expand: share of candidate size added on each side of candidate to get searched region
+        :param size_margin: factors applied to candidate width to get range of searched face widths
+        """
+        self.name = first_pass.name + VERIFIER_SEPARATOR + verifier.name
+        self.first_pass = first_pass
+        self.verifier = verifier
+        self.expand = expand
+        self.size_margin = size_margin
+        self.candidates = 0     # counter of first pass detections
+        self.confirmed = 0      # counter of detections confirmed by verifier
+
+    def detect(self, image):
+        faces = []
+        for candidate in self.first_pass.detect(image):
+            self.candidates += 1
+            top, right, bottom, left = expand_bounds(candidate, self.expand, image.shape)
+            width = candidate[1] - candidate[3]
+            size_range = (width * self.size_margin[0], width * self.size_margin[1])
+            for face in self.verifier.detect_region(image[top:bottom, left:right], size_range):
+                face = (face[0] + top, face[1] + left, face[2] + top, face[3] + left)
+                if all(box_iou(face, other) < 0.5 for other in faces):  # regions of candidates overlap
+                    faces.append(face)
+                    self.confirmed += 1
+        return faces
+
+    def detect_region(self, image, size_range):
+        return self.detect(image)
+
+
+def register_detector(name, factory):
+    """Registers detector backend, so it can be chosen by name.
+
+    :param name: name of backend, it must not contain VERIFIER_SEPARATOR
+    :param factory: function that takes min_face_size (None for default) and returns FaceDetector
+    """
+    detector_factories[name] = factory
+
+
+def detector_names():
+    """Returns names of registered detector backends.
+
+    :returns: list of names
+    """
+    return list(detector_factories)
+
+
+def create_detector(name=DEFAULT_DETECTOR, min_face_size=None):
+    """Creates detector backend.
+
+    :param name: name of registered backend, or names of first pass and verifier joined by VERIFIER_SEPARATOR
+    :param min_face_size: width (in pixels) of smallest expected face, None for default of backend
+    :returns: face detector
+    """
+    names = name.split(VERIFIER_SEPARATOR)
+    for backend in names:
+        if backend not in detector_factories:
+            raise ValueError("Unknown detector backend '" + backend + "'!")
+    if len(names) == 1:
+        return detector_factories[name](min_face_size)
+    if len(names) == 2:
+        return VerifiedDetector(detector_factories[names[0]](min_face_size), detector_factories[names[1]](None))
+    raise ValueError("Detector '" + name + "' has more than one verifier!")
+
+
+register_detector("hog", lambda min_face_size=None: HogDetector(min_face_size=min_face_size))
+register_detector("haar", lambda min_face_size=None: CascadeDetector("haar", "face_cascade", min_face_size))
+register_detector("lbp", lambda min_face_size=None: CascadeDetector("lbp", "lbp_cascade", min_face_size))
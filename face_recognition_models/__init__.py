@@ -1,9 +1,17 @@
-from pkg_resources import resource_filename
+import os
+
+
+def resource_filename(package, name):
+    """Resolves path of file bundled with package without slow pkg_resources import."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
 
 
 def pose_predictor_model_location():
     return resource_filename(__name__, "models/shape_predictor_68_face_landmarks.dat")
-    # return resource_filename(__name__, "models/shape_predictor_5_face_landmarks.dat")
+
+
+def pose_predictor_five_point_model_location():
+    return resource_filename(__name__, "models/shape_predictor_5_face_landmarks.dat")
 
 
 def face_recognition_model_location():
@@ -12,7 +20,10 @@ def face_recognition_model_location():
 
 def haar_cascade_frontal_face_model_location():
     return resource_filename(__name__, "models/haarcascade_frontalface_default.xml")
-    # return resource_filename(__name__, "models/lbpcascade_frontalface_default.xml")
+
+
+def lbp_cascade_frontal_face_model_location():
+    return resource_filename(__name__, "models/lbpcascade_frontalface.xml")
 
 
 def haar_cascade_eye_model_location():
@@ -0,0 +1,352 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+
+class Timer(object):
+    """
+    Represents accumulated timing of one function: number of calls, total and maximal duration.
+    """
+    __slots__ = ("count", "total_ns", "max_ns")
+
+    def __init__(self):
+        """Initializes empty timer.
+
+        :param self: self
+        """
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns):
+        """Records one call.
+
+        :param self: self
+        :param duration_ns: duration of call in nanoseconds
+        """
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def as_dict(self):
+        """Returns timer as dict with times in milliseconds.
+
+        :param self: self
+        :returns: dict
+        """
+        return {"count": self.count, "total_ms": self.total_ns / 1e6,
+                "mean_ms": self.total_ns / 1e6 / self.count if self.count > 0 else 0.0, "max_ms": self.max_ns / 1e6}
+
+
+class Histogram(object):
+    """
+    Represents histogram with fixed, exponentially growing bucket bounds. Memory usage does not grow
+    with number of observations.
+    """
+    def __init__(self, bounds=None):
+        """Initializes empty histogram.
+
+        :param self: self
+        :param bounds: sorted upper bounds of buckets, 1 ms to ~16 s doubling by default
+        """
+        self.bounds = bounds if bounds is not None else [2 ** i for i in range(15)]
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket is for values above all bounds
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Records value.
+
+        :param self: self
+        :param value: observed value
+        """
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates quantile as upper bound of bucket that contains it.
+
+        :param self: self
+        :param q: quantile between 0 and 1
+        :returns: estimated quantile or None if histogram is empty
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def as_dict(self):
+        """Returns histogram as dict.
+
+        :param self: self
+        :returns: dict
+        """
+        return {"bounds": self.bounds, "counts": self.counts, "count": self.count, "sum": self.sum,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+class RunningStats(object):
+    """
+    Represents streaming aggregate (count, mean, variance, minimum and maximum) of values, computed with
+    Welford's algorithm so values are not kept. It can be used instead of list that values are appended to.
+    """
+    def __init__(self):
+        """Initializes empty aggregate.
+
+        :param self: self
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Records value.
+
+        :param self: self
+        :param value: observed value
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    append = add    # compatible with lists that values used to be appended to
+
+    def __len__(self):
+        return self.count
+
+    def variance(self):
+        """Calculates sample variance.
+
+        :param self: self
+        :returns: variance
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_dict(self):
+        """Returns aggregate as dict.
+
+        :param self: self
+        :returns: dict
+        """
+        return {"count": self.count, "mean": self.mean, "std": math.sqrt(self.variance()),
+                "min": self.min, "max": self.max}
+
+
+class Metrics(object):
+    """
+    Represents registry of timers, counters, histograms and streaming aggregates of one process. Updates are
+    cheap attribute increments without locks, so counts can be slightly off when several threads update same
+    metric at the same moment.
+    """
+    def __init__(self):
+        """Initializes empty registry.
+
+        :param self: self
+        """
+        self.enabled = True
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+        self.stats = {}
+
+    def timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers.setdefault(name, Timer())
+        return timer
+
+    def histogram(self, name, bounds=None):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram(bounds))
+        return histogram
+
+    def running_stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats.setdefault(name, RunningStats())
+        return stats
+
+    def increment(self, name, value=1):
+        """Increments counter.
+
+        :param self: self
+        :param name: name of counter
+        :param value: increment
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """Records value in histogram.
+
+        :param self: self
+        :param name: name of histogram
+        :param value: observed value
+        """
+        if self.enabled:
+            self.histogram(name).observe(value)
+
+    def record(self, name, value):
+        """Records value in streaming aggregate.
+
+        :param self: self
+        :param name: name of aggregate
+        :param value: observed value
+        """
+        if self.enabled:
+            self.running_stats(name).add(value)
+
+    def reset(self):
+        """Removes all metrics. Timers are cleared in place, because decorated functions keep them.
+
+        :param self: self
+        """
+        for timer in self.timers.values():
+            timer.count = timer.total_ns = timer.max_ns = 0
+        self.counters = {}
+        self.histograms = {}
+        self.stats = {}
+
+    def snapshot(self):
+        """Returns all metrics as dict.
+
+        :param self: self
+        :returns: dict
+        """
+        return {
+            "timestamp": time.time(),
+            "timers": dict((name, timer.as_dict()) for name, timer in list(self.timers.items())),
+            "counters": dict(self.counters),
+            "histograms": dict((name, histogram.as_dict()) for name, histogram in list(self.histograms.items())),
+            "stats": dict((name, stats.as_dict()) for name, stats in list(self.stats.items()))
+        }
+
+    def to_text(self):
+        """Returns all metrics in text exposition format, one "name{labels} value" line per value.
+
+        :param self: self
+        :returns: text
+        """
+        lines = []
+        for name, timer in sorted(self.timers.items()):
+            lines.append('facesnap_calls_total{function="' + name + '"} ' + str(timer.count))
+            lines.append('facesnap_seconds_total{function="' + name + '"} ' + repr(timer.total_ns / 1e9))
+            lines.append('facesnap_seconds_max{function="' + name + '"} ' + repr(timer.max_ns / 1e9))
+        for name, value in sorted(self.counters.items()):
+            lines.append("facesnap_" + name + "_total " + str(value))
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append("facesnap_" + name + '_bucket{le="' + str(bound) + '"} ' + str(cumulative))
+            lines.append("facesnap_" + name + "_sum " + repr(histogram.sum))
+            lines.append("facesnap_" + name + "_count " + str(histogram.count))
+        for name, stats in sorted(self.stats.items()):
+            lines.append("facesnap_" + name + "_mean " + repr(stats.mean))
+            lines.append("facesnap_" + name + "_count " + str(stats.count))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Writes metrics to file atomically, as JSON if path ends with .json, otherwise as text.
+
+        :param self: self
+        :param path: path of metrics file
+        """
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as metrics_file:
+            if path.endswith(".json"):
+                json.dump(self.snapshot(), metrics_file, indent=2, sort_keys=True)
+            else:
+                metrics_file.write(self.to_text())
+        os.replace(temp_path, path)
+
+    def report(self):
+        """Creates readable report of timers.
+
+        :param self: self
+        :returns: list of report lines
+        """
+        return [name + ": " + str(timer.count) + " calls, mean " + str(round(timer.total_ns / 1e6 / timer.count, 3))
+                + " ms, max " + str(round(timer.max_ns / 1e6, 3)) + " ms"
+                for name, timer in sorted(self.timers.items()) if timer.count > 0]
+
+
+metrics = Metrics()
+
+
+def timed(name):
+    """Creates decorator that records duration of each call of function in timer with given name.
+
+    :param name: name of timer
+    :returns: decorator
+    """
+    def decorator(function):
+        timer = metrics.timer(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer.add(time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+
+class MetricsDumper(object):
+    """
+    Represents background thread that periodically writes metrics to file, so local scraper can read them.
+    """
+    def __init__(self, path, interval=10.0, registry=None):
+        """Initializes dumper and starts its thread.
+
+        :param self: self
+        :param path: path of metrics file, JSON if it ends with .json, otherwise text
+        :param interval: number of seconds between two dumps
+        :param registry: metrics registry, process-wide registry if None
+        """
+        self.path = path
+        self.interval = interval
+        self.registry = registry if registry is not None else metrics
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.dump_loop, daemon=True)
+        self.thread.start()
+
+    def dump_loop(self):
+        """Writes metrics until dumper is stopped.
+
+        :param self: self
+        """
+        while not self.stopped.wait(self.interval):
+            self.registry.dump(self.path)
+
+    def stop(self):
+        """Stops dumper and writes metrics one last time.
+
+        :param self: self
+        """
+        self.stopped.set()
+        self.thread.join()
+        self.registry.dump(self.path)
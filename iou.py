@@ -0,0 +1,172 @@
+from array import array
+import numpy as np
+
+
+def batch_iou(reference_boxes, sticker_boxes):
+    """Calculates Intersection over Union (IoU) coefficients for many pairs of rectangles at once, with the same
+    clamping of sticker rectangle to reference rectangle as filters.get_iou.
+
+    :param reference_boxes: (n, 4) array of x, y, width and height of reference rectangles (face parts)
+    :param sticker_boxes: (n, 4) array of x, y, width and height of visible sticker rectangles
+    :returns: array of n iou coefficients
+    """
+    reference = np.asarray(reference_boxes, dtype=np.int64).reshape(-1, 4)
+    sticker = np.asarray(sticker_boxes, dtype=np.int64).reshape(-1, 4)
+    face_x1, face_y1 = reference[:, 0], reference[:, 1]
+    face_x2, face_y2 = face_x1 + reference[:, 2], face_y1 + reference[:, 3]
+    sticker_x1, sticker_y1 = sticker[:, 0], sticker[:, 1]
+    sticker_x2, sticker_y2 = sticker_x1 + sticker[:, 2], sticker_y1 + sticker[:, 3]
+
+    # sticker edges are clamped one after another, each condition sees previously clamped edges
+    sticker_x1 = np.where((sticker_x1 < face_x1) & (sticker_x2 > face_x1), face_x1, sticker_x1)
+    sticker_x2 = np.where((sticker_x2 > face_x2) & (sticker_x1 < face_x2), face_x2, sticker_x2)
+    sticker_y1 = np.where((sticker_y1 < face_y1) & (sticker_y2 > face_y1), face_y1, sticker_y1)
+    sticker_y2 = np.where((sticker_y2 > face_y2) & (sticker_y1 < face_y2), face_y2, sticker_y2)
+
+    width = np.minimum(face_x2, sticker_x2) - np.maximum(face_x1, sticker_x1)
+    height = np.minimum(face_y2, sticker_y2) - np.maximum(face_y1, sticker_y1)
+    overlapping = (width >= 0) & (height >= 0)
+    area_overlap = width * height
+    area_face = (face_x2 - face_x1) * (face_y2 - face_y1)
+    area_sticker = (sticker_x2 - sticker_x1) * (sticker_y2 - sticker_y1)
+    area_combined = area_face + area_sticker - area_overlap
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = np.where(area_combined != 0, area_overlap / area_combined,
+                       area_overlap / (area_combined + 1e-5))  # prevent division by zero
+    return np.where(overlapping, iou, 0.0)
+
+
+def group_means(keys, values, groups):
+    """Calculates mean of values for each group.
+
+    :param keys: array of group index for each value
+    :param values: array of values
+    :param groups: number of groups
+    :returns: array of means, 0 for groups without values
+    """
+    sums = np.bincount(keys, weights=values, minlength=groups)
+    counts = np.bincount(keys, minlength=groups)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+
+class IouTable(object):
+    """
+    Represents sticker and reference rectangles of attached stickers, for one frame or for whole clip. Each
+    attached sticker is one entry (frame, face, sticker) with one row per reference face part. All rows are
+    evaluated in one pass and summarized per entry, per frame, per face and per sticker.
+    """
+    def __init__(self):
+        """Initializes empty table.
+
+        :param self: self
+        """
+        self.sticker_names = []
+        self.sticker_ids = {}
+        # flat arrays of 64-bit integers, converted to numpy arrays without copying
+        self.entry_frame = array("q")
+        self.entry_face = array("q")
+        self.entry_sticker = array("q")
+        self.row_entry = array("q")
+        self.reference_boxes = array("q")    # 4 numbers per row
+        self.sticker_boxes = array("q")
+
+    def __len__(self):
+        return len(self.entry_frame)
+
+    def sticker_id(self, sticker_name):
+        """Returns index of sticker in table.
+
+        :param self: self
+        :param sticker_name: name of sticker
+        :returns: index of sticker
+        """
+        sticker_id = self.sticker_ids.get(sticker_name)
+        if sticker_id is None:
+            sticker_id = self.sticker_ids[sticker_name] = len(self.sticker_names)
+            self.sticker_names.append(sticker_name)
+        return sticker_id
+
+    def add(self, frame, face, sticker_name, reference_boxes, sticker_box):
+        """Adds attached sticker.
+
+        :param self: self
+        :param frame: index of frame
+        :param face: index of face in frame
+        :param sticker_name: name of sticker
+        :param reference_boxes: list of (x, y, width, height) of face parts that sticker should cover
+        :param sticker_box: (x, y, width, height) of visible part of sticker, None if sticker is outside of frame
+        """
+        entry = len(self.entry_frame)
+        self.entry_frame.append(frame)
+        self.entry_face.append(face)
+        self.entry_sticker.append(self.sticker_id(sticker_name))
+        if sticker_box is None:
+            return      # entry without rows has iou 0
+        for box in reference_boxes:
+            self.row_entry.append(entry)
+            self.reference_boxes.extend(box)
+            self.sticker_boxes.extend(sticker_box)
+
+    def extend(self, other, frame=None):
+        """Adds all entries of other table, e.g. of one frame processed in worker process.
+
+        :param self: self
+        :param other: iou table
+        :param frame: index of frame that replaces frame indices of other table, None for keeping them
+        """
+        offset = len(self.entry_frame)
+        for idx in range(len(other.entry_frame)):
+            self.entry_frame.append(other.entry_frame[idx] if frame is None else frame)
+            self.entry_face.append(other.entry_face[idx])
+            self.entry_sticker.append(self.sticker_id(other.sticker_names[other.entry_sticker[idx]]))
+        self.row_entry.extend(entry + offset for entry in other.row_entry)
+        self.reference_boxes.extend(other.reference_boxes)
+        self.sticker_boxes.extend(other.sticker_boxes)
+
+    def clear(self):
+        """Removes all entries.
+
+        :param self: self
+        """
+        self.__init__()
+
+    def evaluate(self):
+        """Calculates iou coefficients of all rows and summarizes them.
+
+        :param self: self
+        :returns: dict with iou of each entry ("entry_iou" with "entry_frame", "entry_face" and
+                  "entry_sticker"), average iou of attached stickers in each frame ("frame_iou" with "frame" and
+                  "frame_sticker"), average iou of each face slot ("face_iou") and average iou of each sticker
+                  over frames ("sticker_iou") and over faces ("sticker_face_iou")
+        """
+        entries = len(self.entry_frame)
+        entry_frame = np.array(self.entry_frame, dtype=np.int64)     # copies, table can grow afterwards
+        entry_face = np.array(self.entry_face, dtype=np.int64)
+        entry_sticker = np.array(self.entry_sticker, dtype=np.int64)
+        row_iou = batch_iou(np.frombuffer(self.reference_boxes, dtype=np.int64),
+                            np.frombuffer(self.sticker_boxes, dtype=np.int64))
+        entry_iou = group_means(np.frombuffer(self.row_entry, dtype=np.int64), row_iou, entries)
+
+        # frame averages are calculated separately for each sticker attached in frame
+        stickers = max(len(self.sticker_names), 1)
+        frame_keys, frame_index = np.unique(entry_frame * stickers + entry_sticker, return_inverse=True)
+        frame_iou = group_means(frame_index.reshape(-1), entry_iou, len(frame_keys))
+        frame_sticker = frame_keys % stickers
+
+        face_iou = group_means(entry_face, entry_iou, int(entry_face.max()) + 1 if entries > 0 else 0)
+        sticker_iou = group_means(frame_sticker, frame_iou, len(self.sticker_names))
+        sticker_face_iou = group_means(entry_sticker, entry_iou, len(self.sticker_names))
+        return {
+            "row_iou": row_iou,
+            "entry_iou": entry_iou,
+            "entry_frame": entry_frame,
+            "entry_face": entry_face,
+            "entry_sticker": entry_sticker,
+            "frame": frame_keys // stickers,
+            "frame_sticker": frame_sticker,
+            "frame_iou": frame_iou,
+            "face_iou": face_iou,
+            "sticker_iou": dict(zip(self.sticker_names, sticker_iou.tolist())),
+            "sticker_face_iou": dict(zip(self.sticker_names, sticker_face_iou.tolist()))
+        }
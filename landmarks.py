@@ -0,0 +1,212 @@
+import math
+import numpy as np
+
+POINTS_NUMBER = 68
+# indices of 68 landmark points that belong to each face part, in order in which points of face part are listed
+REGION_INDICES = {
+    "chin": np.arange(0, 17),
+    "left_eyebrow": np.arange(17, 22),
+    "right_eyebrow": np.arange(22, 27),
+    "nose_bridge": np.arange(27, 31),
+    "nose_tip": np.arange(31, 36),
+    "left_eye": np.arange(36, 42),
+    "right_eye": np.arange(42, 48),
+    "top_lip": np.array([48, 49, 50, 51, 52, 53, 54, 64, 63, 62, 61, 60]),
+    "bottom_lip": np.array([54, 55, 56, 57, 58, 59, 48, 60, 67, 66, 65, 64])
+}
+# face parts whose points are consecutive, so that they are taken as views without copying
+REGION_SLICES = {
+    "chin": slice(0, 17),
+    "left_eyebrow": slice(17, 22),
+    "right_eyebrow": slice(22, 27),
+    "nose_bridge": slice(27, 31),
+    "nose_tip": slice(31, 36),
+    "left_eye": slice(36, 42),
+    "right_eye": slice(42, 48)
+}
+ANGLE_POINTS = (17, 26)     # first point of left eyebrow and last point of right eyebrow
+MOUTH_MIDDLE_POINTS = np.array([54, 64, 63, 67, 66, 65])    # inner points in the middle of both lips
+# indices of 68 points that 5 point model predicts, in its order: outer and inner corner of eye on the right
+# side of image (45, 42), outer and inner corner of eye on the left side of image (36, 39), bottom of nose (33)
+FIVE_POINT_INDICES = np.array([45, 42, 36, 39, 33])
+# mean positions of 68 points on face normalized to unit square, fitted to 5 predicted points to estimate others
+MEAN_SHAPE = np.array([
+    (0.0792, 0.3392), (0.0829, 0.4570), (0.0968, 0.5756), (0.1221, 0.6919), (0.1687, 0.8003), (0.2398, 0.8957),
+    (0.3257, 0.9771), (0.4223, 1.0433), (0.5318, 1.0608), (0.6413, 1.0398), (0.7381, 0.9723), (0.8244, 0.8896),
+    (0.8948, 0.7925), (0.9394, 0.6815), (0.9611, 0.5622), (0.9706, 0.4418), (0.9712, 0.3221), (0.1638, 0.2492),
+    (0.2178, 0.2043), (0.2913, 0.1924), (0.3675, 0.2036), (0.4393, 0.2331), (0.5864, 0.2281), (0.6602, 0.1959),
+    (0.7375, 0.1824), (0.8132, 0.1928), (0.8708, 0.2353), (0.5153, 0.3186), (0.5162, 0.3962), (0.5171, 0.4738),
+    (0.5182, 0.5532), (0.4337, 0.6041), (0.4755, 0.6208), (0.5207, 0.6343), (0.5659, 0.6188), (0.6071, 0.6016),
+    (0.2524, 0.3311), (0.2987, 0.3026), (0.3557, 0.3030), (0.4037, 0.3387), (0.3525, 0.3500), (0.2968, 0.3505),
+    (0.6313, 0.3341), (0.6791, 0.2965), (0.7360, 0.2947), (0.7829, 0.3213), (0.7403, 0.3418), (0.6850, 0.3437),
+    (0.3532, 0.7462), (0.4146, 0.7191), (0.4777, 0.7068), (0.5227, 0.7171), (0.5698, 0.7054), (0.6352, 0.7157),
+    (0.6995, 0.7394), (0.6394, 0.8052), (0.5764, 0.8354), (0.5254, 0.8417), (0.4764, 0.8375), (0.4138, 0.8100),
+    (0.3801, 0.7500), (0.4780, 0.7451), (0.5234, 0.7489), (0.5711, 0.7433), (0.6724, 0.7442), (0.5725, 0.7766),
+    (0.5240, 0.7834), (0.4776, 0.7785)
+])
+# landmark models from cheapest to most expensive: name, number of predicted points and face parts whose points
+# are good enough for placing stickers. 5 point model predicts corners of eyes, so it provides only eyes, other
+# parts are synthesized from mean face shape. Ends of eyebrows that angle of every sticker is calculated from
+# are synthesized with the same rotation as line between predicted eye corners, so angle needs no face part.
+LANDMARK_MODELS = [
+    ("predictor_5_point", 5, ("left_eye", "right_eye")),
+    ("predictor_68_point", POINTS_NUMBER, tuple(REGION_INDICES))
+]
+DEFAULT_LANDMARK_MODEL = "predictor_68_point"
+LANDMARK_MODEL_POINTS = dict((name, points) for name, points, _ in LANDMARK_MODELS)
+
+
+class FaceLandmarks(object):
+    """
+    Represents 68 landmark points of all faces in frame as one (faces, 68, 2) int32 array, so that bounding
+    boxes of face parts, angles and mouth checks are calculated for all faces at once. Indexing and iterating
+    gives dictionaries of points for face parts, the same as lists of landmarks that were used before.
+    """
+    def __init__(self, points):
+        """Initializes landmarks.
+
+        :param self: self
+        :param points: array-like of 68 points (x, y) for each face
+        """
+        self.points = np.asarray(points, dtype=np.int32).reshape(-1, POINTS_NUMBER, 2)
+
+    @staticmethod
+    def from_dicts(face_landmarks_list):
+        """Creates landmarks from dictionaries of points for face parts.
+
+        :param face_landmarks_list: list of dictionaries of points for face parts
+        :returns: face landmarks
+        """
+        if isinstance(face_landmarks_list, FaceLandmarks):
+            return face_landmarks_list
+        points = np.zeros((len(face_landmarks_list), POINTS_NUMBER, 2), dtype=np.int32)
+        for idx, face_land in enumerate(face_landmarks_list):
+            for region, indices in REGION_INDICES.items():
+                points[idx, indices] = face_land[region]
+        return FaceLandmarks(points)
+
+    def __len__(self):
+        return self.points.shape[0]
+
+    def __getitem__(self, idx):
+        """Returns dictionary of points for face parts of one face.
+
+        :param self: self
+        :param idx: index of face
+        :returns: dictionary that for every face part contains list of points (x, y)
+        """
+        points = [tuple(p) for p in self.points[idx].tolist()]
+        return dict((region, [points[i] for i in indices]) for region, indices in REGION_INDICES.items())
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def as_dicts(self):
+        """Returns dictionaries of points for face parts for all faces.
+
+        :param self: self
+        :returns: list of dictionaries
+        """
+        return list(self)
+
+    def region(self, name):
+        """Returns points of face part for all faces.
+
+        :param self: self
+        :param name: name of face part
+        :returns: (faces, points of face part, 2) array, view of landmarks for consecutive points
+        """
+        if name in REGION_SLICES:
+            return self.points[:, REGION_SLICES[name]]
+        return self.points[:, REGION_INDICES[name]]
+
+    def bounding_boxes(self, name):
+        """Calculates bounding box of face part for all faces.
+
+        :param self: self
+        :param name: name of face part
+        :returns: (faces, 4) array of x, y, width and height
+        """
+        return bounding_boxes(self.region(name))
+
+    def angles(self):
+        """Calculates angle of line between first point of left and last point of right eyebrow
+        for all faces.
+
+        :param self: self
+        :returns: array of angles in degrees, 0 when line is vertical
+        """
+        start = self.points[:, ANGLE_POINTS[0]]
+        end = self.points[:, ANGLE_POINTS[1]]
+        dx = (end[:, 0] - start[:, 0]).astype(np.float64)
+        dy = (end[:, 1] - start[:, 1]).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            angles = 180 / math.pi * np.arctan(dy / dx)
+        angles[dx == 0] = 0.0
+        return angles
+
+    def mouth_open(self):
+        """Checks for all faces if mouth is open, i.e. if gap between lips is higher than half
+        of bottom lip height.
+
+        :param self: self
+        :returns: boolean array
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=bool)
+        gap = bounding_boxes(self.points[:, MOUTH_MIDDLE_POINTS])[:, 3]
+        bottom_lip = self.bounding_boxes("bottom_lip")[:, 3]
+        return gap > bottom_lip / 2
+
+
+def cheapest_landmark_model(regions, is_available=None):
+    """Chooses cheapest landmark model whose points are good enough for all face parts.
+
+    :param regions: names of needed face parts
+    :param is_available: function that tells whether model with given name can be loaded, all models are
+           available if None
+    :returns: name of landmark model, DEFAULT_LANDMARK_MODEL if no cheaper model is available
+    """
+    for name, _, provided in LANDMARK_MODELS:
+        if set(regions) <= set(provided) and (is_available is None or is_available(name)):
+            return name
+    return DEFAULT_LANDMARK_MODEL
+
+
+def estimate_points(points):
+    """Estimates 68 landmark points from 5 points (corners of eyes and bottom of nose) by fitting mean face
+    shape to them with similarity transform (scale, rotation and translation). Predicted points are kept.
+
+    :param points: (faces, 5, 2) array of points predicted by 5 point model
+    :returns: (faces, 68, 2) int32 array of points
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, len(FIVE_POINT_INDICES), 2)
+    if points.shape[0] == 0:
+        return np.zeros((0, POINTS_NUMBER, 2), dtype=np.int32)
+    # points as complex numbers, so similarity transform is multiplication and addition
+    shape = MEAN_SHAPE[:, 0] + 1j * MEAN_SHAPE[:, 1]
+    source = shape[FIVE_POINT_INDICES]
+    target = points[:, :, 0] + 1j * points[:, :, 1]
+    source_mean = source.mean()
+    target_mean = target.mean(axis=1, keepdims=True)
+    centered = source - source_mean
+    scale = ((np.conj(centered) * (target - target_mean)).sum(axis=1, keepdims=True)
+             / (np.abs(centered) ** 2).sum())
+    estimated = scale * (shape - source_mean) + target_mean
+    result = np.rint(np.stack([estimated.real, estimated.imag], axis=2)).astype(np.int32)
+    result[:, FIVE_POINT_INDICES] = np.rint(points).astype(np.int32)
+    return result
+
+
+def bounding_boxes(points):
+    """Calculates bounding boxes of groups of points.
+
+    :param points: (groups, points, 2) array
+    :returns: (groups, 4) array of x, y, width and height
+    """
+    if points.shape[0] == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+    mins = points.min(axis=1)
+    maxs = points.max(axis=1)
+    return np.concatenate([mins, maxs - mins], axis=1)
@@ -0,0 +1,293 @@
+import argparse
+import sys
+import time
+from collections import deque
+import cv2
+from detection import face_locations, face_landmark_points, draw_face_rectangles, landmark_model_for
+from filters import put_filters_on
+from landmarks import FaceLandmarks
+from instrumentation import metrics
+from sticker_registry import sticker_registry
+from video_io import open_source, LatestFrameGrabber
+from video_writers import create_video_writer
+
+WINDOW_NAME = "FaceSnap live"
+
+
+class LiveSession(object):
+    """
+    Represents live mode that attaches sticker to camera frames as they arrive. End-to-end latency (from
+    capture to shown result) is kept under budget: only the newest frame is processed, frames that are
+    already older than budget are dropped, and when detection would not fit into budget, faces and landmarks
+    from last detection are reused and only sticker is attached.
+    """
+    def __init__(self, chosen_filter, faces_number=-1, draw_rectangles=False, latency_budget_ms=100.0,
+                 max_reuse=15, min_face_size=None, detect=None, landmark_model=None):
+        """Initializes live session.
+
+        :param self: self
+        :param chosen_filter: chosen filter that is attached to detected faces
+        :param faces_number: number of expected faces in frame
+        :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+        :param latency_budget_ms: maximal time in milliseconds from capture of frame to showing its result
+        :param max_reuse: maximal number of frames in a row that reuse last detections, so faces are detected
+               at least this often even if detection never fits into budget
+        :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+        :param detect: function that takes frame and returns face bounds and (faces, 68, 2) array of landmark
+               points, dlib detection if None
+        :param landmark_model: name of landmark model of dlib detection, cheapest available model that chosen
+               filter needs if None
+        """
+        self.chosen_filter = chosen_filter
+        self.faces_number = faces_number
+        self.draw_rectangles = draw_rectangles
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.max_reuse = max_reuse
+        self.min_face_size = min_face_size
+        self.landmark_model = landmark_model if landmark_model is not None else landmark_model_for([chosen_filter])
+        self.detect = detect if detect is not None else self.detect_faces
+        self.faces = None
+        self.points = None
+        self.reused = 0             # number of frames in a row that reused last detections
+        self.detect_time = 0.0      # moving averages of durations in seconds
+        self.attach_time = 0.0
+        self.latency = 0.0          # end-to-end latency of last shown frame in seconds
+        self.shown_times = deque(maxlen=30)     # times when last frames were shown, for fps
+        self.statistics = {"frames": 0, "stale": 0, "detections": 0, "reused_detections": 0,
+                           "over_budget": 0, "dlib_success": 0}
+
+    def detect_faces(self, frame):
+        """Detects faces and their landmarks with dlib.
+
+        :param self: self
+        :param frame: frame
+        :returns: list of face bounds (top, right, bottom, left) and (faces, 68, 2) array of landmark points
+        """
+        faces = face_locations(frame, number_of_times=1, min_face_size=self.min_face_size)
+        return faces, face_landmark_points(frame, faces, self.landmark_model)
+
+    def should_detect(self, age):
+        """Decides whether faces are detected on frame or last detections are reused.
+
+        :param self: self
+        :param age: time in seconds since frame was captured
+        :returns: indicator whether faces should be detected
+        """
+        if self.faces is None or self.reused >= self.max_reuse:
+            return True
+        return age + self.detect_time + self.attach_time <= self.latency_budget
+
+    def process(self, frame, timestamp):
+        """Attaches sticker to frame, detecting faces or reusing last detections.
+
+        :param self: self
+        :param frame: frame, result is drawn on it
+        :param timestamp: monotonic capture time of frame
+        :returns: result image
+        """
+        start = time.monotonic()
+        if self.should_detect(start - timestamp):
+            self.faces, self.points = self.detect(frame)
+            self.reused = 0
+            self.statistics["detections"] += 1
+            detected = time.monotonic()
+            self.detect_time = moving_average(self.detect_time, detected - start)
+        else:
+            self.reused += 1
+            self.statistics["reused_detections"] += 1
+            metrics.increment("live_reused_detections")
+            detected = time.monotonic()
+        if self.faces_number == -1 or len(self.faces) == self.faces_number:
+            self.statistics["dlib_success"] += 1
+
+        if self.draw_rectangles:
+            draw_face_rectangles(frame, self.faces, (255, 0, 0))
+        if self.chosen_filter != "":
+            put_filters_on(frame, self.faces, FaceLandmarks(self.points), self.chosen_filter, [])
+        self.attach_time = moving_average(self.attach_time, time.monotonic() - detected)
+        self.draw_overlay(frame)
+        return frame
+
+    def draw_overlay(self, image):
+        """Draws current fps and latency of last shown frame.
+
+        :param self: self
+        :param image: result image
+        """
+        text = str(round(self.fps(), 1)) + " fps, " + str(int(self.latency * 1000)) + " ms"
+        cv2.putText(image, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 4, cv2.LINE_AA)
+        cv2.putText(image, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+
+    def fps(self):
+        """Calculates frame rate of shown frames over last frames.
+
+        :param self: self
+        :returns: frames per second
+        """
+        if len(self.shown_times) < 2:
+            return 0.0
+        return (len(self.shown_times) - 1) / max(self.shown_times[-1] - self.shown_times[0], 1e-6)
+
+    def frame_shown(self, timestamp):
+        """Records that result of frame was shown.
+
+        :param self: self
+        :param timestamp: monotonic capture time of frame
+        """
+        now = time.monotonic()
+        self.latency = now - timestamp
+        self.shown_times.append(now)
+        self.statistics["frames"] += 1
+        if self.latency > self.latency_budget:
+            self.statistics["over_budget"] += 1
+        metrics.increment("live_frames")
+        metrics.observe("live_latency_ms", self.latency * 1000)
+
+    def run(self, source, show=True, output_path=None, max_frames=None):
+        """Processes frames from capture source until it ends, 'q' is pressed in window or max_frames frames
+        are shown.
+
+        :param self: self
+        :param source: opened capture source, e.g. camera or replayed video file
+        :param show: indicator whether results are shown in window
+        :param output_path: path of video to which shown results are written, None if not needed
+        :param max_frames: maximal number of shown frames, None for no limit
+        :returns: dict with statistics of session
+        """
+        metrics.reset()     # latency histogram describes only this session
+        grabber = LatestFrameGrabber(source)
+        writer = None
+        start = time.monotonic()
+        try:
+            while max_frames is None or self.statistics["frames"] < max_frames:
+                frame, timestamp = grabber.latest()
+                if frame is None:
+                    break   # source ended
+                if time.monotonic() - timestamp > self.latency_budget:
+                    self.statistics["stale"] += 1   # result would be late anyway
+                    metrics.increment("live_dropped_frames")
+                    continue
+                image = self.process(frame, timestamp)
+                if output_path is not None:
+                    if writer is None:
+                        writer = create_video_writer(output_path, source.fps(), (image.shape[1], image.shape[0]))
+                    writer.write(image)
+                if show:
+                    cv2.imshow(WINDOW_NAME, image)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                self.frame_shown(timestamp)
+        finally:
+            grabber.stop()
+            if writer is not None:
+                writer.release()
+            if show:
+                cv2.destroyWindow(WINDOW_NAME)
+        elapsed = time.monotonic() - start
+        statistics = dict(self.statistics)
+        statistics["captured"] = grabber.sequence
+        statistics["dropped"] = grabber.dropped + self.statistics["stale"]
+        statistics["elapsed"] = elapsed
+        statistics["fps"] = self.statistics["frames"] / elapsed if elapsed > 0 else 0.0
+        statistics["latency_ms"] = metrics.histogram("live_latency_ms").as_dict()
+        return statistics
+
+
+def moving_average(average, value, weight=0.2):
+    """Updates exponential moving average.
+
+    :param average: current average, 0 if there are no values yet
+    :param value: new value
+    :param weight: weight of new value
+    :returns: new average
+    """
+    return value if average == 0.0 else average + weight * (value - average)
+
+
+def run_live(source, chosen_filter, faces_number=-1, draw_rectangles=False, latency_budget_ms=100.0,
+             max_reuse=15, min_face_size=None, show=True, output_path=None, max_frames=None):
+    """Runs live sticker mode on camera or replayed video file.
+
+    :param source: index of camera or path of video file replayed at its native frame rate
+    :param chosen_filter: chosen filter that is attached to detected faces
+    :param faces_number: number of expected faces in frame
+    :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+    :param latency_budget_ms: maximal time in milliseconds from capture of frame to showing its result
+    :param max_reuse: maximal number of frames in a row that reuse last detections
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :param show: indicator whether results are shown in window
+    :param output_path: path of video to which shown results are written, None if not needed
+    :param max_frames: maximal number of shown frames, None for no limit
+    :returns: dict with statistics of session or None if source could not be opened
+    """
+    capture = open_source(source)
+    if not capture.isOpened():
+        print("Error opening capture source!")
+        return None
+    session = LiveSession(chosen_filter, faces_number, draw_rectangles, latency_budget_ms, max_reuse,
+                          min_face_size)
+    try:
+        return session.run(capture, show, output_path, max_frames)
+    finally:
+        capture.release()
+
+
+def print_live_statistics(statistics):
+    """Prints statistics of live session.
+
+    :param statistics: dict with statistics returned by run_live
+    """
+    print("Live session: " + str(statistics["frames"]) + " frames shown of " + str(statistics["captured"])
+          + " captured (" + str(statistics["dropped"]) + " dropped), " + str(round(statistics["fps"], 2)) + " fps!")
+    print("Detections: " + str(statistics["detections"]) + ", reused detections: "
+          + str(statistics["reused_detections"]) + "!")
+    print("Latency: p50 " + str(statistics["latency_ms"]["p50"]) + " ms, p95 " + str(statistics["latency_ms"]["p95"])
+          + " ms, over budget " + str(statistics["over_budget"]) + " frames!")
+
+
+def parse_arguments(argv):
+    """Parses command line arguments of live mode.
+
+    :param argv: list of command line arguments
+    :returns: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Attaches sticker to faces on camera frames as they arrive.")
+    parser.add_argument("--source", default="0",
+                        help="index of camera or video file that is replayed at its native frame rate")
+    parser.add_argument("--sticker", default="", help="name of sticker attached to faces")
+    parser.add_argument("--faces", type=int, default=-1, help="expected number of faces in each frame")
+    parser.add_argument("--draw-rectangles", action="store_true", help="draw rectangles around faces")
+    parser.add_argument("--latency-budget", type=float, default=100.0,
+                        help="maximal latency in milliseconds from capture to shown result")
+    parser.add_argument("--max-reuse", type=int, default=15,
+                        help="maximal number of frames in a row that reuse last detections")
+    parser.add_argument("--min-face-size", type=int, default=None,
+                        help="width of smallest expected face, enables detection on lower resolution")
+    parser.add_argument("--no-window", action="store_true", help="do not show results, e.g. on server")
+    parser.add_argument("--output", default=None, help="video file to which shown results are written")
+    parser.add_argument("--max-frames", type=int, default=None, help="stop after this number of shown frames")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs live mode from command line.
+
+    :param argv: list of command line arguments, sys.argv is used if None
+    :returns: exit code
+    """
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    sticker_registry.load_packs()
+    if arguments.sticker != "" and sticker_registry.get(arguments.sticker) is None:
+        print("Unknown sticker " + arguments.sticker + "! Available stickers: " + ", ".join(sticker_registry.names()))
+        return 2
+    statistics = run_live(arguments.source, arguments.sticker, arguments.faces if arguments.faces > 0 else -1,
+                          arguments.draw_rectangles, arguments.latency_budget, arguments.max_reuse,
+                          arguments.min_face_size, not arguments.no_window, arguments.output, arguments.max_frames)
+    if statistics is None:
+        return 1
+    print_live_statistics(statistics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import sys
 from main_window import *
+from sticker_registry import sticker_registry
 from proxy_style import *
 from PyQt5.QtWidgets import QApplication
 
@@ -24,6 +25,8 @@ if __name__ == "__main__":
         except:
             faces_number = -1
 
+    sticker_registry.load_packs()   # third-party stickers from sticker_packs directory
+
     app = QApplication(sys.argv)
     myStyle = MyProxyStyle('Fusion')
     app.setStyle(myStyle)
@@ -1,10 +1,18 @@
-from PyQt5.QtCore import QDir
+from PyQt5.QtCore import QDir, QThread
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QMainWindow, QFileDialog, QWidget, QStatusBar, \
-    QVBoxLayout, QHBoxLayout, QRadioButton, QButtonGroup, QPushButton, QDesktopWidget, QSizePolicy
+    QVBoxLayout, QHBoxLayout, QRadioButton, QButtonGroup, QPushButton, QDesktopWidget, QSizePolicy, QCheckBox, \
+    QSpinBox
 from cam import *
 import stickers
 from detection import *
+from sticker_registry import sticker_registry
+from detection_cache import DetectionCache, DEFAULT_DIRECTORY
+from live import run_live, print_live_statistics
+from render_thread import RenderThread, PreviewThread, ThumbnailStrip, PreviewWidget
+from preview import StickerPreview, PREVIEW_FRAMES
+
+CACHE_SIZE_MB = 1024    # default size limit of detection cache in MB
 
 
 class MainWindow(QMainWindow):
@@ -27,6 +35,7 @@ class MainWindow(QMainWindow):
         self.file_name = ""
         self.chosen_filter = ""
         self.processing = False
+        self.detection_cache = None     # cache of detections if user enables it, None otherwise
 
         self.layout = QVBoxLayout()  # layout for the central widget
         widget = QWidget(self)  # central widget
@@ -50,6 +59,7 @@ class MainWindow(QMainWindow):
 
         self.cam_video_radio = QRadioButton("Capture video with camera")
         self.cam_video_button = QPushButton("Record video")
+        self.live_button = QPushButton("Live stickers")
 
         self.mask_button = QRadioButton()
         self.cat_button = QRadioButton()
@@ -60,16 +70,37 @@ class MainWindow(QMainWindow):
         self.mouse_button = QRadioButton()
         self.pirate_button = QRadioButton()
         self.rainbow_button = QRadioButton()
+        self.pack_buttons = {}  # radio buttons of stickers from sticker packs, by sticker name
 
         self.init_video_choice()
         self.init_filter_choice()
 
+        self.sticker_preview = None     # detections of sampled frames of chosen video, None if no video
+        self.preview_thread = None      # thread that creates sticker preview, None if nothing is previewed
+        self.preview_outdated = False   # indicator whether sticker or video changed while preview was created
+        self.thumbnails = ThumbnailStrip(PREVIEW_FRAMES)    # sampled frames with chosen sticker
+        self.layout.addWidget(self.thumbnails)
+
+        self.render_thread = None   # thread that renders chosen video, None if nothing is rendered
+        self.preview = PreviewWidget()  # preview frames while rendering, result video afterwards
+        self.layout.addWidget(self.preview)
+
         self.process_button = QPushButton("Process video")
         self.process_button.clicked.connect(self.process_chosen_video)
-        self.layout.addWidget(QWidget())
-        self.layout.addWidget(QWidget())
-        self.layout.addWidget(QWidget())
-        self.layout.addWidget(self.process_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.cancel_button.setEnabled(False)
+        process_layout = QHBoxLayout()
+        process_widget = QWidget()
+        process_widget.setLayout(process_layout)
+        process_layout.addWidget(self.process_button)
+        process_layout.addWidget(self.cancel_button)
+        self.layout.addWidget(process_widget)
+
+        self.cache_checkbox = QCheckBox("Cache detections")
+        self.cache_size = QSpinBox()
+        self.clear_cache_button = QPushButton("Clear cache")
+        self.init_cache_settings()
         self.layout.addWidget(QWidget())
         self.status = QStatusBar()
         self.layout.addWidget(self.status)
@@ -103,11 +134,65 @@ class MainWindow(QMainWindow):
         self.cam_video_layout.addWidget(self.cam_video_radio)
         self.cam_video_layout.addWidget(self.cam_video_button)
 
+        self.live_button.clicked.connect(self.live_video)
+        self.cam_video_layout.addWidget(self.live_button)
+
         self.layout.addWidget(self.existing_video_widget)
         self.layout.addWidget(self.cam_video_widget)
 
         self.existing_video_radio.click()
 
+    def init_cache_settings(self):
+        """Initializes detection cache settings. Cache is disabled until user enables it.
+
+        :param self: self
+        """
+        self.cache_checkbox.setToolTip("Rendering same video with another sticker skips detection, detections are "
+                                       "stored in " + DEFAULT_DIRECTORY)
+        self.cache_checkbox.toggled.connect(self.update_detection_cache)
+        self.cache_size.setRange(16, 1 << 16)
+        self.cache_size.setSingleStep(256)
+        self.cache_size.setValue(CACHE_SIZE_MB)
+        self.cache_size.setPrefix("limit ")
+        self.cache_size.setSuffix(" MB")
+        self.cache_size.setEnabled(False)
+        self.cache_size.valueChanged.connect(self.update_detection_cache)
+        self.clear_cache_button.clicked.connect(self.clear_detection_cache)
+
+        cache_layout = QHBoxLayout()
+        cache_widget = QWidget()
+        cache_widget.setLayout(cache_layout)
+        cache_layout.addWidget(self.cache_checkbox)
+        cache_layout.addWidget(self.cache_size)
+        cache_layout.addWidget(self.clear_cache_button)
+        self.layout.addWidget(cache_widget)
+
+    def update_detection_cache(self):
+        """Enables or disables detection cache and applies its size limit, entries over limit are removed.
+
+        :param self: self
+        """
+        self.cache_size.setEnabled(self.cache_checkbox.isChecked())
+        if self.cache_checkbox.isChecked():
+            self.detection_cache = DetectionCache(max_bytes=self.cache_size.value() << 20)
+            self.detection_cache.evict()
+        else:
+            self.detection_cache = None     # stored detections are kept until cache is cleared
+
+    def clear_detection_cache(self):
+        """Removes all stored detections.
+
+        :param self: self
+        """
+        if self.processing:
+            self.status.showMessage("Cache can not be cleared while video is processed!")
+            return
+        cache = self.detection_cache if self.detection_cache is not None else DetectionCache()
+        size = cache.size()
+        cache.clear()
+        self.status.showMessage("Detection cache is cleared, " + str(round(size / float(1 << 20), 1))
+                                + " MB removed!")
+
     def init_filter_choice(self):
         """Initializes radio button group for filter choice.
 
@@ -130,6 +215,13 @@ class MainWindow(QMainWindow):
         sticker_rows.addWidget(first_row_widget)
         sticker_rows.addWidget(second_row_widget)
         sticker_rows.addWidget(third_row_widget)
+        pack_names = sticker_registry.names(include_builtin=False)
+        if len(pack_names) > 0:
+            pack_row_layout = QHBoxLayout()
+            pack_row_widget = QWidget()
+            pack_row_widget.setLayout(pack_row_layout)
+            sticker_rows.addWidget(pack_row_widget)
+            self.init_pack_filters(pack_row_layout, pack_names)
         filter_widget = QWidget()
         filter_widget.setLayout(sticker_rows)
 
@@ -214,6 +306,22 @@ class MainWindow(QMainWindow):
         self.rainbow_button.setIcon(QIcon(stickers.rainbow_sticker()))
         third_row_layout.addWidget(self.rainbow_button)     # add rainbow to widget
 
+    def init_pack_filters(self, pack_row_layout, pack_names):
+        """Initializes row of radio button group for stickers from sticker packs.
+
+        :param self: self
+        :param pack_row_layout: layout for row of sticker pack filters
+        :param pack_names: names of stickers from sticker packs
+        """
+        for name in pack_names:
+            button = QRadioButton()
+            button.clicked.connect(self.filter_chosen)
+            self.filter_group.addButton(button)
+            button.setIcon(QIcon(sticker_registry.get(name).asset))
+            button.setToolTip(name)
+            pack_row_layout.addWidget(button)    # add sticker from pack to widget
+            self.pack_buttons[name] = button
+
     def filter_chosen(self):
         """Detects which filter is chosen.
 
@@ -239,27 +347,157 @@ class MainWindow(QMainWindow):
             self.chosen_filter = "rainbow"
         else:
             self.chosen_filter = ""
+            for name, button in self.pack_buttons.items():
+                if button.isChecked():
+                    self.chosen_filter = name
+        self.update_sticker_preview()
+
+    def video_chosen(self, file_name):
+        """Remembers chosen video and starts detecting faces on its sampled frames for sticker preview.
+
+        :param self: self
+        :param file_name: path of chosen video
+        """
+        self.file_name = file_name
+        self.sticker_preview = StickerPreview(file_name)
+        self.update_sticker_preview()
+
+    def update_sticker_preview(self):
+        """Starts creating preview of chosen sticker on sampled frames of chosen video on preview thread. If
+        preview is already being created, it is created again when it is finished.
+
+        :param self: self
+        """
+        if self.sticker_preview is None:
+            return
+        if self.preview_thread is not None:
+            self.preview_outdated = True
+            return
+        self.preview_outdated = False
+        self.preview_thread = PreviewThread(self.sticker_preview, self.chosen_filter, self.draw_rectangles,
+                                            parent=self)
+        self.preview_thread.previewed.connect(self.sticker_previewed)
+        self.preview_thread.start()
+
+    def sticker_previewed(self, images):
+        """Shows sticker preview, or creates it again if sticker or video changed in the meantime.
+
+        :param self: self
+        :param images: list of Qt images of sampled frames with sticker
+        """
+        self.preview_thread.wait()
+        self.preview_thread = None
+        if self.preview_outdated:
+            self.update_sticker_preview()
+        else:
+            self.thumbnails.show_images(images)
 
     def process_chosen_video(self):
-        """Starts processing chosen video and informs user about process success.
+        """Starts processing chosen video on render thread, so window stays responsive.
 
         :param self: self
         """
         if self.file_name == "":
             print("Video for processing is not chosen!")
             self.status.showMessage("Video for processing is not chosen!")
+        elif self.processing:
+            self.status.showMessage("Processing video in progress!")
+        else:
+            self.processing = True
+            self.process_button.setEnabled(False)
+            self.cancel_button.setEnabled(True)
+            self.preview.stop()
+            self.status.showMessage("Processing video in progress!")
+            known_detections = None
+            if self.sticker_preview is not None and self.sticker_preview.path == self.file_name:
+                # sampled frames are not detected again if render uses the same landmark model as preview
+                known_detections = self.sticker_preview.known_detections(landmark_model_for([self.chosen_filter]))
+            self.render_thread = RenderThread(self.file_name, self.faces_number, self.draw_rectangles,
+                                              self.chosen_filter, self.detection_cache,
+                                              known_detections=known_detections,
+                                              evaluate_cv=self.faces_number != -1, parent=self)
+            self.render_thread.progress.connect(self.show_progress)
+            self.render_thread.preview.connect(self.preview.show_image)
+            self.render_thread.rendered.connect(self.processing_finished)
+            self.render_thread.error.connect(self.processing_failed)
+            self.render_thread.start(QThread.LowPriority)
+
+    def closeEvent(self, event):
+        """Cancels processing before window is closed.
+
+        :param self: self
+        :param event: close event
+        """
+        if self.render_thread is not None:
+            self.render_thread.cancel()
+            self.render_thread.wait()
+        if self.preview_thread is not None:
+            self.preview_thread.wait()
+        self.preview.stop()
+        super(MainWindow, self).closeEvent(event)
+
+    def show_progress(self, frames, total_frames, fps, eta):
+        """Shows progress of processing in status bar.
+
+        :param self: self
+        :param frames: number of processed frames
+        :param total_frames: total number of frames, 0 if unknown
+        :param fps: current fps
+        :param eta: estimated remaining seconds, negative if unknown
+        """
+        message = "Processing video: " + str(frames)
+        if total_frames > 0:
+            message += "/" + str(total_frames)
+        message += " frames, " + str(round(fps, 1)) + " fps"
+        if eta >= 0:
+            message += ", " + str(int(round(eta))) + " s remaining"
+        self.status.showMessage(message + "!")
+
+    def cancel_processing(self):
+        """Cancels processing of video.
+
+        :param self: self
+        """
+        if self.render_thread is not None:
+            self.render_thread.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status.showMessage("Cancelling processing!")
+
+    def stop_processing(self):
+        """Waits for finished render thread and enables processing of another video.
+
+        :param self: self
+        """
+        self.render_thread.wait()
+        self.render_thread = None
+        self.processing = False
+        self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def processing_failed(self, message):
+        """Informs user about error that stopped processing.
+
+        :param self: self
+        :param message: message of error
+        """
+        self.stop_processing()
+        self.status.showMessage("Error processing video: " + message + "!")
+
+    def processing_finished(self, statistics):
+        """Informs user about process success and plays result video.
+
+        :param self: self
+        :param statistics: dict with statistics of processing, None if video could not be opened
+        """
+        self.stop_processing()
+        if statistics is None:
+            self.status.showMessage("Error opening video!")
+        elif statistics["cancelled"]:
+            self.status.showMessage("Processing video is cancelled!")
         else:
-            if self.processing:
-                self.status.showMessage("Processing video in progress!")
-            else:
-                self.processing = True
-                self.status.showMessage("Processing video in progress!")
-                if process_video(self.file_name, self.faces_number, self.draw_rectangles, self.chosen_filter, self):
-                    self.status.showMessage("Processing video is successful!")
-                    self.processing = False
-                else:
-                    self.status.showMessage("Error opening video!")
-                    self.processing = False
+            print_statistics(statistics, self.faces_number)
+            self.preview.play(statistics["output_path"])
+            self.status.showMessage("Processing video is successful!")
 
     def existing_video_chosen(self):
         """Disables cam video button and enables existing video button.
@@ -267,6 +505,7 @@ class MainWindow(QMainWindow):
         :param self: self
         """
         self.cam_video_button.setEnabled(False)
+        self.live_button.setEnabled(False)
         self.existing_video_button.setEnabled(True)
 
     def cam_video_chosen(self):
@@ -275,6 +514,7 @@ class MainWindow(QMainWindow):
         :param self: self
         """
         self.cam_video_button.setEnabled(True)
+        self.live_button.setEnabled(True)
         self.existing_video_button.setEnabled(False)
 
     def open_file(self):
@@ -282,9 +522,10 @@ class MainWindow(QMainWindow):
 
         :param self: self
         """
-        self.file_name, _ = QFileDialog.getOpenFileName(self, "Open Video", QDir.homePath())
-        if self.file_name != "":
-            print(self.file_name)
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open Video", QDir.homePath())
+        if file_name != "":
+            print(file_name)
+            self.video_chosen(file_name)
             self.status.showMessage("Video successfully chosen!")
 
     def record_video(self):
@@ -297,5 +538,25 @@ class MainWindow(QMainWindow):
         if self.file_name != '':
             self.file_name += "/output_video.avi"
             print(self.file_name)
-            self.file_name = record_from_camera(self.file_name, self)
-            self.status.showMessage("Video successfully recorded!")
\ No newline at end of file
+            recorded_path = record_from_camera(self.file_name, self)
+            if recorded_path is None:
+                self.file_name = ""
+                self.status.showMessage("Video could not be recorded!")
+                return
+            self.file_name = recorded_path
+            self.video_chosen(self.file_name)
+            self.status.showMessage("Video successfully recorded!")
+
+    def live_video(self):
+        """Attaches chosen sticker to camera frames live, until 'q' is pressed.
+
+        :param self: self
+        """
+        self.hide()
+        statistics = run_live(0, self.chosen_filter, self.faces_number, self.draw_rectangles)
+        self.show()
+        if statistics is None:
+            self.status.showMessage("Error opening camera!")
+        else:
+            print_live_statistics(statistics)
+            self.status.showMessage("Live session finished!")
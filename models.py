@@ -0,0 +1,180 @@
+import os
+import threading
+import face_recognition_models
+
+
+class ModelRegistry(object):
+    """
+    Represents registry of models that are loaded on first use. Importing modules that use models is cheap,
+    and models can be loaded in advance with prewarm.
+    """
+    def __init__(self):
+        """Initializes empty registry.
+
+        :param self: self
+        """
+        self.loaders = {}
+        self.paths = {}     # files that models are loaded from, for models that are not always installed
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, loader, path=None):
+        """Registers model loader.
+
+        :param self: self
+        :param name: name of model
+        :param loader: function without arguments that loads model
+        :param path: file that model is loaded from, checked by is_available, None if model is always available
+        """
+        self.loaders[name] = loader
+        if path is not None:
+            self.paths[name] = path
+
+    def is_available(self, name):
+        """Checks whether model can be loaded, i.e. it is registered and its file exists.
+
+        :param self: self
+        :param name: name of model
+        :returns: True if model is available, else False
+        """
+        return name in self.loaders and (name not in self.paths or os.path.isfile(self.paths[name]))
+
+    def get(self, name):
+        """Returns model, loading it if it is not loaded yet.
+
+        :param self: self
+        :param name: name of model
+        :returns: model
+        """
+        model = self.models.get(name)
+        if model is None:
+            with self.lock:
+                model = self.models.get(name)
+                if model is None:
+                    model = self.loaders[name]()
+                    self.models[name] = model
+        return model
+
+    def is_loaded(self, name):
+        """Checks whether model is loaded.
+
+        :param self: self
+        :param name: name of model
+        :returns: True if model is loaded, else False
+        """
+        return name in self.models
+
+    def prewarm(self, names=None):
+        """Loads models in advance.
+
+        :param self: self
+        :param names: names of models that are loaded, all registered models if None
+        """
+        for name in (names if names is not None else [name for name in self.loaders if self.is_available(name)]):
+            self.get(name)
+
+
+def load_face_detector():
+    """Loads dlib HOG face detector.
+
+    :returns: face detector
+    """
+    import dlib
+    return dlib.get_frontal_face_detector()
+
+
+def load_predictor_68_point():
+    """Loads dlib 68 point shape predictor.
+
+    :returns: shape predictor
+    """
+    import dlib
+    return dlib.shape_predictor(face_recognition_models.pose_predictor_model_location())
+
+
+def load_predictor_5_point():
+    """Loads dlib 5 point shape predictor (corners of eyes and bottom of nose), which is much faster
+    than 68 point one.
+
+    :returns: shape predictor
+    """
+    import dlib
+    return dlib.shape_predictor(face_recognition_models.pose_predictor_five_point_model_location())
+
+
+def load_face_cascade():
+    """Loads opencv Haar cascade for frontal faces.
+
+    :returns: cascade classifier
+    """
+    import cv2
+    return cv2.CascadeClassifier(face_recognition_models.haar_cascade_frontal_face_model_location())
+
+
+def load_lbp_cascade():
+    """Loads opencv LBP cascade for frontal faces, faster and less accurate than Haar cascade.
+
+    :returns: cascade classifier
+    """
+    import cv2
+    return cv2.CascadeClassifier(face_recognition_models.lbp_cascade_frontal_face_model_location())
+
+
+def load_eye_cascade():
+    """Loads opencv Haar cascade for eyes.
+
+    :returns: cascade classifier
+    """
+    import cv2
+    return cv2.CascadeClassifier(face_recognition_models.haar_cascade_eye_model_location())
+
+
+registry = ModelRegistry()
+registry.register("face_detector", load_face_detector)
+registry.register("predictor_68_point", load_predictor_68_point)
+registry.register("predictor_5_point", load_predictor_5_point,
+                  face_recognition_models.pose_predictor_five_point_model_location())
+registry.register("face_cascade", load_face_cascade)
+registry.register("lbp_cascade", load_lbp_cascade)
+registry.register("eye_cascade", load_eye_cascade)
+
+
+def get_face_detector():
+    return registry.get("face_detector")
+
+
+def get_predictor_68_point():
+    return registry.get("predictor_68_point")
+
+
+def get_predictor_5_point():
+    return registry.get("predictor_5_point")
+
+
+def get_face_cascade():
+    return registry.get("face_cascade")
+
+
+def get_lbp_cascade():
+    return registry.get("lbp_cascade")
+
+
+def get_eye_cascade():
+    return registry.get("eye_cascade")
+
+
+def is_available(name):
+    """Checks whether model can be loaded.
+
+    :param name: name of model
+    :returns: True if model is available, else False
+    """
+    return registry.is_available(name)
+
+
+def prewarm(names=None):
+    """Loads models in advance so that first frame is not delayed.
+
+    :param names: names of models that are loaded, all available models if None
+    """
+    registry.prewarm(names)
@@ -0,0 +1,135 @@
+import multiprocessing
+import queue
+import threading
+import traceback
+
+
+def worker_loop(task_queue, result_queue, process_frame, initializer, initargs):
+    """Processes frames from task queue until None is received.
+
+    :param task_queue: queue of (index, frame)
+    :param result_queue: queue to which (index, result, error) is put
+    :param process_frame: function that takes frame and returns result
+    :param initializer: function called once when worker starts, None if not needed
+    :param initargs: arguments of initializer
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, frame = task
+        try:
+            result_queue.put((index, process_frame(frame), None))
+        except Exception:
+            result_queue.put((index, None, traceback.format_exc()))
+
+
+class ParallelFramePipeline(object):
+    """
+    Represents frame pipeline that processes frames in pool of worker processes. Decoder thread feeds bounded
+    queue of frames, workers process frames in any order and results are reordered so that they are consumed
+    in original frame order.
+    """
+    def __init__(self, process_frame, workers=None, queue_depth=None, initializer=None, initargs=()):
+        """Initializes frame pipeline.
+
+        :param self: self
+        :param process_frame: module level function that takes frame and returns result, it is run in workers
+        :param workers: number of worker processes, number of cores if None
+        :param queue_depth: maximal number of frames that are decoded but not consumed yet,
+               four frames per worker if None
+        :param initializer: module level function called once in each worker, e.g. for loading models
+        :param initargs: arguments of initializer
+        """
+        self.process_frame = process_frame
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.queue_depth = queue_depth if queue_depth is not None else 4 * self.workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.context = multiprocessing.get_context("spawn")    # workers load their own models
+
+    def imap(self, frames):
+        """Processes all frames and yields results in original frame order. Workers are stopped
+        when all results are yielded or when generator is closed.
+
+        :param self: self
+        :param frames: iterable of frames
+        :returns: generator of results
+        """
+        task_queue = self.context.Queue(self.workers)
+        result_queue = self.context.Queue()
+        in_flight = threading.BoundedSemaphore(self.queue_depth)   # limits decoded frames kept in memory
+        stop = threading.Event()
+        processes = [self.context.Process(target=worker_loop, daemon=True,
+                                          args=(task_queue, result_queue, self.process_frame, self.initializer,
+                                                self.initargs))
+                     for _ in range(self.workers)]
+        for process in processes:
+            process.start()
+
+        decoded = [0]   # number of frames sent to workers, known completely when decoder is done
+        decoder_errors = []
+        decoder_done = threading.Event()
+
+        def decode():
+            try:
+                for index, frame in enumerate(frames):
+                    in_flight.acquire()
+                    while not stop.is_set():
+                        try:
+                            task_queue.put((index, frame), timeout=0.1)   # workers may be gone
+                            break
+                        except queue.Full:
+                            pass
+                    if stop.is_set():
+                        break
+                    decoded[0] = index + 1
+            except Exception:
+                decoder_errors.append(traceback.format_exc())
+            decoder_done.set()
+
+        decoder = threading.Thread(target=decode, daemon=True)
+        decoder.start()
+
+        pending = {}        # results that wait for earlier frames
+        next_index = 0
+        try:
+            while True:
+                if next_index in pending:
+                    result = pending.pop(next_index)
+                    next_index += 1
+                    in_flight.release()
+                    yield result
+                    continue
+                if decoder_errors:
+                    raise RuntimeError("Frames could not be decoded!\n" + decoder_errors[0])
+                if decoder_done.is_set() and next_index >= decoded[0]:
+                    break
+                try:
+                    index, result, error = result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    for process in processes:   # workers exit only when they are stopped
+                        if not process.is_alive():
+                            raise RuntimeError("Worker process " + process.name + " exited with code "
+                                               + str(process.exitcode) + "!")
+                    continue    # decoder may have finished meanwhile
+                if error is not None:
+                    raise RuntimeError("Frame " + str(index) + " could not be processed!\n" + error)
+                pending[index] = result
+        finally:
+            stop.set()
+            try:
+                in_flight.release()     # wake decoder if it waits for free slot
+            except ValueError:
+                pass
+            if decoder_done.is_set() and next_index >= decoded[0]:
+                for _ in processes:
+                    task_queue.put(None)
+                for process in processes:
+                    process.join()
+            else:
+                task_queue.cancel_join_thread()     # frames that no worker takes are dropped at exit
+                for process in processes:
+                    process.terminate()
@@ -0,0 +1,158 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from detection import face_locations, face_landmark_points, detect_dlib, attach_stickers, create_locator
+from detectors import DEFAULT_DETECTOR
+from landmarks import DEFAULT_LANDMARK_MODEL
+
+PREVIEW_FRAMES = 6  # number of sampled frames
+
+
+def sample_frame_indices(total_frames, count=PREVIEW_FRAMES):
+    """Chooses evenly spaced frames of video.
+
+    :param total_frames: number of frames of video
+    :param count: number of sampled frames
+    :returns: sorted list of frame indices without duplicates
+    """
+    if total_frames <= 0:
+        return []
+    return sorted(set(int((i + 0.5) * total_frames / count) for i in range(min(count, total_frames))))
+
+
+def read_frame(path, idx):
+    """Seeks to frame of video and decodes it. Each call opens its own capture, so frames are read in parallel.
+    Seeking is not frame-accurate with every codec, frame is dropped if decoder does not confirm its position,
+    so detections of preview are never reused for wrong frame.
+
+    :param path: path of video
+    :param idx: index of frame
+    :returns: frame, None if it could not be read or decoder landed on another frame
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != idx:
+            return None
+        ret, frame = cap.read()
+        if not ret or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != idx + 1:
+            return None
+        return frame
+    finally:
+        cap.release()
+
+
+def detect_preview_frame(path, idx, landmark_model=DEFAULT_LANDMARK_MODEL, detector=DEFAULT_DETECTOR,
+                         min_face_size=None):
+    """Reads frame and detects faces and landmarks on it, the same as full render with the same settings does.
+
+    :param path: path of video
+    :param idx: index of frame
+    :param landmark_model: name of landmark model
+    :param detector: name of detector backend that finds faces for landmark model
+    :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+    :returns: frame and its detections (dlib faces and landmark points), (None, None) if frame could not be
+              read
+    """
+    frame = read_frame(path, idx)
+    if frame is None:
+        return None, None
+    locator = create_locator(detector, min_face_size)
+    faces = locator(frame) if locator is not None else face_locations(frame, number_of_times=1)
+    return frame, (faces, face_landmark_points(frame, faces, landmark_model))
+
+
+class StickerPreview(object):
+    """
+    Represents preview of video on few evenly spaced frames. Faces are detected on sampled frames once, in
+    parallel, and stickers are attached to copies of them, so switching sticker is immediate. Detections of
+    sampled frames are reused when whole video is rendered with the same detection settings.
+    """
+    def __init__(self, path, count=PREVIEW_FRAMES, threads=None, landmark_model=DEFAULT_LANDMARK_MODEL,
+                 detector=DEFAULT_DETECTOR, min_face_size=None):
+        """Initializes preview, nothing is read before detect is called.
+
+        :param self: self
+        :param path: path of video
+        :param count: number of sampled frames
+        :param threads: number of threads that read and detect frames, one per sampled frame if None
+        :param landmark_model: name of landmark model, it has to provide landmarks of every previewed sticker
+        :param detector: name of detector backend that finds faces for landmark model
+        :param min_face_size: width (in pixels) of smallest expected face, None for full resolution detection
+        """
+        self.path = path
+        self.count = count
+        self.threads = threads
+        self.landmark_model = landmark_model
+        self.detector = detector
+        self.min_face_size = min_face_size
+        self.frames = {}        # sampled frames by frame index
+        self.detections = {}    # detections of sampled frames by frame index
+        self.detected = False
+        self.lock = threading.Lock()    # preview can be requested again while frames are detected
+
+    def detect(self):
+        """Reads sampled frames and detects faces on them in parallel.
+
+        :param self: self
+        :returns: indicator whether any frame could be read
+        """
+        with self.lock:
+            if not self.detected:
+                self.detect_frames()
+            return len(self.frames) > 0
+
+    def detect_frames(self):
+        """Reads sampled frames and detects faces on them, called once.
+
+        :param self: self
+        """
+        cap = cv2.VideoCapture(self.path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        cap.release()
+        indices = sample_frame_indices(total_frames, self.count)
+        if len(indices) > 0:
+            threads = self.threads if self.threads is not None else min(len(indices), os.cpu_count() or 1)
+            with ThreadPoolExecutor(threads) as pool:
+                results = list(pool.map(lambda idx: detect_preview_frame(self.path, idx, self.landmark_model,
+                                                                         self.detector, self.min_face_size),
+                                         indices))
+            for idx, (frame, detections) in zip(indices, results):
+                if frame is not None:
+                    self.frames[idx] = frame
+                    self.detections[idx] = detections
+        self.detected = True
+
+    def render(self, chosen_filter, draw_rectangles=False):
+        """Attaches sticker to copies of sampled frames.
+
+        :param self: self
+        :param chosen_filter: chosen filter, "" for frames without sticker
+        :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+        :returns: list of result images in order of frames
+        """
+        images = []
+        for idx in sorted(self.frames):
+            faces, points = self.detections[idx]
+            image, _ = detect_dlib(self.frames[idx].copy(), -1, draw_rectangles, "", [],
+                                   known_detections=(faces, points))
+            images.extend(attach_stickers(image, [chosen_filter], faces, points)[0])
+        return images
+
+    def known_detections(self, landmark_model=DEFAULT_LANDMARK_MODEL, detector=DEFAULT_DETECTOR,
+                         min_face_size=None):
+        """Returns detections of sampled frames for full render, only if render detects faces the same way,
+        otherwise sampled frames would get different faces and landmarks than the rest of video.
+
+        :param self: self
+        :param landmark_model: name of landmark model of render
+        :param detector: name of detector backend of render
+        :param min_face_size: width (in pixels) of smallest expected face of render, None for full resolution
+        :returns: dict of detections (dlib faces and landmark points) by frame index, empty if
+                  frames are not detected yet or detection settings of render differ
+        """
+        if not self.detected or (landmark_model, detector, min_face_size) != \
+                (self.landmark_model, self.detector, self.min_face_size):
+            return {}
+        return dict(self.detections)
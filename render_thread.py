@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+import cv2
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QLabel, QSizePolicy, QWidget, QHBoxLayout
+from detection import render_video
+
+PREVIEW_WIDTH = 480     # width (in pixels) of preview frames sent to GUI thread
+THUMBNAIL_WIDTH = 160   # width (in pixels) of sticker preview thumbnails
+
+
+def to_qimage(image, max_width=PREVIEW_WIDTH):
+    """Converts frame to Qt image, downscaled so that it is cheap to send to GUI thread and draw.
+
+    :param image: BGR frame
+    :param max_width: maximal width of Qt image
+    :returns: Qt image that owns its data
+    """
+    if image.shape[1] > max_width:
+        scale = max_width / float(image.shape[1])
+        image = cv2.resize(image, (max_width, int(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    height, width = rgb.shape[:2]
+    return QImage(rgb.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+
+
+def default_workers():
+    """Chooses number of worker processes for rendering from GUI, one processor is left for GUI.
+
+    :returns: number of worker processes
+    """
+    return max((os.cpu_count() or 1) - 1, 1)
+
+
+class RenderThread(QThread):
+    """
+    Represents thread that renders video with sticker outside of GUI thread. Progress, throttled preview
+    frames and statistics are sent to GUI thread through signals, and rendering can be cancelled.
+    """
+    progress = pyqtSignal(int, int, float, float)   # frames, total frames, fps, eta in seconds (-1 if unknown)
+    preview = pyqtSignal(QImage)
+    rendered = pyqtSignal(object)   # statistics of rendering, None if video could not be opened
+    error = pyqtSignal(str)         # message of error that stopped rendering, sent instead of statistics
+
+    def __init__(self, path, faces_number, draw_rectangles, chosen_filter, detection_cache=None, workers=None,
+                 preview_interval=0.1, known_detections=None, evaluate_cv=False, parent=None):
+        """Initializes render thread.
+
+        :param self: self
+        :param path: path of input file
+        :param faces_number: number of expected faces in frame
+        :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+        :param chosen_filter: chosen filter that is attached to detected faces
+        :param detection_cache: cache of detections, None if detections are not cached
+        :param workers: number of worker processes, all processors but one if None
+        :param preview_interval: minimal number of seconds between two preview frames
+        :param known_detections: dict of detections of some frames by frame index, e.g. from sticker preview,
+               None if all frames are detected
+        :param evaluate_cv: indicator whether faces on sampled frames are detected by opencv as well and
+               compared, off the render path
+        :param parent: parent of thread
+        """
+        super(RenderThread, self).__init__(parent)
+        self.path = path
+        self.faces_number = faces_number
+        self.draw_rectangles = draw_rectangles
+        self.chosen_filter = chosen_filter
+        self.detection_cache = detection_cache
+        self.workers = workers if workers is not None else default_workers()
+        self.preview_interval = preview_interval
+        self.known_detections = known_detections
+        self.evaluate_cv = evaluate_cv
+        self.cancel_event = threading.Event()
+        self.last_preview = 0.0
+
+    def run(self):
+        """Renders video, called on render thread.
+
+        :param self: self
+        """
+        try:
+            statistics = render_video(self.path, self.faces_number, self.draw_rectangles, self.chosen_filter,
+                                      workers=self.workers, detection_cache=self.detection_cache,
+                                      progress_callback=self.report_progress,
+                                      progress_interval=self.preview_interval, cancel_event=self.cancel_event,
+                                      known_detections=self.known_detections, evaluate_cv=self.evaluate_cv)
+        except Exception as e:
+            print("Error processing video: " + str(e) + "!")
+            self.error.emit(str(e))
+            return
+        self.rendered.emit(statistics)
+
+    def report_progress(self, frames, total_frames, fps, eta, images):
+        """Sends progress and preview frame to GUI thread.
+
+        :param self: self
+        :param frames: number of processed frames
+        :param total_frames: total number of frames, 0 if unknown
+        :param fps: current fps
+        :param eta: estimated remaining seconds, None if unknown
+        :param images: list of result images of last frame
+        """
+        self.progress.emit(frames, total_frames, fps, eta if eta is not None else -1.0)
+        now = time.monotonic()
+        if len(images) > 0 and now - self.last_preview >= self.preview_interval:
+            self.last_preview = now
+            self.preview.emit(to_qimage(images[0]))
+
+    def cancel(self):
+        """Asks rendering to stop, result video is removed.
+
+        :param self: self
+        """
+        self.cancel_event.set()
+
+
+class PreviewThread(QThread):
+    """
+    Represents thread that detects faces on sampled frames of video (once per video) and attaches chosen
+    sticker to them, so sticker can be checked before whole video is rendered.
+    """
+    previewed = pyqtSignal(object)  # list of Qt images of sampled frames with sticker
+
+    def __init__(self, sticker_preview, chosen_filter, draw_rectangles, parent=None):
+        """Initializes preview thread.
+
+        :param self: self
+        :param sticker_preview: sticker preview of chosen video
+        :param chosen_filter: chosen filter
+        :param draw_rectangles: indicator whether rectangles that bound detected faces should be drawn
+        :param parent: parent of thread
+        """
+        super(PreviewThread, self).__init__(parent)
+        self.sticker_preview = sticker_preview
+        self.chosen_filter = chosen_filter
+        self.draw_rectangles = draw_rectangles
+
+    def run(self):
+        """Creates preview images, called on preview thread.
+
+        :param self: self
+        """
+        images = []
+        try:
+            if self.sticker_preview.detect():
+                images = [to_qimage(image, THUMBNAIL_WIDTH)
+                          for image in self.sticker_preview.render(self.chosen_filter, self.draw_rectangles)]
+        except Exception as e:
+            print("Error creating preview: " + str(e) + "!")
+        self.previewed.emit(images)
+
+
+class ThumbnailStrip(QWidget):
+    """
+    Represents row of thumbnails of sampled frames with chosen sticker.
+    """
+    def __init__(self, count, parent=None):
+        """Initializes empty thumbnails.
+
+        :param self: self
+        :param count: number of thumbnails
+        :param parent: parent of widget
+        """
+        super(ThumbnailStrip, self).__init__(parent)
+        layout = QHBoxLayout()
+        self.setLayout(layout)
+        self.labels = []
+        for _ in range(count):
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            label.setMinimumHeight(60)
+            layout.addWidget(label)
+            self.labels.append(label)
+
+    def show_images(self, images):
+        """Shows Qt images, labels without image are cleared.
+
+        :param self: self
+        :param images: list of Qt images
+        """
+        for idx, label in enumerate(self.labels):
+            if idx < len(images):
+                label.setPixmap(QPixmap.fromImage(images[idx]).scaled(label.size(), Qt.KeepAspectRatio,
+                                                                      Qt.SmoothTransformation))
+            else:
+                label.clear()
+
+
+class PreviewWidget(QLabel):
+    """
+    Represents widget that shows preview frames while video is rendered and plays result video afterwards.
+    While result video is played, space pauses it, 'a' and 'd' seek backward and forward and 'q' stops it.
+    """
+    def __init__(self, seek_step=50, parent=None):
+        """Initializes preview widget.
+
+        :param self: self
+        :param seek_step: number of frames skipped when seeking
+        :param parent: parent of widget
+        """
+        super(PreviewWidget, self).__init__(parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setMinimumSize(320, 180)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.seek_step = seek_step
+        self.cap = None
+        self.frames_count = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.next_frame)
+
+    def show_image(self, image):
+        """Shows Qt image scaled to widget.
+
+        :param self: self
+        :param image: Qt image
+        """
+        self.setPixmap(QPixmap.fromImage(image).scaled(self.size(), Qt.KeepAspectRatio, Qt.FastTransformation))
+
+    def play(self, path):
+        """Starts playing video with its own fps.
+
+        :param self: self
+        :param path: path of video
+        :returns: indicator whether video could be opened
+        """
+        self.stop()
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frames_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.timer.start(int(1000 / fps) if fps > 0 else 25)
+        self.setFocus()
+        return True
+
+    def next_frame(self):
+        """Shows next frame of played video.
+
+        :param self: self
+        """
+        ret, frame = self.cap.read()
+        if not ret:
+            self.stop()
+            return
+        self.show_image(to_qimage(frame, max(self.width(), 1)))
+
+    def stop(self):
+        """Stops playing.
+
+        :param self: self
+        """
+        self.timer.stop()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def keyPressEvent(self, event):
+        """Pauses, seeks or stops played video.
+
+        :param self: self
+        :param event: key event
+        """
+        if self.cap is None:
+            super(PreviewWidget, self).keyPressEvent(event)
+        elif event.key() == Qt.Key_Q:
+            self.stop()
+        elif event.key() == Qt.Key_Space:
+            if self.timer.isActive():
+                self.timer.stop()
+            else:
+                self.timer.start()
+        elif event.key() in (Qt.Key_A, Qt.Key_D):
+            position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if event.key() == Qt.Key_A:
+                position = max(position - self.seek_step - 1, 0)
+            else:
+                position = min(position + self.seek_step - 1, max(self.frames_count - 1, 0))
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            self.next_frame()   # show frame at new position even if paused
+        else:
+            super(PreviewWidget, self).keyPressEvent(event)
@@ -0,0 +1,126 @@
+from collections import deque
+
+
+def expand_bounds(bounds, factor, image_shape):
+    """Expands rectangle by share of its size on each side.
+
+    :param bounds: bounds (top, right, bottom, left) of rectangle
+    :param factor: share of rectangle width and height added on each side
+    :param image_shape: shape of image that contains rectangle
+    :returns: bounds of expanded rectangle limited to image
+    """
+    dx = int((bounds[1] - bounds[3]) * factor)
+    dy = int((bounds[2] - bounds[0]) * factor)
+    return (max(bounds[0] - dy, 0), min(bounds[1] + dx, image_shape[1]),
+            min(bounds[2] + dy, image_shape[0]), max(bounds[3] - dx, 0))
+
+
+def merge_regions(regions):
+    """Merges overlapping regions so that no part of image is searched twice.
+
+    :param regions: list of region bounds (top, right, bottom, left)
+    :returns: list of merged region bounds
+    """
+    merged = []
+    for region in regions:
+        region = tuple(region)
+        overlapping = True
+        while overlapping:
+            overlapping = False
+            for other in merged:
+                if region[3] < other[1] and other[3] < region[1] and region[0] < other[2] and other[0] < region[2]:
+                    merged.remove(other)
+                    region = (min(region[0], other[0]), max(region[1], other[1]),
+                              max(region[2], other[2]), min(region[3], other[3]))
+                    overlapping = True
+                    break
+        merged.append(region)
+    return merged
+
+
+class RoiDetector(object):
+    """
+    Represents face detector that searches only regions around faces from previous frame. Whole frame is
+    searched periodically and whenever a tracked face is lost.
+    """
+    def __init__(self, detect_region, detect_full, expand=0.5, full_scan_interval=30, history=30,
+                 size_margin=(0.7, 1.4)):
+        """Initializes region of interest detector.
+
+        :param self: self
+        :param detect_region: function that takes image crop and range (min, max) of face widths and returns
+               list of face bounds (top, right, bottom, left) in crop coordinates
+        :param detect_full: function that takes whole frame and returns list of face bounds
+        :param expand: share of face size added on each side of face to get searched region
+        :param full_scan_interval: number of frames after which whole frame is searched
+        :param history: number of recent frames whose face widths define searched range of face widths
+        :param size_margin: factors applied to smallest and largest recent face width
+        """
+        self.detect_region = detect_region
+        self.detect_full = detect_full
+        self.expand = expand
+        self.full_scan_interval = full_scan_interval
+        self.size_margin = size_margin
+        self.recent_widths = deque(maxlen=history)
+        self.previous_faces = []
+        self.frames_since_full_scan = 0
+        self.full_scans = 0     # counter of whole frame searches
+        self.region_scans = 0   # counter of frames where only regions were searched
+
+    def size_range(self):
+        """Calculates range of face widths that are searched in regions.
+
+        :param self: self
+        :returns: minimal and maximal face width
+        """
+        return min(self.recent_widths) * self.size_margin[0], max(self.recent_widths) * self.size_margin[1]
+
+    def __call__(self, image):
+        """Detects positions of faces on image.
+
+        :param self: self
+        :param image: image with potential faces
+        :returns: list of detected faces
+        """
+        faces = None
+        if len(self.previous_faces) > 0 and self.frames_since_full_scan < self.full_scan_interval:
+            faces = self.search_regions(image)
+            if len(faces) < len(self.previous_faces):
+                faces = None    # face is lost, search whole frame
+        if faces is None:
+            faces = self.detect_full(image)
+            self.frames_since_full_scan = 0
+            self.full_scans += 1
+        else:
+            self.region_scans += 1
+        self.frames_since_full_scan += 1
+        self.previous_faces = faces
+        if len(faces) > 0:
+            self.recent_widths.extend(face[1] - face[3] for face in faces)
+        return faces
+
+    def seed(self, faces):
+        """Takes faces that were detected on whole frame elsewhere (e.g. reused from preview), so regions
+        around them are searched on next frame.
+
+        :param self: self
+        :param faces: list of face bounds (top, right, bottom, left)
+        """
+        self.frames_since_full_scan = 1
+        self.previous_faces = list(faces)
+        self.recent_widths.extend(face[1] - face[3] for face in faces)
+
+    def search_regions(self, image):
+        """Searches for faces only in regions around faces from previous frame.
+
+        :param self: self
+        :param image: frame
+        :returns: list of detected faces in frame coordinates
+        """
+        size_range = self.size_range()
+        regions = merge_regions([expand_bounds(face, self.expand, image.shape) for face in self.previous_faces])
+        faces = []
+        for top, right, bottom, left in regions:
+            for face in self.detect_region(image[top:bottom, left:right], size_range):
+                faces.append((face[0] + top, face[1] + left, face[2] + top, face[3] + left))
+        return faces
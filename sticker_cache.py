@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+import cv2
+from imutils import rotate_bound
+from compositing import prepare_sticker
+
+
+class StickerCache(object):
+    """
+    Represents process-wide cache of stickers. Each sticker image is decoded from disk only once, and its rotated,
+    resized and premultiplied variants are kept in least recently used (LRU) order within memory limit.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, angle_step=1.0, width_step=2):
+        """Initializes sticker cache.
+
+        :param self: self
+        :param max_bytes: memory limit (in bytes) for rotated and resized variants
+        :param angle_step: angle (in degrees) to which rotation angles are rounded
+        :param width_step: width (in pixels) to which sticker widths are rounded
+        """
+        self.max_bytes = max_bytes
+        self.angle_step = angle_step
+        self.width_step = width_step
+        self.decoded = {}               # sticker path -> decoded sticker image
+        self.variants = OrderedDict()   # (sticker path, angle, width) -> prepared sticker
+        self.variants_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    def load(self, sticker_path):
+        """Returns decoded sticker image, reading it from disk on first use.
+
+        :param self: self
+        :param sticker_path: path to the sticker image
+        :return: sticker image with alpha channel
+        """
+        with self.lock:
+            sticker = self.decoded.get(sticker_path)
+            if sticker is None:
+                sticker = cv2.imread(sticker_path, -1)
+                if sticker is None:
+                    raise IOError("Sticker " + sticker_path + " could not be read!")
+                sticker.flags.writeable = False
+                self.decoded[sticker_path] = sticker
+            return sticker
+
+    def get(self, sticker_path, angle, width):
+        """Returns sticker rotated by angle, resized to width and prepared for compositing.
+
+        :param self: self
+        :param sticker_path: path to the sticker image
+        :param angle: angle of rotation
+        :param width: width of rotated sticker
+        :return: prepared sticker, it must not be modified
+        """
+        angle = round(angle / self.angle_step) * self.angle_step
+        width = max(int(round(width / float(self.width_step))) * self.width_step, 1)
+        key = (sticker_path, angle, width)
+        with self.lock:
+            variant = self.variants.get(key)
+            if variant is not None:
+                self.variants.move_to_end(key)
+                self.hits += 1
+                return variant
+            self.misses += 1
+            sticker = self.load(sticker_path)
+
+        rotated = rotate_bound(sticker, angle)
+        height = max(int(round(rotated.shape[0] * width / float(rotated.shape[1]))), 1)
+        variant = prepare_sticker(cv2.resize(rotated, (width, height)))
+
+        with self.lock:
+            if key not in self.variants:
+                self.variants[key] = variant
+                self.variants_bytes += variant.color.nbytes + variant.inverse_alpha.nbytes
+                self.evict()
+        return variant
+
+    def evict(self):
+        """Removes least recently used variants until memory limit is met.
+
+        :param self: self
+        """
+        with self.lock:
+            while self.variants_bytes > self.max_bytes and len(self.variants) > 0:
+                _, variant = self.variants.popitem(last=False)
+                self.variants_bytes -= variant.color.nbytes + variant.inverse_alpha.nbytes
+                self.evictions += 1
+
+    def set_memory_limit(self, max_bytes):
+        """Changes memory limit for variants.
+
+        :param self: self
+        :param max_bytes: memory limit in bytes
+        """
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def clear(self):
+        """Removes all decoded stickers and variants and resets counters.
+
+        :param self: self
+        """
+        with self.lock:
+            self.decoded.clear()
+            self.variants.clear()
+            self.variants_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Returns cache statistics.
+
+        :param self: self
+        :return: dict with hits, misses, evictions, hit ratio, number of variants and their size
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / float(lookups) if lookups > 0 else 0.0,
+                "variants": len(self.variants),
+                "variants_bytes": self.variants_bytes,
+                "decoded": len(self.decoded)
+            }
+
+
+sticker_cache = StickerCache()
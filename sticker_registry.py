@@ -0,0 +1,296 @@
+import json
+import os
+from fractions import Fraction
+import stickers
+
+LANDMARK_GROUPS = ["chin", "left_eyebrow", "right_eyebrow", "nose_bridge", "nose_tip", "left_eye", "right_eye",
+                   "top_lip", "bottom_lip"]
+FACE_REGIONS = ["forehead"]     # regions that are derived from rectangle around face instead of landmarks
+REGION_MIN_WIDTH = {"nose_bridge": 1}   # nose bridge points are almost vertical line
+AXIS_SOURCES = ["face", "anchor", "min"]
+PACK_FILE = "stickers.json"
+BUILTIN_PACK = "builtin"
+DEFAULT_PACKS_DIRECTORY = "sticker_packs"
+
+triggers = {}   # conditions that sticker can require, by name
+trigger_regions = {}    # face parts whose landmarks each condition checks, by name of condition
+
+
+def register_trigger(name, condition, regions=()):
+    """Registers condition that sticker spec can refer to by name.
+
+    :param name: name of condition used in sticker specs
+    :param condition: function that takes face landmarks of all faces in frame and returns boolean array that
+           tells to which faces sticker should be attached
+    :param regions: names of face parts whose landmarks condition checks
+    """
+    triggers[name] = condition
+    trigger_regions[name] = tuple(regions)
+
+
+def parse_fraction(value):
+    """Parses fraction from spec, e.g. "-1/8", 0.5 or 1.
+
+    :param value: fraction as string or number
+    :returns: (numerator, denominator)
+    """
+    fraction = Fraction(str(value))
+    return fraction.numerator, fraction.denominator
+
+
+def scaled(size, fraction):
+    """Multiplies size by fraction, with same rounding as size * numerator / denominator written out.
+
+    :param size: size in pixels
+    :param fraction: (numerator, denominator)
+    :returns: scaled size
+    """
+    return size * fraction[0] / fraction[1]
+
+
+class AxisSpec(object):
+    """
+    Represents placement of sticker on one axis. Position of face, position of anchor face part or minimum
+    of them is taken, each of them shifted by fractions of face size (and anchor size), and then shifted
+    by another fraction of face size. Position is optionally clamped to the frame edge.
+    """
+    def __init__(self, source="face", face_offset=0, anchor_offset=0, anchor_size_offset=0, offset=0, clamp=False):
+        """Initializes axis spec.
+
+        :param self: self
+        :param source: "face", "anchor" or "min" of them
+        :param face_offset: fraction of face size added to face position
+        :param anchor_offset: fraction of face size added to anchor position
+        :param anchor_size_offset: fraction of anchor size added to anchor position
+        :param offset: fraction of face size added to resulting position
+        :param clamp: indicator whether negative position is replaced by 0
+        """
+        if source not in AXIS_SOURCES:
+            raise ValueError("Unknown axis source '" + str(source) + "'!")
+        self.source = source
+        self.face_offset = parse_fraction(face_offset)
+        self.anchor_offset = parse_fraction(anchor_offset)
+        self.anchor_size_offset = parse_fraction(anchor_size_offset)
+        self.offset = parse_fraction(offset)
+        self.clamp = bool(clamp)
+
+    def position(self, face_position, face_size, anchor_position, anchor_size):
+        """Calculates sticker position on axis.
+
+        :param self: self
+        :param face_position: position of face rectangle on axis
+        :param face_size: size of face rectangle on axis
+        :param anchor_position: position of anchor face part on axis, None if sticker has no anchor
+        :param anchor_size: size of anchor face part on axis
+        :returns: position in pixels
+        """
+        if self.source != "anchor":
+            face_term = face_position
+            if self.face_offset[0] != 0:
+                face_term = face_term + scaled(face_size, self.face_offset)
+        if self.source != "face":
+            anchor_term = anchor_position
+            if self.anchor_size_offset[0] != 0:
+                anchor_term = anchor_term + scaled(anchor_size, self.anchor_size_offset)
+            if self.anchor_offset[0] != 0:
+                anchor_term = anchor_term + scaled(face_size, self.anchor_offset)
+        if self.source == "face":
+            value = face_term
+        elif self.source == "anchor":
+            value = anchor_term
+        else:
+            value = min(face_term, anchor_term)
+        if self.offset[0] != 0:
+            value = value + scaled(face_size, self.offset)
+        if self.clamp:
+            value = max(value, 0)
+        return int(value)
+
+
+class StickerSpec(object):
+    """
+    Represents compiled sticker spec: asset, anchor face part, placement on both axes, width, trigger
+    condition and regions of face used for Intersection over Union (IoU). Spec is validated and compiled
+    once, so attaching sticker only evaluates prepared numbers.
+    """
+    def __init__(self, name, asset, anchor=None, x=None, y=None, width_extra=0, centered=False, trigger=None,
+                 iou_regions=(), landmarks=None, pack=None):
+        """Initializes sticker spec.
+
+        :param self: self
+        :param name: name of sticker
+        :param asset: path to sticker image with alpha channel
+        :param anchor: name of face part (landmark group) that sticker is placed relative to, None for face only
+        :param x: dict with arguments of AxisSpec for horizontal placement
+        :param y: dict with arguments of AxisSpec for vertical placement
+        :param width_extra: fraction of face width added to face width for sticker width
+        :param centered: indicator whether sticker is centered horizontally on calculated position
+        :param trigger: name of registered condition that must be met for sticker to be attached, None if
+               sticker is always attached
+        :param iou_regions: names of face parts (or "forehead") that sticker should cover, IoU of frame is
+               average of IoU for each of them
+        :param landmarks: names of face parts whose landmarks sticker needs, besides eyebrows that angle is
+               calculated from, derived from anchor, trigger and IoU regions if None
+        :param pack: name of pack that sticker comes from
+        """
+        if anchor is not None and anchor not in LANDMARK_GROUPS:
+            raise ValueError("Unknown anchor '" + str(anchor) + "' of sticker '" + name + "'!")
+        for region in iou_regions:
+            if region not in LANDMARK_GROUPS and region not in FACE_REGIONS:
+                raise ValueError("Unknown IoU region '" + str(region) + "' of sticker '" + name + "'!")
+        for region in landmarks or ():
+            if region not in LANDMARK_GROUPS:
+                raise ValueError("Unknown landmark region '" + str(region) + "' of sticker '" + name + "'!")
+        self.name = name
+        self.asset = asset
+        self.anchor = anchor
+        self.x = AxisSpec(**(x or {}))
+        self.y = AxisSpec(**(y or {}))
+        if anchor is None and (self.x.source != "face" or self.y.source != "face"):
+            raise ValueError("Sticker '" + name + "' is placed relative to anchor, but it has no anchor!")
+        self.width_extra = parse_fraction(width_extra)
+        self.centered = bool(centered)
+        self.trigger_name = trigger
+        self.iou_regions = tuple(iou_regions)
+        self.landmarks = tuple(landmarks) if landmarks is not None else None
+        self.pack = pack
+
+    @property
+    def trigger(self):
+        """Returns trigger condition, None if sticker is always attached.
+
+        :param self: self
+        :returns: function that takes face landmarks and returns boolean array
+        """
+        if self.trigger_name is None:
+            return None
+        if self.trigger_name not in triggers:
+            raise ValueError("Unknown trigger '" + self.trigger_name + "' of sticker '" + self.name + "'!")
+        return triggers[self.trigger_name]
+
+    @property
+    def required_landmarks(self):
+        """Returns face parts whose landmarks sticker needs, used for choosing landmark model.
+
+        :param self: self
+        :returns: set of names of face parts
+        """
+        if self.landmarks is not None:
+            regions = set(self.landmarks)
+        else:
+            regions = set(region for region in self.iou_regions if region in LANDMARK_GROUPS)
+            if self.anchor is not None:
+                regions.add(self.anchor)
+            if self.trigger_name is not None:
+                regions.update(trigger_regions.get(self.trigger_name, LANDMARK_GROUPS))
+        return regions
+
+    def place(self, face_box, anchor_box=None):
+        """Calculates position and width of sticker.
+
+        :param self: self
+        :param face_box: (x, y, width, height) of rectangle around face
+        :param anchor_box: (x, y, width, height) of anchor face part, None if sticker has no anchor
+        :returns: x and y of upper left corner of sticker and sticker width
+        """
+        x, y, w, h = face_box
+        x1, y1, w1, h1 = anchor_box if anchor_box is not None else (None, None, 0, 0)
+        width = int(w + scaled(w, self.width_extra)) if self.width_extra[0] != 0 else w
+        return self.x.position(x, w, x1, w1), self.y.position(y, h, y1, h1), width
+
+
+class StickerRegistry(object):
+    """
+    Represents registry of available stickers. Built-in stickers and third-party sticker packs are
+    declared in stickers.json files, so new stickers are added without code changes.
+    """
+    def __init__(self):
+        """Initializes empty registry.
+
+        :param self: self
+        """
+        self.specs = {}     # ordered by registration
+
+    def register(self, name, spec, base_directory="", pack=None):
+        """Validates, compiles and registers sticker spec. Sticker with same name is replaced.
+
+        :param self: self
+        :param name: name of sticker
+        :param spec: dict with arguments of StickerSpec except name and pack
+        :param base_directory: directory that relative asset path is resolved against
+        :param pack: name of pack that sticker comes from
+        :returns: compiled sticker spec
+        """
+        arguments = dict(spec)
+        arguments["asset"] = os.path.join(base_directory, arguments["asset"])
+        return self.add(StickerSpec(name, pack=pack, **arguments))
+
+    def add(self, spec):
+        """Registers already compiled sticker spec, e.g. one sent to worker process.
+
+        :param self: self
+        :param spec: sticker spec
+        :returns: sticker spec
+        """
+        self.specs[spec.name] = spec
+        return spec
+
+    def load_pack(self, path, pack=None):
+        """Loads sticker pack, i.e. JSON list of sticker specs with "name" and asset paths relative
+        to pack directory.
+
+        :param self: self
+        :param path: path of pack directory (with stickers.json) or of JSON file
+        :param pack: name of pack, name of pack directory if None
+        :returns: list of names of loaded stickers
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, PACK_FILE)
+        with open(path) as pack_file:
+            specs = json.load(pack_file)
+        base_directory = os.path.dirname(os.path.abspath(path))
+        pack = pack if pack is not None else os.path.basename(base_directory)
+        names = []
+        for spec in specs:
+            spec = dict(spec)
+            name = spec.pop("name")
+            self.register(name, spec, base_directory, pack)
+            names.append(name)
+        return names
+
+    def load_packs(self, directory=DEFAULT_PACKS_DIRECTORY):
+        """Loads all sticker packs from subdirectories of directory that contain stickers.json.
+
+        :param self: self
+        :param directory: directory with sticker packs, nothing is loaded if it does not exist
+        :returns: list of names of loaded stickers
+        """
+        names = []
+        if not os.path.isdir(directory):
+            return names
+        for entry in sorted(os.listdir(directory)):
+            if os.path.isfile(os.path.join(directory, entry, PACK_FILE)):
+                names.extend(self.load_pack(os.path.join(directory, entry)))
+        return names
+
+    def get(self, name):
+        """Returns compiled sticker spec.
+
+        :param self: self
+        :param name: name of sticker
+        :returns: sticker spec, None if sticker is not registered
+        """
+        return self.specs.get(name)
+
+    def names(self, include_builtin=True):
+        """Returns names of registered stickers in order of registration.
+
+        :param self: self
+        :param include_builtin: indicator whether built-in stickers are included
+        :returns: list of names
+        """
+        return [name for name, spec in self.specs.items() if include_builtin or spec.pack != BUILTIN_PACK]
+
+
+sticker_registry = StickerRegistry()
+sticker_registry.load_pack(stickers.sticker_pack(), BUILTIN_PACK)
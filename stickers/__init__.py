@@ -1,4 +1,9 @@
-from pkg_resources import resource_filename
+import os
+
+
+def resource_filename(package, name):
+    """Resolves path of file bundled with package without slow pkg_resources import."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
 
 
 def cat_sticker():
@@ -32,5 +37,10 @@ def mouse_sticker():
 def pirate_sticker():
     return resource_filename(__name__, "pirate.png")
 
+
 def rainbow_sticker():
     return resource_filename(__name__, "rainbow.png")
+
+
+def sticker_pack():
+    return resource_filename(__name__, "stickers.json")
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cross_check import CrossCheck, wilson_interval  # noqa: E402
+
+FACE = (10, 30, 30, 10)
+
+
+def test_counters_of_sampled_frames():
+    located = []
+
+    def locator(gray):
+        located.append(gray.shape)
+        return [FACE] if len(located) % 2 == 1 else []  # opencv finds face on every other evaluated frame
+
+    cross_check = CrossCheck(faces_number=1, sample_interval=3, locator=locator)
+    frames = [np.zeros((40, 60, 3), dtype=np.uint8) for _ in range(9)]
+    for idx, frame in enumerate(cross_check.observe(frames)):
+        frame[:] = 255  # frame is drawn on after it is observed
+        cross_check.add_detections(idx, [FACE])
+        time.sleep(0.01)
+    report = cross_check.close()
+    assert located == [(40, 60)] * 3    # only frames 0, 3 and 6, in grayscale
+    assert report["frames"] == 3 and report["dropped"] == 0
+    assert report["detector_success"]["rate"] == 1.0
+    assert report["cv_success"]["rate"] == report["agreement"]["rate"] == 2 / 3.0
+    assert cross_check.pending == {}
+
+
+def test_close_drops_frames_after_timeout():
+    cross_check = CrossCheck(sample_interval=1, locator=lambda gray: time.sleep(0.2) or [], close_timeout=0.1)
+    frames = [np.zeros((20, 20, 3), dtype=np.uint8) for _ in range(8)]
+    for idx, frame in enumerate(cross_check.observe(frames)):
+        cross_check.add_detections(idx, [])
+    start = time.monotonic()
+    report = cross_check.close()
+    assert time.monotonic() - start < 1.0
+    assert report["frames"] + report["dropped"] == 8
+    assert report["dropped"] > 0
+    assert report["cv_success"] is None and report["agreement"] is None
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(0, 5)
+    assert low == 0.0 and 0 < high < 1
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(50, 100)
+    assert low < 0.5 < high and abs(0.5 - low - (high - 0.5)) < 1e-9
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection_cache import DetectionCache, DetectionRecorder  # noqa: E402
+
+
+def write_video(path, content):
+    with open(path, "wb") as video:
+        video.write(content)
+    return path
+
+
+def record(frames):
+    """Records detections of frames, each frame has one face per entry of frames.
+
+    :param frames: list of numbers of faces in frames
+    :returns: detection recorder
+    """
+    recorder = DetectionRecorder()
+    for idx, faces in enumerate(frames):
+        bounds = [(idx, idx + 10 + face, idx + 20, idx + face) for face in range(faces)]
+        recorder.add(bounds, np.full((faces, 68, 2), idx, dtype=np.int32))
+    return recorder
+
+
+def test_key_depends_on_content_and_settings(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    first = write_video(str(tmp_path / "a.avi"), b"first video")
+    copy = write_video(str(tmp_path / "b.avi"), b"first video")
+    other = write_video(str(tmp_path / "c.avi"), b"other video")
+    settings = {"detector": "dlib_hog", "keyframe_interval": 1}
+    assert cache.key(first, settings) == cache.key(copy, settings)     # renamed copy hits the same entry
+    assert cache.key(first, settings) != cache.key(other, settings)
+    assert cache.key(first, settings) != cache.key(first, dict(settings, keyframe_interval=5))
+
+
+def test_store_and_load_round_trip(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    key = cache.key(write_video(str(tmp_path / "a.avi"), b"video"), {})
+    assert cache.load(key) is None
+    cache.store(key, record([1, 0, 2]))
+    cached = cache.load(key)
+    assert cached.frames == 3
+    faces, points = cached.frame(2)
+    assert faces == [(2, 12, 22, 2), (2, 13, 22, 3)]
+    assert points.shape == (2, 68, 2) and (points == 2).all()
+    assert cached.frame(1)[0] == [] and cached.frame(1)[1].shape == (0, 68, 2)
+    assert cached.frame(5)[0] == []    # frames after cached ones have no faces
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_damaged_entry_is_removed(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    key = cache.key(write_video(str(tmp_path / "a.avi"), b"video"), {})
+    cache.store(key, record([1]))
+    os.remove(os.path.join(cache.entry_directory(key), "landmarks.npy"))
+    assert cache.load(key) is None
+    assert not os.path.isdir(cache.entry_directory(key))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    keys = [cache.key(write_video(str(tmp_path / (name + ".avi")), name.encode("utf-8")), {}) for name in "abc"]
+    for idx, key in enumerate(keys):
+        cache.store(key, record([2] * 50))
+        past = time.time() - 100 + idx     # distinct modification times, the first entry is the oldest
+        os.utime(cache.entry_directory(key), (past, past))
+    entry_size = cache.size() // 3
+    cache.load(keys[0])     # first entry becomes the most recently used
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+    assert cache.load(keys[1]) is None
+    assert cache.load(keys[0]) is not None and cache.load(keys[2]) is not None
+    assert cache.size() <= cache.max_bytes
+    cache.clear()
+    assert cache.size() == 0
@@ -0,0 +1,39 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from filters import get_iou  # noqa: E402
+from iou import IouTable, batch_iou  # noqa: E402
+
+
+def test_batch_iou_matches_per_pair_iou():
+    random = np.random.RandomState(0)
+    reference = np.column_stack([random.randint(0, 100, (500, 2)), random.randint(0, 60, (500, 2))])
+    sticker = np.column_stack([random.randint(0, 100, (500, 2)), random.randint(0, 60, (500, 2))])
+    expected = [get_iou(*(list(face) + list(box))) for face, box in zip(reference.tolist(), sticker.tolist())]
+    assert np.allclose(batch_iou(reference, sticker), expected)
+
+
+def test_batch_iou_of_identical_and_disjoint_boxes():
+    iou = batch_iou([(10, 10, 20, 20), (0, 0, 10, 10)], [(10, 10, 20, 20), (50, 50, 10, 10)])
+    assert np.allclose(iou, [1.0, 0.0])
+
+
+def test_iou_table_summaries():
+    table = IouTable()
+    table.add(0, 0, "glasses", [(0, 0, 10, 10)], (0, 0, 10, 10))                    # iou 1
+    table.add(0, 1, "glasses", [(0, 0, 10, 10), (0, 0, 10, 10)], (0, 0, 10, 5))     # iou 0.5
+    table.add(1, 0, "mask", [(0, 0, 10, 10)], None)                                 # outside of frame, iou 0
+    other = IouTable()
+    other.add(7, 0, "mask", [(0, 0, 10, 10)], (0, 0, 10, 10))                       # iou 1
+    table.extend(other, frame=2)
+    result = table.evaluate()
+    assert np.allclose(result["entry_iou"], [1.0, 0.5, 0.0, 1.0])
+    assert result["frame"].tolist() == [0, 1, 2]
+    assert np.allclose(result["frame_iou"], [0.75, 0.0, 1.0])
+    assert np.allclose(result["face_iou"], [2.0 / 3, 0.5])
+    assert np.isclose(result["sticker_iou"]["glasses"], 0.75)
+    assert np.isclose(result["sticker_iou"]["mask"], 0.5)
+    table.clear()
+    assert len(table) == 0
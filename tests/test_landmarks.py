@@ -0,0 +1,42 @@
+import math
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks import MEAN_SHAPE, FaceLandmarks, estimate_points, cheapest_landmark_model  # noqa: E402
+
+
+def dlib_five_points(shape):
+    """Picks points that dlib 5 point model predicts from 68 points, by their meaning rather than by index:
+    outer and inner corner of eye on the right side of image, outer and inner corner of eye on the left side
+    of image and bottom of nose.
+
+    :param shape: (68, 2) array of points
+    :returns: (5, 2) array of points in order of 5 point model
+    """
+    right_eye, left_eye = shape[42:48], shape[36:42]
+    return np.array([right_eye[right_eye[:, 0].argmax()], right_eye[right_eye[:, 0].argmin()],
+                     left_eye[left_eye[:, 0].argmin()], left_eye[left_eye[:, 0].argmax()], shape[33]])
+
+
+def test_estimate_points_round_trip():
+    angle = math.radians(12)
+    rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+    shape = MEAN_SHAPE.dot(rotation.T) * 180 + (240, 130)   # known face, rotated, scaled and moved
+    estimated = estimate_points(dlib_five_points(shape)[np.newaxis])
+    assert estimated.shape == (1, 68, 2)
+    assert np.abs(estimated[0] - shape).max() <= 1.0
+    # angle of stickers is the same as with all 68 points, although ends of eyebrows are estimated
+    assert abs(FaceLandmarks(estimated).angles()[0] - FaceLandmarks(shape).angles()[0]) < 0.5
+
+
+def test_estimate_points_without_faces():
+    assert estimate_points(np.zeros((0, 5, 2))).shape == (0, 68, 2)
+
+
+def test_five_point_model_provides_only_eyes():
+    assert cheapest_landmark_model(["left_eye", "right_eye"]) == "predictor_5_point"
+    assert cheapest_landmark_model([]) == "predictor_5_point"
+    for region in ["left_eyebrow", "nose_bridge", "nose_tip", "top_lip"]:
+        assert cheapest_landmark_model(["left_eye", region]) == "predictor_68_point"
@@ -0,0 +1,63 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_writers import AviMuxer, ParallelMjpegWriter, encode_jpeg, frame_rate  # noqa: E402
+
+SIZE = (64, 48)
+
+
+def frames(count):
+    """Creates frames that differ in brightness, so their order can be checked after decoding.
+
+    :param count: number of frames
+    :returns: list of frames
+    """
+    return [np.full((SIZE[1], SIZE[0], 3), 20 + 10 * idx, dtype=np.uint8) for idx in range(count)]
+
+
+def read_video(path):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    decoded = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded.append(frame)
+    cap.release()
+    return fps, count, decoded
+
+
+def test_avi_muxer_file_is_readable(tmp_path):
+    path = str(tmp_path / "muxed.avi")
+    muxer = AviMuxer(path, 25.0, SIZE)
+    for frame in frames(7):     # odd sizes of JPEG data are padded
+        muxer.write(encode_jpeg(frame, 90))
+    muxer.close()
+    fps, count, decoded = read_video(path)
+    assert count == 7 and len(decoded) == 7
+    assert abs(fps - 25.0) < 0.01
+    assert decoded[0].shape == (SIZE[1], SIZE[0], 3)
+
+
+def test_changed_fps_is_written_on_close(tmp_path):
+    path = str(tmp_path / "recorded.avi")
+    writer = ParallelMjpegWriter(path, 30.0, SIZE, quality=90, threads=2)
+    for frame in frames(12):
+        writer.write(frame)
+    assert writer.set_fps(12.5)
+    writer.release()
+    fps, count, decoded = read_video(path)
+    assert abs(fps - 12.5) < 0.01
+    assert count == 12
+    brightness = [float(frame.mean()) for frame in decoded]
+    assert brightness == sorted(brightness)     # frames are muxed in order of writing
+
+
+def test_frame_rate():
+    rate, scale = frame_rate(29.97)
+    assert (rate, scale) == (29970, 1000)
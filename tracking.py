@@ -0,0 +1,156 @@
+import cv2
+import numpy as np
+
+
+def box_iou(bounds1, bounds2):
+    """Calculates Intersection over Union (IoU) of two face rectangles.
+
+    :param bounds1: bounds (top, right, bottom, left) of first rectangle
+    :param bounds2: bounds (top, right, bottom, left) of second rectangle
+    :returns: iou coefficient
+    """
+    top, right = max(bounds1[0], bounds2[0]), min(bounds1[1], bounds2[1])
+    bottom, left = min(bounds1[2], bounds2[2]), max(bounds1[3], bounds2[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    area_overlap = (right - left) * (bottom - top)
+    area1 = (bounds1[1] - bounds1[3]) * (bounds1[2] - bounds1[0])
+    area2 = (bounds2[1] - bounds2[3]) * (bounds2[2] - bounds2[0])
+    return area_overlap / float(area1 + area2 - area_overlap)
+
+
+class FaceTracker(object):
+    """
+    Represents tracker that runs full face detection only on keyframes and carries faces forward between
+    keyframes using sparse (Lucas-Kanade) optical flow of their landmarks. Landmarks are re-fitted inside
+    tracked face rectangles, which is much cheaper than detecting faces on whole frame.
+    """
+    def __init__(self, detect_faces, fit_landmarks, keyframe_interval=10, min_confidence=0.7,
+                 max_flow_error=1.0):
+        """Initializes face tracker.
+
+        :param self: self
+        :param detect_faces: function that takes frame and returns list of face bounds (top, right, bottom, left)
+        :param fit_landmarks: function that takes frame and list of face bounds and returns array or list of
+               landmark points [(x, y), ...] for each face
+        :param keyframe_interval: number of frames between two full detections
+        :param min_confidence: minimal share of landmarks that are tracked reliably, if share for any face
+               drops below it full detection is done before keyframe interval passes
+        :param max_flow_error: maximal forward-backward error (in pixels) of reliably tracked landmark
+        """
+        self.detect_faces = detect_faces
+        self.fit_landmarks = fit_landmarks
+        self.keyframe_interval = max(int(keyframe_interval), 1)
+        self.min_confidence = min_confidence
+        self.max_flow_error = max_flow_error
+        self.frames_since_keyframe = 0
+        self.previous_gray = None
+        self.faces = []
+        self.points = []
+        self.confidence = 1.0   # lowest share of reliably tracked landmarks among faces in last frame
+        self.keyframes = 0      # counter of full detections
+        self.frames = 0         # counter of processed frames
+
+    def reset(self):
+        """Forgets tracked faces so that full detection is done on next frame.
+
+        :param self: self
+        """
+        self.previous_gray = None
+        self.faces = []
+        self.points = []
+        self.confidence = 1.0
+
+    def seed(self, image, faces, points):
+        """Takes faces and landmarks that were detected elsewhere (e.g. reused from preview) as keyframe, so
+        faces on next frames are tracked from them.
+
+        :param self: self
+        :param image: frame on which faces were detected
+        :param faces: list of face bounds (top, right, bottom, left)
+        :param points: landmark points for each face
+        """
+        self.frames += 1
+        self.faces = list(faces)
+        self.points = points if len(faces) > 0 else []
+        self.previous_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.frames_since_keyframe = 1
+        self.confidence = 1.0
+
+    def update(self, image):
+        """Finds faces and their landmarks on next frame.
+
+        :param self: self
+        :param image: frame
+        :returns: list of face bounds (top, right, bottom, left) and list of landmark points for each face
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.frames += 1
+        faces = None
+        if self.previous_gray is not None and self.frames_since_keyframe < self.keyframe_interval:
+            faces = self.track_faces(gray, image.shape)
+        if faces is None:
+            faces = self.detect_faces(image)
+            self.frames_since_keyframe = 0
+            self.keyframes += 1
+            self.confidence = 1.0
+        self.faces = faces
+        self.points = self.fit_landmarks(image, faces) if len(faces) > 0 else []
+        self.previous_gray = gray
+        self.frames_since_keyframe += 1
+        return self.faces, self.points
+
+    def track_faces(self, gray, image_shape):
+        """Moves faces from previous frame according to optical flow of their landmarks.
+
+        :param self: self
+        :param gray: current frame in grayscale
+        :param image_shape: shape of current frame
+        :returns: list of moved face bounds or None if tracking is not reliable enough
+        """
+        if len(self.faces) == 0:
+            return []
+        old_points = np.float32([p for points in self.points for p in points]).reshape(-1, 1, 2)
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, old_points, None)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.previous_gray, new_points, None)
+        flow_error = np.linalg.norm((old_points - back_points).reshape(-1, 2), axis=1)
+        reliable = (status.ravel() == 1) & (back_status.ravel() == 1) & (flow_error < self.max_flow_error)
+
+        faces = []
+        confidence = 1.0
+        start = 0
+        for bounds, points in zip(self.faces, self.points):
+            end = start + len(points)
+            good = reliable[start:end]
+            confidence = min(confidence, float(np.mean(good)))
+            if confidence < self.min_confidence:
+                self.confidence = confidence
+                return None
+            old = old_points[start:end].reshape(-1, 2)[good]
+            new = new_points[start:end].reshape(-1, 2)[good]
+            faces.append(self.move_bounds(bounds, old, new, image_shape))
+            start = end
+        self.confidence = confidence
+        return faces
+
+    @staticmethod
+    def move_bounds(bounds, old, new, image_shape):
+        """Translates and scales face rectangle the same way its landmarks moved.
+
+        :param bounds: bounds (top, right, bottom, left) of face in previous frame
+        :param old: reliably tracked landmarks in previous frame
+        :param new: positions of same landmarks in current frame
+        :param image_shape: shape of current frame
+        :returns: bounds of face in current frame
+        """
+        shift = np.median(new - old, axis=0)
+        old_spread = np.mean(np.linalg.norm(old - old.mean(axis=0), axis=1))
+        new_spread = np.mean(np.linalg.norm(new - new.mean(axis=0), axis=1))
+        scale = new_spread / old_spread if old_spread > 0 else 1.0
+
+        center_x = (bounds[1] + bounds[3]) / 2.0 + shift[0]
+        center_y = (bounds[0] + bounds[2]) / 2.0 + shift[1]
+        half_width = (bounds[1] - bounds[3]) * scale / 2.0
+        half_height = (bounds[2] - bounds[0]) * scale / 2.0
+        return (max(int(round(center_y - half_height)), 0), min(int(round(center_x + half_width)), image_shape[1]),
+                min(int(round(center_y + half_height)), image_shape[0]), max(int(round(center_x - half_width)), 0))
@@ -0,0 +1,460 @@
+import queue
+import threading
+import time
+import cv2
+
+REPLAY_DEFAULT_FPS = 25.0   # used when replayed file does not report its fps
+
+
+class QueueStats(object):
+    """
+    Represents occupancy statistics of bounded queue between two pipeline stages. Queue that is mostly full
+    means that stage which takes items from it is the bottleneck, queue that is mostly empty means that stage
+    which puts items to it is the bottleneck.
+    """
+    def __init__(self, name, depth):
+        """Initializes queue statistics.
+
+        :param self: self
+        :param name: name of queue used in report
+        :param depth: maximal number of items in queue
+        """
+        self.name = name
+        self.depth = depth
+        self.samples = 0
+        self.occupancy_sum = 0
+        self.full = 0       # number of puts that found queue full
+        self.empty = 0      # number of gets that found queue empty
+
+    def sample(self, occupancy):
+        """Records queue occupancy.
+
+        :param self: self
+        :param occupancy: current number of items in queue
+        """
+        self.samples += 1
+        self.occupancy_sum += occupancy
+
+    def mean_occupancy(self):
+        """Calculates average number of items in queue.
+
+        :param self: self
+        :returns: average occupancy
+        """
+        return self.occupancy_sum / float(self.samples) if self.samples > 0 else 0.0
+
+    def as_dict(self):
+        """Returns statistics as dict.
+
+        :param self: self
+        :returns: dict with depth, mean occupancy and counters of full and empty queue
+        """
+        return {"depth": self.depth, "mean_occupancy": self.mean_occupancy(), "samples": self.samples,
+                "full": self.full, "empty": self.empty}
+
+    def report(self):
+        """Creates readable report of statistics.
+
+        :param self: self
+        :returns: report line
+        """
+        return (self.name + " queue: mean occupancy " + str(round(self.mean_occupancy(), 2)) + "/"
+                + str(self.depth) + ", full " + str(self.full) + " times, empty " + str(self.empty) + " times")
+
+
+class FrameReader(object):
+    """
+    Represents background thread that decodes frames from video capture into bounded queue, so decoding
+    overlaps with frame processing. Iterating over reader yields decoded frames.
+    """
+    def __init__(self, cap, depth=8, transform=None):
+        """Initializes frame reader and starts decoding.
+
+        :param self: self
+        :param cap: opened video capture
+        :param depth: maximal number of decoded frames waiting in queue
+        :param transform: function applied to each frame on reader thread, e.g. flipping, None if not needed
+        """
+        self.cap = cap
+        self.transform = transform
+        self.frames = queue.Queue(depth)
+        self.stats = QueueStats("Reader", depth)
+        self.stopped = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+
+    def read_loop(self):
+        """Decodes frames until video ends or reader is stopped. Error of decoding or transform ends video and
+        is raised when frames are iterated.
+
+        :param self: self
+        """
+        try:
+            while not self.stopped.is_set() and self.cap.isOpened():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if self.transform is not None:
+                    frame = self.transform(frame)
+                if self.frames.full():
+                    self.stats.full += 1
+                while not self.stopped.is_set():
+                    try:
+                        self.frames.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.frames.put(None)   # end of video
+
+    def __iter__(self):
+        """Yields decoded frames.
+
+        :param self: self
+        :returns: generator of frames
+        """
+        while True:
+            if self.frames.empty():
+                self.stats.empty += 1
+            self.stats.sample(self.frames.qsize())
+            frame = self.frames.get()
+            if frame is None:
+                if self.error is not None:
+                    raise self.error
+                break
+            yield frame
+
+    def stop(self):
+        """Stops decoding, frames that are already decoded are dropped.
+
+        :param self: self
+        """
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.frames.get(timeout=0.1)    # make room for end of video marker
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+
+class FrameWriter(object):
+    """
+    Represents background thread that encodes frames from bounded queue with video writer, so encoding
+    overlaps with frame processing.
+    """
+    def __init__(self, writer, depth=8):
+        """Initializes frame writer.
+
+        :param self: self
+        :param writer: opened video writer, it is released when frame writer is closed
+        :param depth: maximal number of frames waiting for encoding
+        """
+        self.writer = writer
+        self.frames = queue.Queue(depth)
+        self.stats = QueueStats("Writer", depth)
+        self.error = None
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def write_loop(self):
+        """Encodes frames until None is received.
+
+        :param self: self
+        """
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.write(frame)
+                except Exception as e:
+                    self.error = e
+
+    def write(self, frame):
+        """Queues frame for encoding. Frame must not be modified afterwards.
+
+        :param self: self
+        :param frame: frame
+        """
+        if self.error is not None:
+            raise self.error
+        if self.frames.full():
+            self.stats.full += 1
+        elif self.frames.empty():
+            self.stats.empty += 1
+        self.stats.sample(self.frames.qsize())
+        self.frames.put(frame)
+
+    def close(self):
+        """Encodes remaining frames and releases video writer.
+
+        :param self: self
+        """
+        self.frames.put(None)
+        self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise self.error
+
+
+class TimestampedGrabber(object):
+    """
+    Represents dedicated thread that grabs frames from camera as soon as they are available and records
+    monotonic timestamp of each of them, so that real frame rate and resolution of device are measured.
+    Grabbing never waits for consumer: frame that does not fit into queue is counted as dropped.
+    Iterating over grabber yields (frame, timestamp).
+    """
+    def __init__(self, cap, depth=256, transform=None):
+        """Initializes grabber and starts grabbing.
+
+        :param self: self
+        :param cap: opened video capture
+        :param depth: maximal number of grabbed frames waiting for consumer
+        :param transform: function applied to each frame on grabber thread, e.g. flipping, None if not needed
+        """
+        self.cap = cap
+        self.transform = transform
+        self.frames = queue.Queue(depth)
+        self.stats = QueueStats("Grabber", depth)
+        self.grabbed = 0
+        self.dropped = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.resolution = None      # (width, height) of grabbed frames
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.grab_loop, daemon=True)
+        self.thread.start()
+
+    def grab_loop(self):
+        """Grabs frames until camera fails or grabber is stopped. Error of grabbing or transform ends capture and
+        is raised when frames are iterated.
+
+        :param self: self
+        """
+        try:
+            while not self.stopped.is_set() and self.cap.isOpened():
+                if not self.cap.grab():
+                    break
+                timestamp = time.monotonic()    # time of grab, before frame is decoded
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                if self.transform is not None:
+                    frame = self.transform(frame)
+                if self.first_timestamp is None:
+                    self.first_timestamp = timestamp
+                    self.resolution = (frame.shape[1], frame.shape[0])
+                self.last_timestamp = timestamp
+                self.grabbed += 1
+                try:
+                    self.frames.put_nowait((frame, timestamp))
+                except queue.Full:
+                    self.stats.full += 1
+                    self.dropped += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.frames.put((None, None))   # end of capture, consumer always makes room for it
+
+    def measured_fps(self):
+        """Calculates frame rate of device from timestamps of grabbed frames.
+
+        :param self: self
+        :returns: frames per second, None if less than two frames are grabbed
+        """
+        if self.grabbed < 2 or self.last_timestamp <= self.first_timestamp:
+            return None
+        return (self.grabbed - 1) / (self.last_timestamp - self.first_timestamp)
+
+    def __iter__(self):
+        """Yields grabbed frames with their timestamps.
+
+        :param self: self
+        :returns: generator of (frame, timestamp)
+        """
+        while True:
+            if self.frames.empty():
+                self.stats.empty += 1
+            self.stats.sample(self.frames.qsize())
+            frame, timestamp = self.frames.get()
+            if frame is None:
+                if self.error is not None:
+                    raise self.error
+                break
+            yield frame, timestamp
+
+    def pending(self):
+        return self.frames.qsize()
+
+    def stop(self):
+        """Stops grabbing, frames that are already grabbed are dropped.
+
+        :param self: self
+        """
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.frames.get(timeout=0.1)    # make room for end of capture marker
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+
+class CameraSource(object):
+    """
+    Represents camera as capture source.
+    """
+    def __init__(self, index=0):
+        """Opens camera.
+
+        :param self: self
+        :param index: index of camera device
+        """
+        self.cap = cv2.VideoCapture(index)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def fps(self):
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    def release(self):
+        self.cap.release()
+
+
+class ReplaySource(object):
+    """
+    Represents video file replayed as if it was camera: each frame is delivered at its time according to
+    native frame rate of file, so live mode can be tested on machine without camera.
+    """
+    def __init__(self, path, loop=False, speed=1.0):
+        """Opens video file.
+
+        :param self: self
+        :param path: path of video file
+        :param loop: indicator whether file is replayed again from start when it ends
+        :param speed: replay speed, 1 for native frame rate
+        """
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.interval = 1.0 / ((fps if fps > 0 else REPLAY_DEFAULT_FPS) * speed)
+        self.start = None
+        self.index = 0      # index of next delivered frame since start of replay
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        """Decodes next frame and waits until its time comes.
+
+        :param self: self
+        :returns: indicator whether frame is read and frame
+        """
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.index > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        if self.start is None:
+            self.start = time.monotonic()
+        delay = self.start + self.index * self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.index += 1
+        return True, frame
+
+    def fps(self):
+        return 1.0 / self.interval
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(source):
+    """Opens capture source.
+
+    :param source: index of camera (as number or string of digits) or path of video file that is replayed
+    :returns: capture source with read(), isOpened() and release() like cv2.VideoCapture
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return CameraSource(int(source))
+    return ReplaySource(source)
+
+
+class LatestFrameGrabber(object):
+    """
+    Represents background thread that reads frames from capture source and keeps only the newest one with
+    its monotonic capture timestamp. Consumer that is slower than source always gets fresh frame, frames that
+    were replaced before consumer took them are counted as dropped.
+    """
+    def __init__(self, source):
+        """Initializes grabber and starts reading.
+
+        :param self: self
+        :param source: opened capture source
+        """
+        self.source = source
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None
+        self.sequence = 0   # number of captured frames
+        self.consumed = 0   # sequence number of last frame taken by consumer
+        self.dropped = 0
+        self.finished = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.grab_loop, daemon=True)
+        self.thread.start()
+
+    def grab_loop(self):
+        """Reads frames until source ends or grabber is stopped.
+
+        :param self: self
+        """
+        while not self.stopped.is_set():
+            ret, frame = self.source.read()
+            timestamp = time.monotonic()
+            with self.condition:
+                if not ret:
+                    break
+                if self.sequence > self.consumed:
+                    self.dropped += 1   # previous frame was never taken
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.condition.notify_all()
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def latest(self, timeout=None):
+        """Waits for frame that consumer has not taken yet.
+
+        :param self: self
+        :param timeout: maximal waiting time in seconds, None for waiting until frame comes
+        :returns: frame and its capture timestamp, (None, None) if source ended or timeout expired
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > self.consumed or self.finished, timeout)
+            if self.sequence <= self.consumed:
+                return None, None
+            self.consumed = self.sequence
+            return self.frame, self.timestamp
+
+    def stop(self):
+        """Stops reading.
+
+        :param self: self
+        """
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,335 @@
+import collections
+import os
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from instrumentation import timed
+
+# backends that write with cv2.VideoWriter: fourcc and extension of container
+OPENCV_BACKENDS = {
+    "opencv-mjpg": ("MJPG", ".avi"),
+    "opencv-xvid": ("XVID", ".avi"),
+    "opencv-mp4v": ("mp4v", ".mp4"),
+    "opencv-ffv1": ("FFV1", ".avi")
+}
+BACKENDS = ["mjpeg", "raw"] + sorted(OPENCV_BACKENDS)
+# quality/speed presets, quality is JPEG quality (0-100) for MJPG backends
+WRITER_PRESETS = {
+    "fast": {"backend": "mjpeg", "quality": 75},
+    "balanced": {"backend": "mjpeg", "quality": 95},    # same quality as MJPG writer of opencv
+    "quality": {"backend": "mjpeg", "quality": 100},
+    "compact": {"backend": "opencv-mp4v", "quality": None},
+    "compatible": {"backend": "opencv-mjpg", "quality": 95},
+    "benchmark": {"backend": "raw", "quality": None}
+}
+DEFAULT_PRESET = "balanced"
+DEFAULT_FPS = 25.0  # used when capture does not report its fps
+AVI_MAX_BYTES = 0xFFFFFFFF - (1 << 20)  # AVI 1.0 file is limited by 32-bit RIFF size
+
+
+def resolve_writer(preset=DEFAULT_PRESET, backend=None, quality=None):
+    """Resolves backend and quality from preset, backend and quality that are given explicitly win.
+
+    :param preset: name of preset
+    :param backend: name of backend, backend of preset if None
+    :param quality: JPEG quality, quality of preset if None
+    :returns: (backend, quality)
+    """
+    if preset not in WRITER_PRESETS:
+        raise ValueError("Unknown writer preset '" + str(preset) + "'!")
+    settings = WRITER_PRESETS[preset]
+    backend = backend if backend is not None else settings["backend"]
+    if backend not in BACKENDS:
+        raise ValueError("Unknown writer backend '" + str(backend) + "'!")
+    return backend, quality if quality is not None else settings["quality"]
+
+
+def writer_extension(preset=DEFAULT_PRESET, backend=None):
+    """Returns extension of files written by backend.
+
+    :param preset: name of preset
+    :param backend: name of backend, backend of preset if None
+    :returns: extension with dot
+    """
+    backend, _ = resolve_writer(preset, backend)
+    if backend in OPENCV_BACKENDS:
+        return OPENCV_BACKENDS[backend][1]
+    return ".raw" if backend == "raw" else ".avi"
+
+
+def create_video_writer(path, fps, size, preset=DEFAULT_PRESET, backend=None, quality=None, threads=None):
+    """Creates video writer. All writers have write(frame) and release() like cv2.VideoWriter, so they can be
+    used by video_io.FrameWriter, and set_fps(fps) that tells whether frame rate could be changed afterwards.
+
+    :param path: path of result video
+    :param fps: frames per second, DEFAULT_FPS if capture does not report it
+    :param size: (width, height) of frames
+    :param preset: name of quality/speed preset
+    :param backend: name of backend, backend of preset if None
+    :param quality: JPEG quality (0-100), quality of preset if None
+    :param threads: number of encoding threads of "mjpeg" backend, number of processors if None
+    :returns: video writer
+    """
+    backend, quality = resolve_writer(preset, backend, quality)
+    fps = fps if fps and fps > 0 else DEFAULT_FPS
+    if backend == "mjpeg":
+        return ParallelMjpegWriter(path, fps, size, quality, threads)
+    if backend == "raw":
+        return RawFrameSink(path, size)
+    return OpenCvWriter(path, fps, size, OPENCV_BACKENDS[backend][0], quality)
+
+
+def available_backends():
+    """Checks which backends can write video on this system, since codecs of opencv depend on its build.
+
+    :returns: list of names of available backends
+    """
+    available = []
+    directory = tempfile.mkdtemp()
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    for backend in BACKENDS:
+        path = os.path.join(directory, "probe" + writer_extension(backend=backend))
+        try:
+            writer = create_video_writer(path, DEFAULT_FPS, (64, 64), backend=backend)
+            writer.write(frame)
+            writer.release()
+            available.append(backend)
+        except (IOError, cv2.error):
+            pass
+        if os.path.isfile(path):
+            os.remove(path)
+    os.rmdir(directory)
+    return available
+
+
+class OpenCvWriter(object):
+    """
+    Represents cv2.VideoWriter with given fourcc, that fails loudly when codec is not available instead
+    of silently writing nothing.
+    """
+    def __init__(self, path, fps, size, fourcc, quality=None):
+        """Opens video writer.
+
+        :param self: self
+        :param path: path of result video
+        :param fps: frames per second
+        :param size: (width, height) of frames
+        :param fourcc: four character code of codec
+        :param quality: quality of codec (0-100) if codec supports it, None for default
+        """
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, tuple(size))
+        if not self.writer.isOpened():
+            raise IOError("Codec " + fourcc + " is not available for " + path + "!")
+        if quality is not None:
+            self.writer.set(cv2.VIDEOWRITER_PROP_QUALITY, quality)
+
+    @timed("encode_frame")
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def set_fps(self, fps):
+        """Frame rate cannot be changed, opencv writes it to header when video is opened.
+
+        :param self: self
+        :param fps: frames per second
+        :returns: False
+        """
+        return False
+
+    def release(self):
+        self.writer.release()
+
+
+@timed("encode_frame")
+def encode_jpeg(frame, quality):
+    """Encodes frame as JPEG. Opencv releases GIL while encoding, so frames are encoded on several threads.
+
+    :param frame: frame
+    :param quality: JPEG quality (0-100)
+    :returns: JPEG bytes
+    """
+    ret, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ret:
+        raise IOError("Frame could not be encoded!")
+    return data.tobytes()
+
+
+class ParallelMjpegWriter(object):
+    """
+    Represents MJPG video writer that encodes frames to JPEG on pool of threads and muxes encoded frames
+    into AVI file in order in which they were written.
+    """
+    def __init__(self, path, fps, size, quality=95, threads=None):
+        """Opens video writer.
+
+        :param self: self
+        :param path: path of result video
+        :param fps: frames per second
+        :param size: (width, height) of frames
+        :param quality: JPEG quality (0-100)
+        :param threads: number of encoding threads, number of processors if None
+        """
+        self.quality = quality if quality is not None else 95
+        threads = threads if threads is not None else os.cpu_count() or 1
+        self.muxer = AviMuxer(path, fps, size)
+        self.pool = ThreadPoolExecutor(threads)
+        self.pending = collections.deque()  # encoded frames in order of writing
+        self.max_pending = 2 * threads      # bounds memory of frames waiting for encoding
+
+    def write(self, frame):
+        """Queues frame for encoding. Frame must not be modified afterwards.
+
+        :param self: self
+        :param frame: frame
+        """
+        self.pending.append(self.pool.submit(encode_jpeg, frame, self.quality))
+        while len(self.pending) > self.max_pending:
+            self.muxer.write(self.pending.popleft().result())
+
+    def set_fps(self, fps):
+        """Changes frame rate written to header when file is closed, e.g. to rate measured while recording.
+
+        :param self: self
+        :param fps: frames per second
+        :returns: True
+        """
+        self.muxer.fps = fps
+        return True
+
+    def release(self):
+        """Muxes remaining frames and closes file.
+
+        :param self: self
+        """
+        try:
+            while len(self.pending) > 0:
+                self.muxer.write(self.pending.popleft().result())
+        finally:
+            self.pool.shutdown()
+            self.muxer.close()
+
+
+class AviMuxer(object):
+    """
+    Represents AVI 1.0 file with one MJPG video stream, that JPEG frames are appended to. Frame counts, sizes
+    and index are written when muxer is closed.
+    """
+    def __init__(self, path, fps, size):
+        """Creates file and writes headers.
+
+        :param self: self
+        :param path: path of result video
+        :param fps: frames per second
+        :param size: (width, height) of frames
+        """
+        width, height = size
+        self.fps = fps
+        rate, scale = frame_rate(fps)
+        self.file = open(path, "wb")
+        self.index = []     # (offset from start of movi list, size) of each frame
+        self.max_frame_size = 0
+
+        avih = struct.pack("<14I", int(1e6 / fps), 0, 0, 0x10, 0, 0, 1, 0, width, height, 0, 0, 0, 0)
+        strh = struct.pack("<4s4sIHHIIIIIIII4h", b"vids", b"MJPG", 0, 0, 0, 0, scale, rate, 0, 0, 0,
+                           0xFFFFFFFF, 0, 0, 0, width, height)
+        strf = struct.pack("<IiiHH4sIiiII", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+        strl = b"strl" + chunk(b"strh", strh) + chunk(b"strf", strf)
+        hdrl = b"hdrl" + chunk(b"avih", avih) + chunk(b"LIST", strl)
+        header = b"RIFF" + struct.pack("<I", 0) + b"AVI " + chunk(b"LIST", hdrl)
+        # offsets of fields patched on close
+        self.total_frames_offset = 12 + 8 + 4 + 8 + 16
+        self.buffer_size_offset = self.total_frames_offset + 12
+        strh_offset = 12 + 8 + 4 + 8 + len(avih) + 8 + 4 + 8
+        self.scale_offset = strh_offset + 20
+        self.length_offset = strh_offset + 32
+        self.stream_buffer_size_offset = strh_offset + 36
+        self.file.write(header)
+        self.movi_offset = self.file.tell()
+        self.file.write(b"LIST" + struct.pack("<I", 0) + b"movi")
+
+    def write(self, data):
+        """Appends JPEG frame.
+
+        :param self: self
+        :param data: JPEG bytes
+        """
+        offset = self.file.tell() - self.movi_offset - 8
+        if offset + len(data) > AVI_MAX_BYTES:
+            raise IOError("AVI file " + self.file.name + " is too big!")
+        self.file.write(chunk(b"00dc", data))
+        self.index.append((offset, len(data)))
+        self.max_frame_size = max(self.max_frame_size, len(data))
+
+    def close(self):
+        """Writes index and patches headers.
+
+        :param self: self
+        """
+        if self.file.closed:
+            return
+        movi_end = self.file.tell()
+        self.file.write(chunk(b"idx1", b"".join(struct.pack("<4sIII", b"00dc", 0x10, offset, size)
+                                                 for offset, size in self.index)))
+        end = self.file.tell()
+        rate, scale = frame_rate(self.fps)
+        for offset, value in [(4, end - 8), (self.movi_offset + 4, movi_end - self.movi_offset - 8),
+                              (self.total_frames_offset - 16, int(1e6 / self.fps)),
+                              (self.scale_offset, scale), (self.scale_offset + 4, rate),
+                              (self.total_frames_offset, len(self.index)),
+                              (self.buffer_size_offset, self.max_frame_size),
+                              (self.length_offset, len(self.index)),
+                              (self.stream_buffer_size_offset, self.max_frame_size)]:
+            self.file.seek(offset)
+            self.file.write(struct.pack("<I", value))
+        self.file.close()
+
+
+def frame_rate(fps):
+    """Converts frames per second to rate and scale of AVI stream header.
+
+    :param fps: frames per second
+    :returns: (rate, scale), fps is rate / scale
+    """
+    return int(round(fps * 1000)), 1000
+
+
+def chunk(fourcc, data):
+    """Creates RIFF chunk, padded to even size.
+
+    :param fourcc: chunk identifier
+    :param data: chunk data
+    :returns: chunk bytes
+    """
+    return fourcc + struct.pack("<I", len(data)) + data + (b"\0" if len(data) % 2 == 1 else b"")
+
+
+class RawFrameSink(object):
+    """
+    Represents writer that does not encode frames, for benchmarking pipeline without encoding cost. Frames
+    are only counted, file with number and size of frames is written on release.
+    """
+    def __init__(self, path=None, size=None):
+        """Initializes sink.
+
+        :param self: self
+        :param path: path of file with frame count, nothing is written if None
+        :param size: (width, height) of frames
+        """
+        self.path = path
+        self.size = size
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, frame):
+        self.frames += 1
+        self.bytes += frame.nbytes
+
+    def set_fps(self, fps):
+        return True
+
+    def release(self):
+        if self.path is not None:
+            with open(self.path, "w") as sink_file:
+                sink_file.write(str(self.frames) + " frames, " + str(self.bytes) + " bytes\n")